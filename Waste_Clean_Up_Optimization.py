@@ -2,100 +2,56 @@ import tkinter as tk
 from tkinter import messagebox, ttk  # Add ttk import
 from tkintermapview import TkinterMapView
 from tkinter import filedialog
-import matplotlib.pyplot as plt
-import networkx as nx
-import requests  # <-- Required for OSRM
-from docplex.mp.model import Model
+from routing import (
+    route_geometry, submit_route_geometry, set_route_cache, set_local_router,
+    haversine_km, haversine_matrix, detour_factor, ROAD_DETOUR_MAX
+)
+from local_routing import LocalRouter
+from distance_matrix import DistanceMatrix
+from route_cache import RouteCache
+from instance import CUSTOMER_FIELDS, TDWMS_FIELDS, Instance, check_point_record, point_array, read_point_records
+from marker_clusters import CLUSTER_MAX_ZOOM, MarkerIndex
+from run_report import RunReport
+from cleanup_engine import (
+    RESULTS_FOLDER, SolveJob, estimated_distances, format_solution, write_results, draw_heatmap, flow_color
+)
 import os
 import glob
-from datetime import datetime
+import logging
+import queue
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 from PIL import Image, ImageTk
 from ttkthemes import ThemedTk  # Add this import
 import sv_ttk  # Add this import - pip install sv-ttk
 
-# Home directory
-home_dir = os.path.expanduser("~")  # e.g., /home/user
-RESULTS_FOLDER = os.path.join(home_dir, "Desktop", "grad project", "app")
-
-def route_distance(p1, p2):
-    """
-    Returns the driving distance (km) between p1->p2 via the OSRM public API.
-    p1, p2 = (latitude, longitude)
-
-    This function requires an internet connection to work.
-    """
-    lat1, lon1 = p1
-    lat2, lon2 = p2
-    # Request to OSRM
-    url = f"https://router.project-osrm.org/route/v1/driving/{lon1},{lat1};{lon2},{lat2}?overview=false"
-    try:
-        r = requests.get(url, timeout=10)  # 10 seconds timeout
-        r.raise_for_status()  # Raises an exception for HTTP errors
-        data = r.json()
-        dist_m = data["routes"][0]["distance"]  # in meters
-        dist_km = dist_m / 1000.0
-        return dist_km
-    except Exception as e:
-        # Return -1 (signal) in case of OSRM service error, etc.
-        print("OSRM Error:", e)
-        return -1
+# All points must lie within this road distance (km) of each other
+MAX_POINT_DISTANCE_KM = 5.0
 
-class MapGUI:
+# Markers placed per UI event loop turn when many appear at once (imports, zooming in)
+MARKER_BATCH = 50
 
-    def draw_heatmap(self, usage_data, all_points):
-        # Start a new matplotlib figure
-        plt.figure(figsize=(10, 10))
-        G = nx.DiGraph()  # Directed graph
+# How often the map is checked for zoom and pan changes that need other markers (ms)
+MARKER_POLL_MS = 150
 
-        # Add all nodes
-        for idx, (lat, lon) in enumerate(all_points):
-            G.add_node(idx, pos=(lon, lat))  # (longitude, latitude)
+# Cluster badges: marker colours, the name of their points, and the zoom levels a click on one zooms in
+BADGE_COLORS = {"marker_color_circle": "#144870", "marker_color_outside": "#1f6aa5"}
+BADGE_NAMES = {"customer": "customers", "tdwms": "TDWMS", "depot": "depots", "final": "finals"}
+BADGE_ZOOM_STEP = 2
 
-        # Associate density data and draw
-        for (x, y), flow in usage_data.items():
-            color = self.get_color(flow)
-            G.add_edge(x, y, weight=flow, color=color)
-
-        # Set node positions
-        pos = nx.get_node_attributes(G, 'pos')
-
-        # Get edge colors and weights
-        edges = G.edges(data=True)
-        edge_colors = [edge[2]['color'] for edge in edges]
-        edge_weights = [edge[2]['weight'] for edge in edges]
-
-        # Draw the graph
-        nx.draw_networkx_nodes(G, pos, node_size=300, node_color='blue', alpha=0.7)
-        nx.draw_networkx_labels(G, pos, font_size=10, font_color='black')
-        nx.draw_networkx_edges(G, pos, edge_color=edge_colors, width=[w / 5 for w in edge_weights], alpha=0.8)
-
-        # Add legend
-        legend_elements = [
-            plt.Line2D([0], [0], color='yellow', lw=2, label='Flow ≤ 5'),
-            plt.Line2D([0], [0], color='orange', lw=2, label='5 < Flow ≤ 10'),
-            plt.Line2D([0], [0], color='red', lw=2, label='Flow > 10')
-        ]
-        plt.legend(handles=legend_elements, loc='upper left', bbox_to_anchor=(1.05, 1))
+# At most this many points of each type
+POINT_LIMITS = {"depot": 1, "final": 3}
 
-        # Adjust layout to make room for legend
-        plt.subplots_adjust(right=0.85)
+logger = logging.getLogger(__name__)
 
-        # Title
-        plt.title("Heatmap (Node-to-Node Usage)", fontsize=15)
-        
-        # Save with timestamp
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"heatmap_{timestamp}.png"
-        plt.savefig(os.path.join(RESULTS_FOLDER, filename), bbox_inches='tight')
-        plt.close()
+class MapGUI:
+
+    def draw_heatmap(self, usage_data, all_points):
+        # Draw and save the heatmap PNG (see cleanup_engine.draw_heatmap)
+        return draw_heatmap(usage_data, all_points, RESULTS_FOLDER)
 
     def get_color(self, flow):
-        if flow <= 5:
-            return "yellow"
-        elif flow <= 10:
-            return "orange"
-        else:
-            return "red"
+        return flow_color(flow)
 
     def __init__(self, root):
         self.root = root
@@ -203,6 +159,27 @@ class MapGUI:
         self.lbl_final_count.pack(anchor=tk.W, padx=10, pady=1)
         
         ttk.Separator(control_frame).pack(fill=tk.X, pady=10, padx=5)
+
+        # Planning horizon (T_last) and rolling-horizon window in days; window 0
+        # solves the whole horizon in one model
+        horizon_frame = ttk.Frame(control_frame)
+        horizon_frame.pack(fill=tk.X, padx=10, pady=1)
+        self.horizon_days = tk.IntVar(value=6)
+        self.window_days = tk.IntVar(value=0)
+        for row, (text, variable) in enumerate([("📅 Horizon (days)", self.horizon_days),
+                                                ("🪟 Window (0 = all)", self.window_days)]):
+            ttk.Label(horizon_frame, text=text, style='Info.TLabel').grid(row=row, column=0, sticky=tk.W)
+            ttk.Spinbox(horizon_frame, from_=0, to=365, width=5, textvariable=variable).grid(
+                row=row, column=1, padx=(5, 0), pady=1
+            )
+
+        # Road distances, or straight-line estimates for a rough plan in seconds
+        self.distance_mode = tk.StringVar(value="Road")
+        ttk.Label(horizon_frame, text="📏 Distances", style='Info.TLabel').grid(row=2, column=0, sticky=tk.W)
+        ttk.Combobox(horizon_frame, values=["Road", "Estimate"], width=8, state="readonly",
+                     textvariable=self.distance_mode).grid(row=2, column=1, padx=(5, 0), pady=1)
+
+        ttk.Separator(control_frame).pack(fill=tk.X, pady=10, padx=5)
         
         # Custom button style with fixed anchor and alignment
         style.configure(
@@ -215,10 +192,13 @@ class MapGUI:
         # Action buttons with icons - aligned icons and text
         buttons = [
             ("▶️", " Start", self.run_model, 'success'),
+            ("⏹️", " Cancel", self.cancel_model, 'danger'),
             ("📊", " Results", self.show_results, 'info'),
             ("🔄", " Reset", self.reset_points, 'danger'),
             ("🌡️", " Heatmap", self.show_heatmap, 'warning'),
-            ("📂", " History", self.show_old_heatmaps, 'primary')
+            ("📂", " History", self.show_old_heatmaps, 'primary'),
+            ("📥", " Import", self.import_points, 'primary'),
+            ("🗺️", " Road map", self.load_road_map, 'primary')
         ]
         
         for icon, text, command, style_class in buttons:
@@ -230,6 +210,16 @@ class MapGUI:
                 width=12  # Fixed width for all buttons
             )
             btn.pack(fill=tk.X, padx=10, pady=3)
+
+        # Solver progress (incumbent, bound, gap, elapsed time) of the running solve
+        self.lbl_solve_status = ttk.Label(
+            control_frame,
+            text="Solver idle",
+            style='Info.TLabel',
+            wraplength=170,
+            justify='left'
+        )
+        self.lbl_solve_status.pack(anchor=tk.W, padx=10, pady=(10, 1))
         
         # Right frame for map
         self.frame_right = ttk.Frame(self.root)
@@ -243,15 +233,53 @@ class MapGUI:
         
         # Initialize other attributes
         self.map_paths = []
-        self.map_markers = []
+        # Markers on the map: {marker_clusters.MapMarker: canvas marker}. They are drawn
+        # from marker_index for the current zoom and view (see refresh_markers);
+        # _marker_view is what they were drawn for, _marker_generation ends
+        # batches of an older refresh
+        self.map_markers = {}
+        self.marker_index = MarkerIndex()
+        self._marker_view = None
+        self._marker_generation = 0
         self.customers = []
         self.tdwms = []
         self.depot = []
         self.finals = []
         self.usage_data = {}
+
+        # Per-point values (W, t, E, O, s) of imported points, by point
+        self.point_records = {}
+
+        # Road distances between the placed points, grown as points are added
+        self.distances = DistanceMatrix()
+
+        # Background road checks for new points (one at a time, so each new point is
+        # measured against all earlier ones) and their results for the UI thread, as
+        # (handler, args) to run there
+        self._routing_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="distance-check")
+        self._check_results = queue.Queue()
+        self._pending_checks = 0
+        self._generation = 0
+        self.poll_distance_checks()
+
+        # Heatmap route geometries: {(p1, p2): path} fetched so far, the pairs being
+        # fetched in the background, their results for the UI thread, and the
+        # {(p1, p2): flow} arcs of the heatmap on the map
+        self._geometry_cache = {}
+        self._geometry_requests = set()
+        self._geometry_results = queue.Queue()
+        self._heatmap_arcs = {}
+
+        # Running two-stage solve (cleanup_engine.SolveJob) and the point generation it was started for
+        self._solve_job = None
+        self._solve_generation = None
+
+        # Persistent cache of road distances and geometries shared by all OSRM calls
+        set_route_cache(RouteCache(os.path.join(RESULTS_FOLDER, "route_cache.sqlite3")))
         
         # Map click event
         self.map_view.add_left_click_map_command(self.on_map_click)
+        self.poll_map_view()
 
     def on_hover(self, event, button, color):
         """Create hover effect for buttons"""
@@ -266,59 +294,307 @@ class MapGUI:
         coords -> returns a tuple in the form of (latitude, longitude).
         Additionally, if the new point is more than 5 km away from any existing points,
         we reset all inputs.
+
+        The 5 km rule is checked on straight-line distances first, which settles most
+        clicks at once. Only pairs that are close enough for the road distance to
+        matter are routed, in the background, together with the new point's row and
+        column of the distance matrix; see _finish_distance_check.
         """
         lat, lon = coords
+        mode = self.current_mode.get()
+
+        # 1) Reject points over the per-type limits before any routing call
+        if mode == "depot" and len(self.depot) >= 1:
+            messagebox.showerror("Error", "You can only add 1 depot.")
+            return
+        if mode == "final" and len(self.finals) >= 3:
+            messagebox.showerror("Error", "You can add a maximum of 3 Final Disposal points.")
+            return
 
-        # 1) Check the distance to all existing points via OSRM
+        # 2) Straight-line pre-check against all existing points. Road distance is at
+        # least the straight-line distance, so anything beyond the limit is rejected
+        # here; pairs within MAX_POINT_DISTANCE_KM / ROAD_DETOUR_MAX are accepted.
         all_existing_points = self.customers + self.tdwms + self.depot + self.finals
-        for (ex_lat, ex_lon) in all_existing_points:
-            distance_km = route_distance((lat, lon), (ex_lat, ex_lon))
-            if distance_km < 0:
-                # OSRM Error -1 returned
-                messagebox.showwarning(
-                    "OSRM Connection Error",
-                    "Distance could not be obtained from the road network. Inputs are being reset!"
-                )
-                self.reset_points()
-                return
-            if distance_km > 5.0:
+        borderline = []
+        if all_existing_points:
+            straight_km = haversine_km((lat, lon), all_existing_points)
+            if straight_km.max() > MAX_POINT_DISTANCE_KM:
                 messagebox.showwarning(
                     "Distance Error",
-                    f"The selected new point ({distance_km:.2f} km) is more than 5 km away from "
+                    f"The selected new point ({straight_km.max():.2f} km) is more than 5 km away from "
                     "one of the existing points. All inputs are being reset!"
                 )
                 self.reset_points()
                 return
+            borderline = np.nonzero(straight_km * ROAD_DETOUR_MAX > MAX_POINT_DISTANCE_KM)[0].tolist()
+
+        # 3) Add the point right away; the road check runs off the UI thread
+        self.add_point(mode, lat, lon)
+        self._pending_checks += 1
+        future = self._routing_executor.submit(self.distances.add_point, (lat, lon))
+        future.add_done_callback(
+            lambda f, gen=self._generation: self._check_results.put(
+                (self._finish_distance_check, (gen, (lat, lon), all_existing_points, borderline, f))
+            )
+        )
 
-        # 2) If the distance check is passed, proceed to normal addition
-        mode = self.current_mode.get()
+    def add_point(self, mode, lat, lon):
+        """Appends a point of the given type and puts its marker (or its cluster's badge) on the map."""
+        label = self._append_point(mode, (lat, lon))
+        self.marker_index.add([(lat, lon)], mode, [label])
+        self.refresh_markers()
 
+    def _append_point(self, mode, point):
+        """Appends a point of the given type, updates its counter and returns its marker text."""
         if mode == "customer":
-            self.customers.append((lat, lon))
-            marker = self.map_view.set_marker(lat, lon, text=f"Customer {len(self.customers)}")
-            self.map_markers.append(marker)
+            self.customers.append(point)
             self.lbl_customer_count.config(text=f"Customer = {len(self.customers)}")
-        elif mode == "tdwms":
-            self.tdwms.append((lat, lon))
-            marker = self.map_view.set_marker(lat, lon, text=f"TDWMS {len(self.tdwms)}")
-            self.map_markers.append(marker)
+            return f"Customer {len(self.customers)}"
+        if mode == "tdwms":
+            self.tdwms.append(point)
             self.lbl_tdwms_count.config(text=f"TDWMS = {len(self.tdwms)}")
-        elif mode == "depot":
-            if len(self.depot) >= 1:
-                messagebox.showerror("Error", "You can only add 1 depot.")
-                return
-            self.depot.append((lat, lon))
-            marker = self.map_view.set_marker(lat, lon, text="Depot")
-            self.map_markers.append(marker)
+            return f"TDWMS {len(self.tdwms)}"
+        if mode == "depot":
+            self.depot.append(point)
             self.lbl_depot_count.config(text=f"Depot = {len(self.depot)}")
-        elif mode == "final":
-            if len(self.finals) >= 3:
-                messagebox.showerror("Error", "You can add a maximum of 3 Final Disposal points.")
+            return "Depot"
+        self.finals.append(point)
+        self.lbl_final_count.config(text=f"Final = {len(self.finals)}")
+        return f"Final {len(self.finals)}"
+
+    def import_points(self):
+        """
+        Adds the points of a .csv, .json or .geojson file (see instance.py for the
+        layouts), with their per-point values, to the points on the map.
+
+        The file is checked as a whole before anything is added: coordinates,
+        per-type limits and the 5 km rule on straight-line distances, all pairs
+        at once. Points already on the map are skipped. The markers are then
+        placed in batches (see _place_markers) and the road distances of all new
+        pairs fetched in one background job, which applies the road part of the
+        5 km rule as clicks do (see _finish_import_check).
+        """
+        path = filedialog.askopenfilename(
+            title="Import points",
+            filetypes=[("Point files", "*.csv *.json *.geojson"), ("All files", "*.*")]
+        )
+        if not path:
+            return
+        try:
+            records = read_point_records(path)
+            modes = [mode for mode, rows in records.items() for _ in rows]
+            rows = [row for mode_rows in records.values() for row in mode_rows]
+            coords = point_array(rows)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            messagebox.showerror("Import Error", f"Could not read {os.path.basename(path)}: {e}")
+            return
+
+        invalid = ~np.isfinite(coords).all(axis=1) | (np.abs(coords[:, 0]) > 90) | (np.abs(coords[:, 1]) > 180)
+        if invalid.any():
+            messagebox.showerror("Import Error", f"{int(invalid.sum())} point(s) have invalid coordinates.")
+            return
+
+        # Per-point values the model cannot take (e.g. W = 0 or t = 2.5) would only fail the solve
+        fields = {"customer": CUSTOMER_FIELDS, "tdwms": TDWMS_FIELDS}
+        for mode, mode_rows in records.items():
+            for n, row in enumerate(mode_rows, start=1):
+                if mode not in fields or not isinstance(row, dict):
+                    continue
+                try:
+                    check_point_record(row, fields[mode])
+                except ValueError as e:
+                    messagebox.showerror("Import Error", f"{mode} {n} in {os.path.basename(path)}: {e}. "
+                                                         "Nothing was imported.")
+                    return
+
+        # Points already on the map, and repeats within the file, are skipped
+        existing = self.customers + self.tdwms + self.depot + self.finals
+        _, first = np.unique(coords, axis=0, return_index=True)
+        keep = np.zeros(len(coords), dtype=bool)
+        keep[first] = True
+        placed = set(existing)
+        keep &= [tuple(p) not in placed for p in coords.tolist()]
+        new = [(mode, tuple(point), row) for mode, point, row, k in zip(modes, coords.tolist(), rows, keep) if k]
+        if not new:
+            messagebox.showinfo("Import", "The file has no points that are not on the map already.")
+            return
+
+        for mode, limit in POINT_LIMITS.items():
+            count = len(self.depot if mode == "depot" else self.finals) + sum(m == mode for m, _, _ in new)
+            if count > limit:
+                messagebox.showerror("Import Error", f"At most {limit} {mode} point(s) are allowed; "
+                                                     f"the import would make {count}.")
+                return
+
+        points = [point for _, point, _ in new]
+        straight_km = haversine_matrix(existing + points)
+        if straight_km.max() > MAX_POINT_DISTANCE_KM:
+            messagebox.showerror(
+                "Distance Error",
+                f"Points in the file are up to {straight_km.max():.2f} km away from other points; all "
+                f"points must lie within {MAX_POINT_DISTANCE_KM:g} km of each other. Nothing was imported."
+            )
+            return
+        # Only these pairs can break the rule on the road (see on_map_click)
+        all_points = existing + points
+        borderline = [(all_points[i], all_points[j]) for i, j in
+                      zip(*np.nonzero(straight_km * ROAD_DETOUR_MAX > MAX_POINT_DISTANCE_KM))
+                      if i >= len(existing) or j >= len(existing)]
+
+        labels = {}
+        for mode, point, row in new:
+            labels.setdefault(mode, []).append((point, self._append_point(mode, point)))
+            if isinstance(row, dict):
+                self.point_records[point] = row
+        for mode, placed in labels.items():
+            self.marker_index.add([point for point, _ in placed], mode, [label for _, label in placed])
+        lats, lons = zip(*points)
+        if max(lats) > min(lats) and max(lons) > min(lons):
+            self.map_view.fit_bounding_box((max(lats), min(lons)), (min(lats), max(lons)))
+        else:
+            # fit_bounding_box needs a box with an area
+            self.map_view.set_position((max(lats) + min(lats)) / 2, (max(lons) + min(lons)) / 2)
+        self.refresh_markers()
+
+        self._pending_checks += 1
+        future = self._routing_executor.submit(self.distances.add_points, points)
+        future.add_done_callback(
+            lambda f, gen=self._generation: self._check_results.put(
+                (self._finish_import_check, (gen, points, borderline, f))
+            )
+        )
+
+    def _map_view_key(self):
+        """
+        The zoom level and view the markers depend on: the view's top left corner
+        in steps of half the view, and the index version.
+        """
+        zoom = round(self.map_view.zoom)
+        (x0, y0), (x1, y1) = self.map_view.upper_left_tile_pos, self.map_view.lower_right_tile_pos
+        half_x, half_y = (x1 - x0) / 2, (y1 - y0) / 2
+        if half_x <= 0 or half_y <= 0:
+            return zoom, None, self.marker_index.version
+        return zoom, (int(x0 // half_x), int(y0 // half_y), half_x, half_y), self.marker_index.version
+
+    def poll_map_view(self):
+        """Redraws the markers when the map was zoomed or panned by half a view or more."""
+        if self._map_view_key() != self._marker_view:
+            self.refresh_markers()
+        self.root.after(MARKER_POLL_MS, self.poll_map_view)
+
+    def refresh_markers(self):
+        """
+        Draws the markers and cluster badges of marker_index for the current zoom
+        level, in the view and half a view around it. Markers that stay are kept;
+        new ones are placed in batches (see _place_markers).
+        """
+        self._marker_view = zoom, view, _ = self._map_view_key()
+        bounds = None
+        if view is not None:
+            qx, qy, half_x, half_y = view
+            scale = 2 ** zoom
+            bounds = (((qx - 1) * half_x / scale, (qy - 1) * half_y / scale),
+                      ((qx + 4) * half_x / scale, (qy + 4) * half_y / scale))
+        wanted = self.marker_index.markers(zoom, bounds)
+
+        keep = set(wanted)
+        for key in [key for key in self.map_markers if key not in keep]:
+            self.map_markers.pop(key).delete()
+        self._marker_generation += 1
+        self._place_markers(self._marker_generation, [key for key in wanted if key not in self.map_markers], 0)
+
+    def _place_markers(self, generation, markers, start):
+        """Places markers[start:start + MARKER_BATCH] and schedules the rest, so the map stays responsive."""
+        if generation != self._marker_generation:
+            return  # Reset or redrawn meanwhile
+        for key in markers[start:start + MARKER_BATCH]:
+            if key.count == 1:
+                self.map_markers[key] = self.map_view.set_marker(key.lat, key.lon, text=key.label)
+            else:
+                self.map_markers[key] = self.map_view.set_marker(
+                    key.lat, key.lon, text=f"{key.count} {BADGE_NAMES.get(key.kind, key.kind)}",
+                    command=self.zoom_to_cluster, **BADGE_COLORS
+                )
+        if start + MARKER_BATCH < len(markers):
+            self.root.after(1, self._place_markers, generation, markers, start + MARKER_BATCH)
+
+    def zoom_to_cluster(self, marker):
+        """Badge click: centres the map on the cluster and zooms in on it."""
+        zoom = min(round(self.map_view.zoom) + BADGE_ZOOM_STEP, CLUSTER_MAX_ZOOM)
+        self.map_view.set_position(*marker.position)
+        self.map_view.set_zoom(zoom)
+
+    def _finish_import_check(self, generation, points, borderline, future):
+        self._pending_checks -= 1
+        if generation != self._generation:
+            for point in points:
+                self.distances.remove_point(point)
+            return
+
+        road_km = future.result()
+        too_far = [road_km[pair] for pair in borderline if road_km.get(pair, -1) > MAX_POINT_DISTANCE_KM]
+        if too_far:
+            messagebox.showwarning(
+                "Distance Error",
+                f"Imported points are up to {max(too_far):.2f} km apart by road, more than "
+                f"{MAX_POINT_DISTANCE_KM:g} km. All inputs are being reset!"
+            )
+            self.reset_points()
+            return
+
+        unverified = sum(1 for pair in borderline if road_km.get(pair, -1) < 0)
+        if unverified:
+            messagebox.showwarning(
+                "OSRM Connection Error",
+                f"The road distance of {unverified} pair(s) of nearby points could not be verified. "
+                "The points are kept and the distances will be retried when the model starts."
+            )
+
+    def poll_distance_checks(self):
+        """
+        Applies finished background distance checks on the UI thread. A check
+        that fails is reported in the status line; polling always goes on.
+        """
+        try:
+            while not self._check_results.empty():
+                handler, args = self._check_results.get_nowait()
+                try:
+                    handler(*args)
+                except Exception as e:
+                    self.lbl_solve_status.config(text=f"Distance check failed: {type(e).__name__}: {e}")
+        finally:
+            self.root.after(100, self.poll_distance_checks)
+
+    def _finish_distance_check(self, generation, point, existing_points, borderline, future):
+        self._pending_checks -= 1
+        if generation != self._generation:
+            # The inputs were reset while this check was running
+            self.distances.remove_point(point)
+            return
+
+        road_km = future.result()
+        unverified = 0
+        for k in borderline:
+            distance_km = road_km.get(existing_points[k], -1)
+            if distance_km < 0:
+                # OSRM Error -1 returned: keep the point, the pair is retried on Start
+                unverified += 1
+                continue
+            if distance_km > MAX_POINT_DISTANCE_KM:
+                messagebox.showwarning(
+                    "Distance Error",
+                    f"The selected new point ({distance_km:.2f} km) is more than 5 km away from "
+                    "one of the existing points. All inputs are being reset!"
+                )
+                self.reset_points()
                 return
-            self.finals.append((lat, lon))
-            marker = self.map_view.set_marker(lat, lon, text=f"Final {len(self.finals)}")
-            self.map_markers.append(marker)
-            self.lbl_final_count.config(text=f"Final = {len(self.finals)}")
+
+        if unverified:
+            messagebox.showwarning(
+                "OSRM Connection Error",
+                f"The road distance to {unverified} nearby point(s) could not be verified. "
+                "The point is kept and the distances will be retried when the model starts."
+            )
 
     def reset_points(self):
         # Clear all point lists
@@ -333,36 +609,71 @@ class MapGUI:
         self.lbl_depot_count.config(text="Depot = 0")
         self.lbl_final_count.config(text="Final = 0")
 
-        # Delete all markers on the map
-        for marker in self.map_markers:
+        # Delete all markers on the map and stop placing those still queued
+        for marker in self.map_markers.values():
             marker.delete()
         self.map_markers.clear()
+        self.marker_index.clear()
+        self._marker_generation += 1
 
-        # Delete all paths on the map
+        # Delete all paths on the map; heatmap routes still being fetched are not drawn
         for path in self.map_paths:
             path.delete()
         self.map_paths.clear()  # Also clear the path list
+        self._heatmap_arcs = {}
 
         # Clear usage data
         self.usage_data.clear()
+        self.point_records.clear()
 
-    def get_route(self, lat1, lon1, lat2, lon2):
+        # Forget the measured distances of the removed points and ignore the
+        # results of background checks that are still running
+        self.distances.clear()
+        self._generation += 1
+
+    def load_road_map(self):
         """
-        Gets the route between two points using the OSRM API.
+        Loads an OSM extract (or a graph saved by local_routing.py) and routes
+        offline on it from then on. The file is parsed on the distance-check
+        thread, so checks of points placed meanwhile wait for the local graph.
         """
-        url = f"https://router.project-osrm.org/route/v1/driving/{lon1},{lat1};{lon2},{lat2}?overview=full&geometries=geojson"
+        path = filedialog.askopenfilename(
+            title="Road map for offline routing",
+            filetypes=[("Road graph or OSM extract", "*.npz *.osm *.osm.gz *.osm.bz2"), ("All files", "*.*")]
+        )
+        if not path:
+            return
+        self.lbl_solve_status.config(text=f"Loading road map {os.path.basename(path)}...")
+        future = self._routing_executor.submit(self._install_road_map, path)
+        self.root.after(100, self.poll_road_map, future)
+
+    def _install_road_map(self, path):
+        router = LocalRouter.load(path)
+        set_local_router(router)
+        return router
+
+    def poll_road_map(self, future):
+        if not future.done():
+            self.root.after(100, self.poll_road_map, future)
+            return
         try:
-            response = requests.get(url, timeout=10)
-            response.raise_for_status()
-            data = response.json()
-            coordinates = data["routes"][0]["geometry"]["coordinates"]
-
-            # Convert coordinates returned from OSRM from (lon, lat) to (lat, lon) order
-            path_coords = [(lat, lon) for lon, lat in coordinates]
-            return path_coords
+            router = future.result()
         except Exception as e:
-            print(f"OSRM Route Error: {e}")
-            return None
+            self.lbl_solve_status.config(text="Solver idle")
+            messagebox.showerror("Road map", f"Could not load the road map: {e}")
+            return
+        # Routes drawn so far came from OSRM
+        self._geometry_cache.clear()
+        self.lbl_solve_status.config(
+            text=f"Offline routing: {router.graph.n_nodes} road nodes, {router.graph.n_edges} road segments"
+        )
+
+    def get_route(self, lat1, lon1, lat2, lon2):
+        """
+        Gets the route between two points using the OSRM API, the route cache or
+        the road map loaded for offline routing.
+        """
+        return route_geometry((lat1, lon1), (lat2, lon2))
 
     def show_heatmap(self):
         if not self.usage_data:
@@ -374,22 +685,60 @@ class MapGUI:
 
         all_points = [self.depot[0]] + self.customers + self.tdwms + self.finals
 
-        for (x, y), flow in self.usage_data.items():
-            if flow > 0:
-                lat1, lon1 = all_points[x]
-                lat2, lon2 = all_points[y]
+        arcs = [((all_points[x], all_points[y]), flow) for (x, y), flow in self.usage_data.items() if flow > 0]
 
-                # Get the route from OSRM
-                path_coords = self.get_route(lat1, lon1, lat2, lon2)
-                if path_coords:
-                    # Determine color based on density
-                    color = self.get_color(flow)
-
-                    # Draw the path on the map and add it to the list
-                    path = self.map_view.set_path(path_coords, width=5, color=color)
-                    self.map_paths.append(path)  # Add the drawn path to the list
+        # A new view replaces the previous one
+        for path in self.map_paths:
+            path.delete()
+        self.map_paths.clear()
+        self._heatmap_arcs = dict(arcs)
+
+        # Routes seen before are drawn at once; the others are fetched on the routing
+        # pool (once, even if an earlier view is still waiting for them) and drawn
+        # one by one as they arrive, see poll_heatmap_routes
+        polling = bool(self._geometry_requests)
+        for pair, flow in arcs:
+            if pair in self._geometry_cache:
+                self._draw_route(self._geometry_cache[pair], flow)
+            elif pair not in self._geometry_requests:
+                self._geometry_requests.add(pair)
+                future = submit_route_geometry(*pair)
+                future.add_done_callback(lambda f, pair=pair: self._geometry_results.put((pair, f)))
+
+        if not self._geometry_requests:
+            messagebox.showinfo("Heatmap", "The heatmap has been successfully visualized on the map!")
+        elif not polling:
+            self.root.after(50, self.poll_heatmap_routes)
+
+    def poll_heatmap_routes(self):
+        """Draws the route geometries fetched since the last call, on the UI thread."""
+        while not self._geometry_results.empty():
+            pair, future = self._geometry_results.get_nowait()
+            self._geometry_requests.discard(pair)
+            try:
+                path_coords = future.result()
+            except Exception as e:
+                # Drawn like any route OSRM could not provide: not at all
+                logger.warning("Heatmap route %s -> %s failed: %s", *pair, e)
+                path_coords = None
+            if path_coords:
+                self._geometry_cache[pair] = path_coords
+            if pair in self._heatmap_arcs:
+                self._draw_route(path_coords, self._heatmap_arcs[pair])
+
+        if self._geometry_requests:
+            self.root.after(50, self.poll_heatmap_routes)
+        elif self._heatmap_arcs:
+            messagebox.showinfo("Heatmap", "The heatmap has been successfully visualized on the map!")
+
+    def _draw_route(self, path_coords, flow):
+        if path_coords:
+            # Determine color based on density
+            color = self.get_color(flow)
 
-        messagebox.showinfo("Heatmap", "The heatmap has been successfully visualized on the map!")
+            # Draw the path on the map and add it to the list
+            path = self.map_view.set_path(path_coords, width=5, color=color)
+            self.map_paths.append(path)  # Add the drawn path to the list
 
     def run_model(self):
         """
@@ -404,617 +753,162 @@ class MapGUI:
             )
             return
 
-        # [Depot] + [Customers] + [TDWMS] + [Finals]
-        all_points = [self.depot[0]] + self.customers + self.tdwms + self.finals
-        n_total = len(all_points)
-
-        M = len(self.customers)
-        J_count = len(self.tdwms)
-        F_count = len(self.finals)
-
-        depot_idx = 0
-        customer_idx_list = list(range(1, M+1))
-        tdwms_idx_list = list(range(M+1, M+1+J_count))
-        final_idx_list = list(range(M+1+J_count, M+1+J_count+F_count))
-
-        T_last = 6
-        T = range(0, T_last + 1)
-
-        # Function to find distance over the road
-        def dist(i, j):
-            dkm = route_distance(all_points[i], all_points[j])
-            if dkm < 0:
-                # Catch the error before solving the model
-                messagebox.showwarning("OSRM Error", "An error occurred in distance calculation, resetting.")
-                self.reset_points()
-                return 9999999  # Makes the model meaningless
-            return dkm
-
-        # Distance matrix
-        uij = {}
-        for i in range(n_total):
-            for j in range(n_total):
-                uij[(i, j)] = dist(i, j)
-
-        #---------------------- RECORDING INFORMATION ----------------------
-        self.model_solution_text = ""
-        self.model_solution_text += "\n--- SELECTED POINTS (Lat, Lon) ---\n"
-        for idx, (la, lo) in enumerate(all_points):
-            self.model_solution_text += f"  [{idx}] => ({la:.5f}, {lo:.5f})\n"
-
-        self.model_solution_text += "\n--- DISTANCE MATRIX (KM) ---\n"
-        for i in range(n_total):
-            row_dists = [f"{uij[(i, j)]:.2f}" for j in range(n_total)]
-            self.model_solution_text += f"Row {i}: " + "  ".join(row_dists) + "\n"
-        #---------------------------------------------------------------------
-
-        # Parameters (example)
-
-        # Wi: Total demand of customer node i (in tonnes).
-        # Represents the total amount of waste generated at each customer node (destroyed building).
-        # Source: Paper (Section 3.2, Equation 6).
-        Wi = {}
-        for i in customer_idx_list:
-            if i == 1:
-                Wi[i] = 120  # Example: Customer 1 generates 120 tonnes of waste.
-            elif i == 2:
-                Wi[i] = 200  # Example: Customer 2 generates 200 tonnes of waste.
-            elif i == 3:
-                Wi[i] = 180  # Example: Customer 3 generates 180 tonnes of waste.
-            else:
-                Wi[i] = 100  # Default: Other customers generate 100 tonnes of waste.
-
-        # ti: Time required to demolish customer node i (in days).
-        # Represents the number of days needed to demolish each destroyed building.
-        # Source: Paper (Section 3.2, Equation 4).
-        ti = {}
-        for i in customer_idx_list:
-            if i == 1:
-                ti[i] = 2  # Example: Customer 1 takes 2 days to demolish.
-            elif i == 2:
-                ti[i] = 1  # Example: Customer 2 takes 1 day to demolish.
-            elif i == 3:
-                ti[i] = 3  # Example: Customer 3 takes 3 days to demolish.
-            else:
-                ti[i] = 2  # Default: Other customers take 2 days to demolish.
-
-        # Ej: Fixed cost for building the TDWMS j (in AUD).
-        # Represents the establishment cost for each temporary disaster waste management site (TDWMS).
-        # Source: Paper (Section 3.2, Equation 1).
-        Ej = {}
-        # Oj: Operation cost of TDWMS j (in AUD/day).
-        # Represents the daily operational cost for each TDWMS.
-        # Source: Paper (Section 3.2, Equation 1).
-        Oj = {}
-        # sj: Capacity of TDWMS j (in tonnes).
-        # Represents the maximum amount of waste that can be stored at each TDWMS.
-        # Source: Paper (Section 3.2, Equation 24).
-        sj = {}
-        for j in tdwms_idx_list:
-            Ej[j] = 8000   # Example: TDWMS j has an establishment cost of 8000 AUD.
-            Oj[j] = 1500   # Example: TDWMS j has an operational cost of 1500 AUD/day.
-            sj[j] = 25000  # Example: TDWMS j has a capacity of 25000 tonnes.
-
-        # m: Number of demolition machines available.
-        # Represents the total number of machines available for demolishing buildings.
-        # Source: Paper (Section 3.2, Equation 5).
-        m = 1 # Example: 2 demolition machines are available.
-
-        # K: Set of available collection vehicles in a day.
-        # Represents the collection vehicles available for waste collection.
-        # Source: Paper (Section 3.2, Equation 14).
-        K = [1]  # Example: 2 collection vehicles are available.
-
-        # K0: Set of available transportation vehicles in a day.
-        # Represents the transportation vehicles available for waste transportation.
-        # Source: Paper (Section 3.2, Equation 23).
-        K0 = [1]  # Example: 1 transportation vehicle is available.
-
-        # Q: Capacity of each collection vehicle (in tonnes).
-        # Represents the maximum amount of waste that can be transported by a collection vehicle in one trip.
-        # Source: Paper (Section 3.2, Equation 9).
-        Q = 50  # Example: Each collection vehicle can carry 50 tonnes of waste.
-
-        # Q0: Capacity of each transportation vehicle (in tonnes).
-        # Represents the maximum amount of waste that can be transported by a transportation vehicle in one trip.
-        # Source: Paper (Section 3.2, Equation 18).
-        Q0 = 40  # Example: Each transportation vehicle can carry 40 tonnes of waste.
-
-        # v: Speed of collection vehicles (in km/h).
-        # Represents the speed at which collection vehicles travel.
-        # Source: Paper (Section 3.2, Equation 10).
-        v = 25  # Example: Collection vehicles travel at 25 km/h.
-
-        # v0: Speed of transportation vehicles (in km/h).
-        # Represents the speed at which transportation vehicles travel.
-        # Source: Paper (Section 3.2, Equation 19).
-        v0 = 30  # Example: Transportation vehicles travel at 30 km/h.
-
-        # R: Total working time of a vehicle in a day (in minutes).
-        # Represents the maximum daily working time for each vehicle (collection or transportation).
-        # Source: Paper (Section 3.2, Equations 10 and 19).
-        R = 150  # Example: Each vehicle can work for 150 minutes per day.
-
-        # g: Waste recycling rate.
-        # Represents the fraction of waste that can be recycled.
-        # Source: Paper (Section 3.2, Equation 16).
-        g = 0.35  # Example: 35% of the waste can be recycled.
-
-        # ck: Cost per kilometer for collection vehicles (in AUD/km).
-        # Represents the cost of traveling one kilometer for a collection vehicle.
-        # Source: Paper (Section 3.2, Equation 1).
-        ck = 100  # Example: Collection vehicles cost 100 AUD per kilometer.
-
-        # ck0: Cost per kilometer for transportation vehicles (in AUD/km).
-        # Represents the cost of traveling one kilometer for a transportation vehicle.
-        # Source: Paper (Section 3.2, Equation 1).
-        ck0 = 150  # Example: Transportation vehicles cost 150 AUD per kilometer.
-
-
-
-        # -------------------- Stage 1: Minimize Time --------------------
-        mdl_time = Model(name="Time Minimization")
-        mdl_time.parameters.timelimit = 36000  # 10 hours
-        mdl_time.parameters.mip.tolerances.mipgap = 0.15
-
-        # Decision Variables
-        xid = mdl_time.binary_var_matrix(customer_idx_list, range(1, T_last+1), name="xid")
-        yid = mdl_time.binary_var_matrix(customer_idx_list, range(1, T_last+1), name="yid")
-        cid = mdl_time.continuous_var_matrix(customer_idx_list, T, name="cid", lb=0)
-        rid = mdl_time.continuous_var_matrix(customer_idx_list, T, name="rid", lb=0)
-        sd = mdl_time.binary_var_list(T, name="sd")
-
-        xj = mdl_time.binary_var_dict(tdwms_idx_list, name="xj")
-        rjd = mdl_time.continuous_var_matrix(tdwms_idx_list, T, name="rjd", lb=0)
-        lj = mdl_time.continuous_var_dict(tdwms_idx_list, name="lj", lb=0)
-
-        aijd = mdl_time.integer_var_cube(range(n_total), range(n_total), range(1, T_last+1), name="aijd", lb=0)
-        zijd = mdl_time.continuous_var_cube(customer_idx_list, tdwms_idx_list, range(1, T_last+1),
-                                        name="zijd", lb=0)
-
-        bjld = mdl_time.integer_var_cube(range(n_total), range(n_total), range(1, T_last+1), name="bjld", lb=0)
-        fjld = mdl_time.continuous_var_cube(tdwms_idx_list, final_idx_list, range(1, T_last+1),
-                                        name="fjld", lb=0)
-
-        # Constraints
-        mdl_time.add_constraint(mdl_time.sum(xj[j] for j in tdwms_idx_list) >= 1, "min_one_tdwms_open")
-
-        for i in customer_idx_list:
-            mdl_time.add_constraint(mdl_time.sum(xid[i, d] for d in range(1, T_last+1)) == 1)
-
-        for i in customer_idx_list:
-            for d in range(1, T_last+1):
-                mdl_time.add_constraint(
-                    yid[i, d] == mdl_time.sum(xid[i, dd] for dd in range(max(1, d - ti[i] + 1), d+1))
-                )
-
-        for d in range(1, T_last+1):
-            mdl_time.add_constraint(mdl_time.sum(yid[i, d] for i in customer_idx_list) <= m)
-
-        for i in customer_idx_list:
-            for d in range(0, T_last+1):
-                if d == 0:
-                    mdl_time.add_constraint(cid[i, 0] == Wi[i])
-                else:
-                    mdl_time.add_constraint(
-                        cid[i, d] == Wi[i] - mdl_time.sum(zijd[i, j, dd]
-                                                        for j in tdwms_idx_list for dd in range(1, d+1))
-                    )
-
-        for i in customer_idx_list:
-            for d in range(1, T_last+1):
-                if d == 1:
-                    mdl_time.add_constraint(rid[i, 0] == 0)
-                    mdl_time.add_constraint(
-                        yid[i, 1] * (Wi[i]/ti[i]) ==
-                        rid[i, 1] + mdl_time.sum(zijd[i, j, 1] for j in tdwms_idx_list)
-                    )
-                else:
-                    mdl_time.add_constraint(
-                        yid[i, d] * (Wi[i]/ti[i]) + rid[i, d-1]
-                        == rid[i, d] + mdl_time.sum(zijd[i, j, d] for j in tdwms_idx_list)
-                    )
-
-        for i in customer_idx_list:
-            mdl_time.add_constraint(rid[i, T_last] == 0)
-
-        for i in customer_idx_list:
-            for j in tdwms_idx_list:
-                for d in range(1, T_last+1):
-                    mdl_time.add_constraint(zijd[i, j, d] <= aijd[i, j, d] * Q)
-
-        for d in range(1, T_last+1):
-            mdl_time.add_constraint(
-                mdl_time.sum(aijd[x, y, d] * (uij[(x, y)]/v) * 60
-                            for x in range(n_total) for y in range(n_total))
-                <= len(K)*R
-            )
-
-        for d in range(1, T_last+1):
-            mdl_time.add_constraint(
-                mdl_time.sum(aijd[depot_idx, i, d] for i in customer_idx_list)
-                == mdl_time.sum(aijd[j, depot_idx, d] for j in tdwms_idx_list)
-            )
-
-        for i in customer_idx_list:
-            for d in range(1, T_last+1):
-                mdl_time.add_constraint(
-                    mdl_time.sum(aijd[x, i, d] for x in [depot_idx]+tdwms_idx_list)
-                    == mdl_time.sum(aijd[i, y, d] for y in [depot_idx]+tdwms_idx_list)
-                )
-
-        for j in tdwms_idx_list:
-            for d in range(1, T_last+1):
-                mdl_time.add_constraint(
-                    mdl_time.sum(aijd[x, j, d] for x in [depot_idx]+customer_idx_list)
-                    == mdl_time.sum(aijd[j, y, d] for y in [depot_idx]+customer_idx_list)
-                )
-
-        for d in range(1, T_last+1):
-            mdl_time.add_constraint(
-                mdl_time.sum(aijd[depot_idx, i, d] for i in customer_idx_list) <= len(K)
-            )
-
-        for i in customer_idx_list:
-            mdl_time.add_constraint(
-                mdl_time.sum(zijd[i, j, d] for j in tdwms_idx_list for d in range(1, T_last+1)) == Wi[i]
-            )
-
-        for j in tdwms_idx_list:
-            for d in range(0, T_last+1):
-                if d == 0:
-                    mdl_time.add_constraint(rjd[j, 0] == 0)
-                else:
-                    mdl_time.add_constraint(
-                        (1-g)*mdl_time.sum(zijd[i, j, d] for i in customer_idx_list)
-                        + rjd[j, d-1]
-                        == rjd[j, d] + mdl_time.sum(fjld[j, f, d] for f in final_idx_list)
-                    )
-
-        for j in tdwms_idx_list:
-            mdl_time.add_constraint(rjd[j, T_last] == 0)
-
-        for j in tdwms_idx_list:
-            for f in final_idx_list:
-                for d in range(1, T_last+1):
-                    mdl_time.add_constraint(fjld[j, f, d] <= bjld[j, f, d]*Q0)
-
-        for d in range(1, T_last+1):
-            mdl_time.add_constraint(
-                mdl_time.sum(bjld[x, y, d] * (uij[(x, y)]/v0)*60
-                            for x in range(n_total) for y in range(n_total))
-                <= len(K0)*R
+        estimate = self.distance_mode.get() == "Estimate"
+        if self._pending_checks and not estimate:
+            messagebox.showinfo(
+                "Please Wait",
+                "Road distances for the last points are still being checked. Try again in a moment."
             )
+            return
 
-        for d in range(1, T_last+1):
-            mdl_time.add_constraint(
-                mdl_time.sum(aijd[depot_idx, i, d] for i in customer_idx_list + tdwms_idx_list) >= 1
-            )
+        if self._solve_job is not None:
+            messagebox.showinfo("Please Wait", "The model is already running. Cancel it to start a new one.")
+            return
 
-        for d in range(1, T_last+1):
-            mdl_time.add_constraint(
-                mdl_time.sum(bjld[depot_idx, j, d] for j in tdwms_idx_list)
-                == mdl_time.sum(bjld[f, depot_idx, d] for f in final_idx_list)
+        try:
+            T_last = self.horizon_days.get()
+            window = self.window_days.get()
+        except tk.TclError:
+            T_last = window = -1
+        if T_last < 1 or window < 0:
+            messagebox.showerror(
+                "Invalid Horizon",
+                "The horizon must be a whole number of days (at least 1) and the window 0 or more days."
             )
+            return
 
-        for j in tdwms_idx_list:
-            for d in range(1, T_last+1):
-                mdl_time.add_constraint(
-                    mdl_time.sum(bjld[x, j, d] for x in final_idx_list+[depot_idx])
-                    == mdl_time.sum(bjld[j, y, d] for y in final_idx_list+[depot_idx])
-                )
-
-        for f in final_idx_list:
-            for d in range(1, T_last+1):
-                mdl_time.add_constraint(
-                    mdl_time.sum(bjld[x, f, d] for x in tdwms_idx_list+[depot_idx])
-                    == mdl_time.sum(bjld[f, x, d] for x in tdwms_idx_list+[depot_idx])
-                )
+        # [Depot] + [Customers] + [TDWMS] + [Finals], default parameters
+        instance = Instance(self.depot[0], self.customers, self.tdwms, self.finals, T_last=T_last)
+        instance.apply_point_records([self.point_records.get(p) for p in self.customers],
+                                     [self.point_records.get(p) for p in self.tdwms])
+
+        # In estimate mode no routing call is made: the detour factor comes from the
+        # pairs already measured while the points were placed, if there are any.
+        report = RunReport()
+        if estimate:
+            with report.phase("distance_matrix"):
+                points = instance.all_points
+                measured = [(points[i], points[j], km) for (i, j), (km, _) in
+                            self.distances.known_pairs(points).items() if i != j]
+                factor = detour_factor(measured)
+                uij, fallback_pairs = estimated_distances(instance, detour_factor=factor, report=report)
+                if factor is not None:
+                    report.extra["distance_estimate"]["calibration_pairs"] = len(measured)
+            self._start_solve(instance, uij, fallback_pairs, report, window)
+            return
 
-        for d in range(1, T_last+1):
-            mdl_time.add_constraint(
-                mdl_time.sum(bjld[depot_idx, j, d] for j in tdwms_idx_list) <= len(K0)
+        # Road distance matrix: pairs measured while the points were placed are
+        # reused, the rest come from one OSRM /table request and per-pair retries,
+        # on the distance-check thread (OSRM timeouts and retries would freeze the
+        # map); see _finish_matrix. Counted as a pending check, so the model is not
+        # started twice meanwhile.
+        self.lbl_solve_status.configure(text="Fetching road distances...")
+        self._pending_checks += 1
+        future = self._routing_executor.submit(self._fetch_matrix, instance.all_points, report)
+        future.add_done_callback(
+            lambda f, gen=self._generation: self._check_results.put(
+                (self._finish_matrix, (gen, instance, report, window, f))
             )
-
-        for j in tdwms_idx_list:
-            for d in range(0, T_last+1):
-                mdl_time.add_constraint(rjd[j, d] <= xj[j]*sj[j])
-
-        mdl_time.add_constraint(
-            (1-g)*mdl_time.sum(zijd[i, j, d]
-                            for i in customer_idx_list for j in tdwms_idx_list for d in range(1, T_last+1))
-            == mdl_time.sum(fjld[j, f, d]
-                        for j in tdwms_idx_list for f in final_idx_list for d in range(1, T_last+1))
         )
 
-        for d in range(1, T_last+1):
-            for i in customer_idx_list:
-                mdl_time.add_constraint(sd[d] >= 1 - cid[i, d]/Wi[i])
-            for j in tdwms_idx_list:
-                mdl_time.add_constraint(sd[d] >= 1 - rjd[j, d]/sj[j])
-
-        for j in tdwms_idx_list:
-            mdl_time.add_constraint(
-                lj[j] <= ((T_last+1)-mdl_time.sum(sd[d] for d in range(T_last+1))+1)*Oj[j]
-                        + (T_last+1)*Oj[j]*(1 - xj[j])
-            )
-
-        # Objective: Minimize total clean-up time
-        totalTime = mdl_time.sum(sd[d] for d in range(1, T_last + 1))
-        mdl_time.minimize(totalTime)
+    def _fetch_matrix(self, points, report):
+        with report.phase("distance_matrix"):
+            return self.distances.matrix(points)
 
-        # Solve the model
-        print(">>> Solving Stage 1: Minimizing Time...")
-        solution_time = mdl_time.solve(log_output=True)
-        if solution_time:
-            optimal_time = solution_time.objective_value
-            print("Optimal Time:", optimal_time)
-        else:
-            print("No solution found for time minimization.")
+    def _finish_matrix(self, generation, instance, report, window, future):
+        self._pending_checks -= 1
+        if generation != self._generation:
+            # The points were reset while the distances were fetched
+            self.lbl_solve_status.configure(text="Solver idle")
+            return
+        try:
+            uij, fallback_pairs = future.result()
+        except Exception as e:
+            self.lbl_solve_status.configure(text="Solver idle")
+            messagebox.showerror("OSRM Error", f"The road distances could not be obtained: {e}")
             return
 
-        # -------------------- Stage 2: Minimize Cost with Time Constraint --------------------
-        mdl_cost = Model(name="Cost Minimization")
-        mdl_cost.parameters.timelimit = 36000  # 10 hours
-
-        # Decision Variables
-        xid = mdl_cost.binary_var_matrix(customer_idx_list, range(1, T_last+1), name="xid")
-        yid = mdl_cost.binary_var_matrix(customer_idx_list, range(1, T_last+1), name="yid")
-        cid = mdl_cost.continuous_var_matrix(customer_idx_list, T, name="cid", lb=0)
-        rid = mdl_cost.continuous_var_matrix(customer_idx_list, T, name="rid", lb=0)
-        sd = mdl_cost.binary_var_list(T, name="sd")
-
-        xj = mdl_cost.binary_var_dict(tdwms_idx_list, name="xj")
-        rjd = mdl_cost.continuous_var_matrix(tdwms_idx_list, T, name="rjd", lb=0)
-        lj = mdl_cost.continuous_var_dict(tdwms_idx_list, name="lj", lb=0)
-
-        aijd = mdl_cost.integer_var_cube(range(n_total), range(n_total), range(1, T_last+1), name="aijd", lb=0)
-        zijd = mdl_cost.continuous_var_cube(customer_idx_list, tdwms_idx_list, range(1, T_last+1),
-                                        name="zijd", lb=0)
-
-        bjld = mdl_cost.integer_var_cube(range(n_total), range(n_total), range(1, T_last+1), name="bjld", lb=0)
-        fjld = mdl_cost.continuous_var_cube(tdwms_idx_list, final_idx_list, range(1, T_last+1),
-                                        name="fjld", lb=0)
-
-        # Constraints (same as Stage 1)
-        mdl_cost.add_constraint(mdl_cost.sum(xj[j] for j in tdwms_idx_list) >= 1, "min_one_tdwms_open")
-
-        for i in customer_idx_list:
-            mdl_cost.add_constraint(mdl_cost.sum(xid[i, d] for d in range(1, T_last+1)) == 1)
-
-        for i in customer_idx_list:
-            for d in range(1, T_last+1):
-                mdl_cost.add_constraint(
-                    yid[i, d] == mdl_cost.sum(xid[i, dd] for dd in range(max(1, d - ti[i] + 1), d+1))
-                )
-
-        for d in range(1, T_last+1):
-            mdl_cost.add_constraint(mdl_cost.sum(yid[i, d] for i in customer_idx_list) <= m)
-
-        for i in customer_idx_list:
-            for d in range(0, T_last+1):
-                if d == 0:
-                    mdl_cost.add_constraint(cid[i, 0] == Wi[i])
-                else:
-                    mdl_cost.add_constraint(
-                        cid[i, d] == Wi[i] - mdl_cost.sum(zijd[i, j, dd]
-                                                        for j in tdwms_idx_list for dd in range(1, d+1))
-                    )
-
-        for i in customer_idx_list:
-            for d in range(1, T_last+1):
-                if d == 1:
-                    mdl_cost.add_constraint(rid[i, 0] == 0)
-                    mdl_cost.add_constraint(
-                        yid[i, 1] * (Wi[i]/ti[i]) ==
-                        rid[i, 1] + mdl_cost.sum(zijd[i, j, 1] for j in tdwms_idx_list)
-                    )
-                else:
-                    mdl_cost.add_constraint(
-                        yid[i, d] * (Wi[i]/ti[i]) + rid[i, d-1]
-                        == rid[i, d] + mdl_cost.sum(zijd[i, j, d] for j in tdwms_idx_list)
-                    )
-
-        for i in customer_idx_list:
-            mdl_cost.add_constraint(rid[i, T_last] == 0)
-
-        for i in customer_idx_list:
-            for j in tdwms_idx_list:
-                for d in range(1, T_last+1):
-                    mdl_cost.add_constraint(zijd[i, j, d] <= aijd[i, j, d] * Q)
-
-        for d in range(1, T_last+1):
-            mdl_cost.add_constraint(
-                mdl_cost.sum(aijd[x, y, d] * (uij[(x, y)]/v) * 60
-                            for x in range(n_total) for y in range(n_total))
-                <= len(K)*R
-            )
-
-        for d in range(1, T_last+1):
-            mdl_cost.add_constraint(
-                mdl_cost.sum(aijd[depot_idx, i, d] for i in customer_idx_list)
-                == mdl_cost.sum(aijd[j, depot_idx, d] for j in tdwms_idx_list)
-            )
-
-        for i in customer_idx_list:
-            for d in range(1, T_last+1):
-                mdl_cost.add_constraint(
-                    mdl_cost.sum(aijd[x, i, d] for x in [depot_idx]+tdwms_idx_list)
-                    == mdl_cost.sum(aijd[i, y, d] for y in [depot_idx]+tdwms_idx_list)
-                )
-
-        for j in tdwms_idx_list:
-            for d in range(1, T_last+1):
-                mdl_cost.add_constraint(
-                    mdl_cost.sum(aijd[x, j, d] for x in [depot_idx]+customer_idx_list)
-                    == mdl_cost.sum(aijd[j, y, d] for y in [depot_idx]+customer_idx_list)
-                )
-
-        for d in range(1, T_last+1):
-            mdl_cost.add_constraint(
-                mdl_cost.sum(aijd[depot_idx, i, d] for i in customer_idx_list) <= len(K)
-            )
-
-        for i in customer_idx_list:
-            mdl_cost.add_constraint(
-                mdl_cost.sum(zijd[i, j, d] for j in tdwms_idx_list for d in range(1, T_last+1)) == Wi[i]
-            )
-
-        for j in tdwms_idx_list:
-            for d in range(0, T_last+1):
-                if d == 0:
-                    mdl_cost.add_constraint(rjd[j, 0] == 0)
-                else:
-                    mdl_cost.add_constraint(
-                        (1-g)*mdl_cost.sum(zijd[i, j, d] for i in customer_idx_list)
-                        + rjd[j, d-1]
-                        == rjd[j, d] + mdl_cost.sum(fjld[j, f, d] for f in final_idx_list)
-                    )
-
-        for j in tdwms_idx_list:
-            mdl_cost.add_constraint(rjd[j, T_last] == 0)
-
-        for j in tdwms_idx_list:
-            for f in final_idx_list:
-                for d in range(1, T_last+1):
-                    mdl_cost.add_constraint(fjld[j, f, d] <= bjld[j, f, d]*Q0)
-
-        for d in range(1, T_last+1):
-            mdl_cost.add_constraint(
-                mdl_cost.sum(bjld[x, y, d] * (uij[(x, y)]/v0)*60
-                            for x in range(n_total) for y in range(n_total))
-                <= len(K0)*R
-            )
-
-        for d in range(1, T_last+1):
-            mdl_cost.add_constraint(
-                mdl_cost.sum(aijd[depot_idx, i, d] for i in customer_idx_list + tdwms_idx_list) >= 1
-            )
-
-        for d in range(1, T_last+1):
-            mdl_cost.add_constraint(
-                mdl_cost.sum(bjld[depot_idx, j, d] for j in tdwms_idx_list)
-                == mdl_cost.sum(bjld[f, depot_idx, d] for f in final_idx_list)
-            )
-
-        for j in tdwms_idx_list:
-            for d in range(1, T_last+1):
-                mdl_cost.add_constraint(
-                    mdl_cost.sum(bjld[x, j, d] for x in final_idx_list+[depot_idx])
-                    == mdl_cost.sum(bjld[j, y, d] for y in final_idx_list+[depot_idx])
-                )
-
-        for f in final_idx_list:
-            for d in range(1, T_last+1):
-                mdl_cost.add_constraint(
-                    mdl_cost.sum(bjld[x, f, d] for x in tdwms_idx_list+[depot_idx])
-                    == mdl_cost.sum(bjld[f, x, d] for x in tdwms_idx_list+[depot_idx])
-                )
-
-        for d in range(1, T_last+1):
-            mdl_cost.add_constraint(
-                mdl_cost.sum(bjld[depot_idx, j, d] for j in tdwms_idx_list) <= len(K0)
+        # Pairs OSRM still cannot provide get a straight-line estimate instead of
+        # discarding the inputs
+        if fallback_pairs:
+            n_total = instance.n_total
+            messagebox.showwarning(
+                "OSRM Error",
+                f"Road distance could not be obtained for {len(fallback_pairs)} of {n_total * n_total} pairs.\n"
+                "Straight-line estimates are used for them; see the solution output for the list."
             )
-
-        for j in tdwms_idx_list:
-            for d in range(0, T_last+1):
-                mdl_cost.add_constraint(rjd[j, d] <= xj[j]*sj[j])
-
-        mdl_cost.add_constraint(
-            (1-g)*mdl_cost.sum(zijd[i, j, d]
-                            for i in customer_idx_list for j in tdwms_idx_list for d in range(1, T_last+1))
-            == mdl_cost.sum(fjld[j, f, d]
-                        for j in tdwms_idx_list for f in final_idx_list for d in range(1, T_last+1))
-        )
-
-        for d in range(1, T_last+1):
-            for i in customer_idx_list:
-                mdl_cost.add_constraint(sd[d] >= 1 - cid[i, d]/Wi[i])
-            for j in tdwms_idx_list:
-                mdl_cost.add_constraint(sd[d] >= 1 - rjd[j, d]/sj[j])
-
-        for j in tdwms_idx_list:
-            mdl_cost.add_constraint(
-                lj[j] <= ((T_last+1)-mdl_cost.sum(sd[d] for d in range(T_last+1))+1)*Oj[j]
-                        + (T_last+1)*Oj[j]*(1 - xj[j])
+        self._start_solve(instance, uij, fallback_pairs, report, window)
+
+    def _start_solve(self, instance, uij, fallback_pairs, report, window):
+        # Both stages run in a worker process, so the map stays usable; see poll_solve_job.
+        # A window shorter than the horizon solves it window by window (rolling_horizon.py).
+        self._solve_job = SolveJob(instance, uij, fallback_pairs, timelimit=36000,  # 10 hours per stage
+                                   report=report, window=window or None)
+        self._solve_generation = self._generation
+        self._solve_job.start()
+        self.lbl_solve_status.configure(text="Solver starting...")
+        self.root.after(200, self.poll_solve_job)
+
+    def poll_solve_job(self):
+        """Shows the progress of the running solve and handles its result, on the UI thread."""
+        job = self._solve_job
+        if job is None:
+            return
+        for kind, data in job.poll():
+            if kind == "progress":
+                self.lbl_solve_status.configure(text=self._progress_text(data))
+            elif kind == "done":
+                self._solve_job = None
+                self._finish_model_run(data)
+            elif kind == "error":
+                self._solve_job = None
+                self.lbl_solve_status.configure(text="Solver failed")
+                messagebox.showerror("Solver Error", data)
+        if self._solve_job is not None:
+            self.root.after(200, self.poll_solve_job)
+
+    def _progress_text(self, report):
+        stage = {1: "Stage 1 (time)", 2: "Stage 2 (cost)"}.get(report["stage"], str(report["stage"]))
+        lines = [stage]
+        if report["incumbent"] is not None:
+            lines.append(f"Incumbent: {report['incumbent']:.2f}")
+        lines.append(f"Bound: {report['bound']:.2f}")
+        if report["gap"] is not None:
+            lines.append(f"Gap: {report['gap']:.1%}")
+        lines.append(f"Elapsed: {report['elapsed']:.0f} s")
+        if self._solve_job is not None and self._solve_job.cancelling:
+            lines.append("Cancelling...")
+        return "\n".join(lines)
+
+    def cancel_model(self):
+        """Stops the running solve; the best solution found so far is still reported."""
+        if self._solve_job is None:
+            messagebox.showinfo("Cancel", "No model is running.")
+            return
+        self._solve_job.cancel()
+        self.lbl_solve_status.configure(text="Cancelling, keeping the best solution found...")
+
+    def _finish_model_run(self, result):
+        self.model_solution_text = format_solution(result)
+        if result["optimal_cost"] is None:
+            self.lbl_solve_status.configure(
+                text="Solve cancelled, no solution found" if result["cancelled"] else "No solution found"
             )
-
-        # Add a constraint to fix the total clean-up time
-        mdl_cost.add_constraint(mdl_cost.sum(sd[d] for d in range(1, T_last + 1)) <= optimal_time + 1)  # Small tolerance
-
-        # Objective: Minimize total cost
-        totalEstablishmentCost = mdl_cost.sum(xj[j] * Ej[j] for j in tdwms_idx_list)
-        totalTdwmsOperation = mdl_cost.sum(lj[j] for j in tdwms_idx_list)
-
-        totalCollectionCost = mdl_cost.sum(
-            mdl_cost.sum(aijd[depot_idx, i, d] * uij[(depot_idx, i)] * ck for i in customer_idx_list)
-            + mdl_cost.sum(aijd[i, j, d] * uij[(i, j)] * ck for i in customer_idx_list for j in tdwms_idx_list)
-            + mdl_cost.sum(aijd[j, depot_idx, d] * uij[(j, depot_idx)] * ck for j in tdwms_idx_list)
-            for d in range(1, T_last+1)
-        )
-
-        totalTransportCost = mdl_cost.sum(
-            mdl_cost.sum(bjld[depot_idx, j, d] * uij[(depot_idx, j)] * ck0 for j in tdwms_idx_list)
-            + mdl_cost.sum(bjld[j, f, d] * uij[(j, f)] * ck0 for j in tdwms_idx_list for f in final_idx_list)
-            + mdl_cost.sum(bjld[f, depot_idx, d] * uij[(f, depot_idx)] * ck0 for f in final_idx_list)
-            for d in range(1, T_last+1)
-        )
-
-        totalCost = totalEstablishmentCost + totalTdwmsOperation + totalCollectionCost + totalTransportCost
-        mdl_cost.minimize(totalCost)
-
-        # Solve the model
-        print(">>> Solving Stage 2: Minimizing Cost...")
-        solution_cost = mdl_cost.solve(log_output=True)
-        if solution_cost:
-            optimal_cost = solution_cost.objective_value
-            print("Optimal Cost:", optimal_cost)
-        else:
-            print("No solution found for cost minimization.")
             return
-
-        # Collect usage data
-        usage_data = {}
-
-        # First echelon (depot -> customer/tdwms)
-        for x in range(n_total):
-            for y in range(n_total):
-                total_flow = sum(aijd[x, y, d].solution_value for d in range(1, T_last + 1))
-                if total_flow > 0:  # Only add and print flows greater than zero
-                    usage_data[(x, y)] = total_flow
-                    print(f"Flow from {x} to {y}: {total_flow}")
-
-        # Second echelon (tdwms -> final)
-        for x in range(n_total):
-            for y in range(n_total):
-                total_flow = sum(bjld[x, y, d].solution_value for d in range(1, T_last + 1))
-                if total_flow > 0:  # Only add and print flows greater than zero
-                    usage_data[(x, y)] = total_flow
-                    print(f"Flow from {x} to {y}: {total_flow}")
+        self.lbl_solve_status.configure(text="Solve cancelled" if result["cancelled"] else "Solve finished")
 
         # Draw and save the heatmap
-        self.draw_heatmap(usage_data, all_points)
+        with result["report"].phase("heatmap"):
+            self.draw_heatmap(result["usage_data"], result["points"])
         messagebox.showinfo("Heatmap", "The heatmap has been saved as heatmap.png!")
 
-        self.model_solution_text += "\n--- MODEL SOLUTION RESULTS ---\n"
-        self.model_solution_text += f"Optimal Time: {optimal_time}\n"
-        self.model_solution_text += f"Optimal Cost: {optimal_cost}\n"
-
-        self.usage_data = usage_data
-
-        # File name (solution_output_1.txt, solution_output_2.txt, ...)
-        base_name = "solution_output_"
-        file_index = 1
-        while True:
-            candidate_name = f"{base_name}{file_index}.txt"
-            candidate_path = os.path.join(RESULTS_FOLDER, candidate_name)
-            if not os.path.exists(candidate_path):
-                break
-            file_index += 1
-
-        sol_path = candidate_path
-        with open(sol_path, "w", encoding="utf-8") as f:
-            f.write(self.model_solution_text)
+        # The points may have been reset while the model was running; the map
+        # heatmap only applies to the points the model was started with
+        if self._solve_generation == self._generation:
+            self.usage_data = result["usage_data"]
+
+        # solution_output_N.txt (+ .json and the run report)
+        sol_path = write_results(result, RESULTS_FOLDER, heatmap=False, text=self.model_solution_text)
 
         msg = f"{self.model_solution_text}\nFile: {os.path.basename(sol_path)}"
         messagebox.showinfo("Model Solution", msg)
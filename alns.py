@@ -0,0 +1,221 @@
+"""
+Adaptive large neighbourhood search (ALNS) for instances beyond the reach of
+the exact model.
+
+The search works on heuristic.PlanDecisions (demolition start days, TDWMS
+opened from day 1, preferred TDWMS per customer, visiting order weights,
+full-load-only customers and the tour shape); every candidate is turned into
+a complete plan by heuristic.greedy_plan, so each accepted plan satisfies
+every model constraint.
+
+Plans are compared as the two stages do: shorter clean-up time first, then
+lower cost. Worse plans are accepted with simulated-annealing probability,
+cooling linearly over the time budget, and operators that keep producing
+good plans are picked more often (roulette wheel, weights updated every
+SEGMENT iterations).
+"""
+import math
+import random
+import time
+
+from heuristic import greedy_plan, initial_decisions
+
+# Operator scores: new best plan, better than the current plan, accepted
+SCORE_BEST, SCORE_BETTER, SCORE_ACCEPTED = 3.0, 2.0, 1.0
+# How fast operator weights follow their recent scores
+REACTION = 0.2
+# Iterations between operator weight updates
+SEGMENT = 50
+# Starting temperature as a share of the initial plan's cost
+START_TEMPERATURE = 0.05
+# Seconds between progress reports
+PROGRESS_INTERVAL = 1.0
+
+
+def _better(a, b):
+    """True if plan a beats plan b: shorter time, or the same time and a lower cost."""
+    if b is None:
+        return a is not None
+    if a is None:
+        return False
+    return (a.total_time, a.total_cost) < (b.total_time, b.total_cost)
+
+
+class ALNS:
+    """ALNS over the greedy plan's decisions; see run."""
+
+    def __init__(self, uij, customer_idx_list, tdwms_idx_list, final_idx_list, params, T_last=6,
+                 depot_idx=0, seed=0):
+        self.uij = uij
+        self.customers = list(customer_idx_list)
+        self.tdwms = list(tdwms_idx_list)
+        self.finals = list(final_idx_list)
+        self.params = params
+        self.T_last = T_last
+        self.depot_idx = depot_idx
+        self.rng = random.Random(seed)
+
+        self.operators = [self.reschedule, self.open_tdwms, self.close_tdwms, self.reassign,
+                          self.reweight, self.toggle_full_loads, self.toggle_free_tours]
+        self.weights = [1.0] * len(self.operators)
+        self.iterations = 0
+
+    def evaluate(self, decisions):
+        return greedy_plan(self.uij, self.customers, self.tdwms, self.finals, self.params,
+                           T_last=self.T_last, depot_idx=self.depot_idx, decisions=decisions)
+
+    # ------------------------------------------------------------------ operators
+    # Each returns a changed copy of the decisions, or None if it does not apply.
+
+    def _sample_customers(self):
+        k = self.rng.randint(1, max(1, len(self.customers) // 10))
+        return self.rng.sample(self.customers, k)
+
+    def reschedule(self, decisions):
+        """Moves some demolitions to random start days that keep the machine limit."""
+        ti, m = self.params["ti"], self.params["m"]
+        new = decisions.copy()
+        moved = self._sample_customers()
+        busy = {d: 0 for d in range(1, self.T_last + 1)}
+        for i in self.customers:
+            if i not in moved:
+                for d in range(new.start[i], new.start[i] + ti[i]):
+                    busy[d] += 1
+        for i in moved:
+            starts = [s for s in range(1, self.T_last - ti[i] + 2)
+                      if all(busy[d] < m for d in range(s, s + ti[i]))]
+            if not starts:
+                return None
+            new.start[i] = self.rng.choice(starts)
+            for d in range(new.start[i], new.start[i] + ti[i]):
+                busy[d] += 1
+        return new
+
+    def open_tdwms(self, decisions):
+        closed = [j for j in self.tdwms if j not in decisions.opened]
+        if not closed:
+            return None
+        new = decisions.copy()
+        new.opened.append(self.rng.choice(closed))
+        return new
+
+    def close_tdwms(self, decisions):
+        if len(decisions.opened) <= 1:
+            return None
+        new = decisions.copy()
+        j = self.rng.choice(new.opened)
+        new.opened.remove(j)
+        new.assign = {i: jj for i, jj in new.assign.items() if jj != j}
+        return new
+
+    def reassign(self, decisions):
+        """Points some customers to a random open TDWMS (or back to the nearest one)."""
+        new = decisions.copy()
+        for i in self._sample_customers():
+            if self.rng.random() < 0.25:
+                new.assign.pop(i, None)
+            else:
+                new.assign[i] = self.rng.choice(new.opened)
+        return new
+
+    def reweight(self, decisions):
+        new = decisions.copy()
+        for i in self._sample_customers():
+            new.weight[i] = self.rng.uniform(0.5, 2.0)
+        return new
+
+    def toggle_full_loads(self, decisions):
+        new = decisions.copy()
+        new.full_loads ^= set(self._sample_customers())
+        return new
+
+    def toggle_free_tours(self, decisions):
+        new = decisions.copy()
+        new.free_tours = not new.free_tours
+        return new
+
+    # ------------------------------------------------------------------ search
+
+    def _pick_operator(self):
+        return self.rng.choices(range(len(self.operators)), weights=self.weights)[0]
+
+    def run(self, time_budget=60.0, max_iterations=None, progress=None, cancel_event=None):
+        """
+        Searches for time_budget seconds (or max_iterations) and returns the best
+        plan found, or None if no feasible plan was found. progress is called
+        with dicts like cleanup_engine.SolveProgress reports; setting
+        cancel_event stops the search early.
+        """
+        started = time.perf_counter()
+        decisions = initial_decisions(self.uij, self.customers, self.tdwms, self.params, self.T_last)
+        if decisions is None:
+            return None
+        current = self.evaluate(decisions)
+        if current is None:
+            decisions.free_tours = False
+            current = self.evaluate(decisions)
+        best, best_decisions = current, decisions
+
+        scores = [0.0] * len(self.operators)
+        uses = [0] * len(self.operators)
+        temperature0 = START_TEMPERATURE * current.total_cost if current is not None else 0.0
+        last_report = None
+
+        while True:
+            elapsed = time.perf_counter() - started
+            if elapsed >= time_budget or (max_iterations is not None and self.iterations >= max_iterations):
+                break
+            if cancel_event is not None and cancel_event.is_set():
+                break
+            self.iterations += 1
+
+            k = self._pick_operator()
+            candidate_decisions = self.operators[k](decisions)
+            uses[k] += 1
+            if candidate_decisions is None:
+                continue
+            candidate = self.evaluate(candidate_decisions)
+            if candidate is None:
+                continue
+
+            if current is None:
+                # No feasible plan yet: take the first one and start cooling from its cost
+                temperature0 = START_TEMPERATURE * candidate.total_cost
+                accepted = True
+            elif _better(candidate, current):
+                accepted = True
+            else:
+                temperature = temperature0 * max(0.0, 1.0 - elapsed / time_budget)
+                delta = candidate.total_cost - current.total_cost
+                accepted = (candidate.total_time <= current.total_time and temperature > 0
+                            and self.rng.random() < math.exp(-delta / temperature))
+
+            if _better(candidate, best):
+                scores[k] += SCORE_BEST
+                best, best_decisions = candidate, candidate_decisions
+            elif accepted and _better(candidate, current):
+                scores[k] += SCORE_BETTER
+            elif accepted:
+                scores[k] += SCORE_ACCEPTED
+            if accepted:
+                current, decisions = candidate, candidate_decisions
+
+            if self.iterations % SEGMENT == 0:
+                for n in range(len(self.operators)):
+                    if uses[n]:
+                        self.weights[n] = (1 - REACTION) * self.weights[n] + REACTION * scores[n] / uses[n]
+                        self.weights[n] = max(self.weights[n], 0.05)
+                scores = [0.0] * len(self.operators)
+                uses = [0] * len(self.operators)
+
+            if progress is not None and best is not None and (
+                    last_report is None or elapsed - last_report >= PROGRESS_INTERVAL):
+                last_report = elapsed
+                progress({"stage": "ALNS", "incumbent": best.total_cost, "bound": None, "gap": None,
+                          "elapsed": elapsed})
+
+        self.best_decisions = best_decisions
+        return best
+
+    def operator_weights(self):
+        return {op.__name__: w for op, w in zip(self.operators, self.weights)}
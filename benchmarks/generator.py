@@ -0,0 +1,59 @@
+"""
+Seeded generator of synthetic clean-up instances for the benchmarks.
+
+Points are spread uniformly over a disc small enough for every pair to satisfy
+the GUI's 5 km rule; demands, demolition times and site costs are drawn around
+the values of cleanup_model.default_parameters. The same arguments always give
+the same instance.
+"""
+import math
+import os
+import random
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from instance import Instance  # noqa: E402
+from routing import haversine_matrix  # noqa: E402
+
+# Gebze, Kocaeli
+DEFAULT_CENTER = (40.80, 29.43)
+
+KM_PER_DEGREE_LAT = 111.32
+
+
+def _random_point(rng, center, radius_km):
+    r = radius_km * math.sqrt(rng.random())
+    theta = rng.uniform(0, 2 * math.pi)
+    dlat = r * math.sin(theta) / KM_PER_DEGREE_LAT
+    dlon = r * math.cos(theta) / (KM_PER_DEGREE_LAT * math.cos(math.radians(center[0])))
+    return (round(center[0] + dlat, 6), round(center[1] + dlon, 6))
+
+
+def generate_instance(n_customers, n_tdwms, n_finals, T_last=6, machines=1, vehicles=1,
+                      transport_vehicles=1, seed=0, center=DEFAULT_CENTER, radius_km=2.4):
+    """
+    Returns a random Instance. Fleet sizes are counts (K = vehicles, K0 =
+    transport_vehicles); the horizon is not checked against the demolition load,
+    so small horizons with many customers may be infeasible.
+    """
+    rng = random.Random(seed)
+    point = lambda: _random_point(rng, center, radius_km)  # noqa: E731
+    customers = [{"lat": lat, "lon": lon, "W": rng.randrange(80, 220, 10), "t": rng.randint(1, 3)}
+                 for lat, lon in (point() for _ in range(n_customers))]
+    tdwms = [{"lat": lat, "lon": lon, "E": rng.randrange(6000, 10001, 500), "O": rng.randrange(1000, 2001, 100),
+              "s": 25000}
+             for lat, lon in (point() for _ in range(n_tdwms))]
+    depot = point()
+    finals = [point() for _ in range(n_finals)]
+
+    instance = Instance(depot, customers, tdwms, finals, T_last=T_last,
+                        params={"m": machines, "K": vehicles, "K0": transport_vehicles})
+    instance.apply_point_records(customers, tdwms)
+    return instance
+
+
+def synthetic_distances(instance, detour_factor=1.3):
+    """Precomputed n x n road distance matrix: straight-line distance times detour_factor."""
+    return haversine_matrix(instance.coords) * detour_factor
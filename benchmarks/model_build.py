@@ -0,0 +1,93 @@
+"""
+Measures how long CleanupModel takes to build (no solve) on random instances.
+
+    python benchmarks/model_build.py                   # current tree
+    python benchmarks/model_build.py --against HEAD~1  # also time cleanup_model.py from a git revision
+
+Building does not call CPLEX, so instance sizes beyond the Community Edition
+limits can be measured.
+"""
+import argparse
+import importlib.util
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import cleanup_model  # noqa: E402
+
+DEFAULT_SIZES = [(5, 2, 1), (20, 4, 2), (80, 8, 3), (160, 12, 3), (320, 16, 3)]
+
+
+def random_instance(n_customers, n_tdwms, n_finals, seed=0):
+    """Returns (uij, customer_idx_list, tdwms_idx_list, final_idx_list) with random distances."""
+    rng = random.Random(seed)
+    n_total = 1 + n_customers + n_tdwms + n_finals
+    uij = {(i, j): 0.0 if i == j else rng.uniform(0.5, 5.0) for i in range(n_total) for j in range(n_total)}
+    customers = list(range(1, n_customers + 1))
+    tdwms = list(range(n_customers + 1, n_customers + n_tdwms + 1))
+    finals = list(range(n_customers + n_tdwms + 1, n_total))
+    return uij, customers, tdwms, finals
+
+
+def load_revision(rev):
+    """Imports cleanup_model.py as it was at the given git revision."""
+    source = subprocess.check_output(["git", "show", f"{rev}:cleanup_model.py"], cwd=ROOT)
+    path = os.path.join(tempfile.mkdtemp(), "cleanup_model_ref.py")
+    with open(path, "wb") as f:
+        f.write(source)
+    spec = importlib.util.spec_from_file_location("cleanup_model_ref", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def time_build(module, size, T_last, repeat):
+    uij, customers, tdwms, finals = random_instance(*size)
+    params = module.default_parameters(customers, tdwms)
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        model = module.CleanupModel(uij, customers, tdwms, finals, params, T_last=T_last)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, model.mdl.number_of_variables, model.mdl.number_of_constraints
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--against", help="git revision whose cleanup_model.py is timed as well")
+    parser.add_argument("--horizon", type=int, default=6, help="T_last")
+    parser.add_argument("--repeat", type=int, default=3, help="builds per size (best time is reported)")
+    args = parser.parse_args()
+
+    modules = [("current", cleanup_model)]
+    if args.against:
+        modules.append((args.against, load_revision(args.against)))
+
+    header = f"{'customers/tdwms/finals':>24} {'vars':>8} {'cons':>8}"
+    for label, _ in modules:
+        header += f" {label + ' (s)':>14}"
+    if len(modules) == 2:
+        header += f" {'speed-up':>9}"
+    print(header)
+
+    for size in DEFAULT_SIZES:
+        times = []
+        for _, module in modules:
+            seconds, n_vars, n_cons = time_build(module, size, args.horizon, args.repeat)
+            times.append(seconds)
+        row = f"{'/'.join(map(str, size)):>24} {n_vars:>8} {n_cons:>8}"
+        row += "".join(f" {t:>14.3f}" for t in times)
+        if len(times) == 2:
+            row += f" {times[1] / times[0]:>8.1f}x"
+        print(row)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+Local stand-in for the OSRM routing service, for benchmarks without network.
+
+Answers /table/v1/<profile>/<coords> and /route/v1/<profile>/<a>;<b> in the
+OSRM response format. Distances are straight-line distances times a detour
+factor, durations follow from a fixed speed; route geometries are straight
+lines.
+
+    python benchmarks/osrm_stub.py --port 5000
+    # then set routing.OSRM_BASE_URL = "http://127.0.0.1:5000"
+
+From Python:
+
+    with StubOSRMServer() as server:
+        routing.OSRM_BASE_URL = server.url
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from routing import haversine_km  # noqa: E402
+
+
+def _parse_coords(text):
+    """"lon,lat;lon,lat" -> [(lat, lon), ...]"""
+    points = []
+    for pair in text.split(";"):
+        lon, lat = pair.split(",")
+        points.append((float(lat), float(lon)))
+    return points
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "OSRMStub/1.0"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, data):
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        stub = self.server.stub
+        url = urlsplit(self.path)
+        parts = url.path.strip("/").split("/")
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        if stub.latency:
+            time.sleep(stub.latency)
+        stub.requests += 1
+        try:
+            if len(parts) == 4 and parts[0] == "table":
+                self._send(200, stub.table(_parse_coords(parts[3]), query))
+            elif len(parts) == 4 and parts[0] == "route":
+                self._send(200, stub.route(_parse_coords(parts[3]), query))
+            else:
+                self._send(400, {"code": "InvalidUrl", "message": self.path})
+        except (ValueError, IndexError) as e:
+            self._send(400, {"code": "InvalidQuery", "message": str(e)})
+
+
+class StubOSRMServer:
+    """
+    OSRM look-alike on 127.0.0.1 (a free port unless port is given), served from
+    a background thread. requests counts the requests answered.
+    """
+
+    def __init__(self, port=0, detour_factor=1.3, speed_kmh=30.0, latency=0.0):
+        self.detour_factor = detour_factor
+        self.speed_kmh = speed_kmh
+        self.latency = latency
+        self.requests = 0
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", port), _Handler)
+        self._httpd.daemon_threads = True
+        self._httpd.stub = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="osrm-stub", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _leg(self, p, q):
+        """(metres, seconds) of the road leg p -> q."""
+        km = float(haversine_km(p, [q])[0]) * self.detour_factor
+        return km * 1000.0, km / self.speed_kmh * 3600.0
+
+    def table(self, points, query):
+        sources = [int(s) for s in query["sources"].split(";")] if "sources" in query else range(len(points))
+        destinations = ([int(d) for d in query["destinations"].split(";")]
+                        if "destinations" in query else range(len(points)))
+        distances, durations = [], []
+        for s in sources:
+            row = [self._leg(points[s], points[d]) for d in destinations]
+            distances.append([m for m, _ in row])
+            durations.append([sec for _, sec in row])
+        return {"code": "Ok", "distances": distances, "durations": durations}
+
+    def route(self, points, query):
+        metres, seconds = self._leg(points[0], points[-1])
+        route = {"distance": metres, "duration": seconds}
+        if query.get("overview", "simplified") != "false":
+            route["geometry"] = {"type": "LineString", "coordinates": [[lon, lat] for lat, lon in points]}
+        return {"code": "Ok", "routes": [route]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a local OSRM stand-in.")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--detour", type=float, default=1.3, help="road / straight-line distance ratio")
+    parser.add_argument("--speed", type=float, default=30.0, help="km/h used for durations")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    args = parser.parse_args()
+
+    server = StubOSRMServer(args.port, args.detour, args.speed, args.latency)
+    print(f"OSRM stub listening on {server.url}")
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+Times the whole run_model pipeline (distance matrix, model build, Stage 1,
+Stage 2, solution extraction) on generated instances, without network.
+
+    python benchmarks/pipeline.py                           # default sizes
+    python benchmarks/pipeline.py --sizes 5x2x1,10x3x2 --horizon 8 --vehicles 2
+    python benchmarks/pipeline.py --out after.json --compare before.json
+
+Distances come from a local OSRM stand-in (benchmarks/osrm_stub.py) through
+the normal routing code, or with --distances synthetic from a precomputed
+matrix. Results are saved as JSON so runs from different commits can be
+compared with --compare.
+
+The CPLEX Community Edition only solves models of up to 1000 variables and
+constraints; bigger cases are reported with their error unless --no-solve is
+given, which only builds the model.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import routing  # noqa: E402
+from cleanup_engine import road_distances, solve_two_stage  # noqa: E402
+from cleanup_model import CleanupModel  # noqa: E402
+from generator import generate_instance, synthetic_distances  # noqa: E402
+from osrm_stub import StubOSRMServer  # noqa: E402
+from run_report import RunReport  # noqa: E402
+
+DEFAULT_SIZES = [(2, 1, 1), (3, 2, 1), (4, 2, 2), (5, 2, 1)]
+
+
+def parse_sizes(text):
+    """"5x2x1,10x3x2" -> [(5, 2, 1), (10, 3, 2)]"""
+    return [tuple(int(n) for n in size.split("x")) for size in text.split(",")]
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_case(size, args):
+    instance = generate_instance(*size, T_last=args.horizon, machines=args.machines, vehicles=args.vehicles,
+                                 transport_vehicles=args.transport_vehicles, seed=args.seed)
+    if args.distances == "synthetic":
+        instance.distances = synthetic_distances(instance)
+
+    case = {"name": "x".join(map(str, size)), "customers": size[0], "tdwms": size[1], "finals": size[2],
+            "T_last": args.horizon, "seed": args.seed}
+    report = RunReport()
+    report.record_instance(instance)
+    try:
+        with report.phase("distance_matrix"):
+            uij, fallback_pairs = road_distances(instance)
+        if args.no_solve:
+            with report.phase("model_build"):
+                model = CleanupModel(uij, instance.customer_idx_list, instance.tdwms_idx_list,
+                                     instance.final_idx_list, instance.params, T_last=instance.T_last)
+            report.record_model(model.mdl)
+        else:
+            result = solve_two_stage(instance, uij, fallback_pairs, timelimit=args.timelimit,
+                                     log_output=False, report=report)
+            case["optimal_time"] = result["optimal_time"]
+            case["optimal_cost"] = result["optimal_cost"]
+        case["fallback_pairs"] = len(fallback_pairs)
+    except Exception as e:
+        case["error"] = f"{type(e).__name__}: {e}"
+
+    case["phases"] = {p["name"]: p["seconds"] for p in report.phases}
+    case["total_seconds"] = report.total_seconds()
+    case["model"] = report.model
+    case["stages"] = report.stages
+    return case
+
+
+def print_cases(cases, previous=None):
+    previous = {c["name"]: c for c in (previous or {}).get("cases", [])}
+    phases = ["distance_matrix", "model_build", "heuristic", "stage1_solve", "stage2_solve", "solution_extraction"]
+    print(f"{'case':>10} {'vars':>6} {'cons':>6}" + "".join(f" {p[:12]:>12}" for p in phases)
+          + f" {'total':>9} {'time':>6} {'cost':>11}" + (f" {'before':>9} {'change':>7}" if previous else ""))
+    for case in cases:
+        row = f"{case['name']:>10} {case['model'].get('variables', 0):>6} {case['model'].get('constraints', 0):>6}"
+        row += "".join(f" {case['phases'][p]:>12.3f}" if p in case["phases"] else f" {'-':>12}" for p in phases)
+        row += f" {case['total_seconds']:>9.3f}"
+        row += f" {case['optimal_time']:>6.1f}" if case.get("optimal_time") is not None else f" {'-':>6}"
+        row += f" {case['optimal_cost']:>11.2f}" if case.get("optimal_cost") is not None else f" {'-':>11}"
+        before = previous.get(case["name"])
+        if before:
+            row += f" {before['total_seconds']:>9.3f} {case['total_seconds'] / before['total_seconds'] - 1:>+7.0%}"
+        if "error" in case:
+            row += f"  {case['error'][:60]}"
+        print(row)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=parse_sizes, default=DEFAULT_SIZES,
+                        help="comma-separated customers x tdwms x finals, e.g. 5x2x1,10x3x2")
+    parser.add_argument("--horizon", type=int, default=6, help="T_last")
+    parser.add_argument("--machines", type=int, default=2, help="demolition machines (m)")
+    parser.add_argument("--vehicles", type=int, default=1, help="collection vehicles (|K|)")
+    parser.add_argument("--transport-vehicles", type=int, default=1, help="transportation vehicles (|K0|)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--timelimit", type=float, default=600, help="CPLEX time limit per stage (s)")
+    parser.add_argument("--distances", choices=["stub", "synthetic"], default="stub",
+                        help="local OSRM stand-in or a precomputed matrix")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every stub response")
+    parser.add_argument("--no-solve", action="store_true", help="time the model build only")
+    parser.add_argument("--out", help="JSON file for the results")
+    parser.add_argument("--compare", help="earlier results file to compare the totals with")
+    args = parser.parse_args()
+
+    # Measure the routing code itself: no on-disk cache, no public-server rate limit
+    routing.set_route_cache(None)
+    server = StubOSRMServer(latency=args.latency).start()
+    routing.OSRM_BASE_URL = server.url
+    try:
+        cases = [run_case(size, args) for size in args.sizes]
+    finally:
+        server.stop()
+
+    results = {
+        "revision": git_revision(),
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "python": platform.python_version(),
+        "options": {k: v for k, v in vars(args).items() if k not in ("out", "compare")},
+        "stub_requests": server.requests,
+        "cases": cases,
+    }
+
+    previous = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            previous = json.load(f)
+    print_cases(cases, previous)
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,800 @@
+"""
+Headless solve engine: distances, both model stages and result files,
+without any Tk dependency.
+
+Importable API:
+
+    instance = Instance.load("site.json")
+    result = solve(instance)
+    write_results(result, RESULTS_FOLDER)
+
+SolveJob runs the same two-stage solve in a worker process, for callers (the
+GUI) that must stay responsive: progress is read with poll() and cancel() stops
+the search while keeping the best solution found so far.
+
+Command line:
+
+    python cleanup_engine.py site.json --out results/ --set m=2 --set K=3
+    python cleanup_engine.py site.json --horizon 28 --method rolling --window 7
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import queue
+
+from docplex.mp.progress import ProgressListener, ProgressClock
+
+from cleanup_model import CleanupModel
+from decomposition import solve_clusters
+from distance_matrix import DistanceMatrix
+from alns import ALNS
+from heuristic import greedy_plan
+from instance import Instance
+from local_routing import LocalRouter
+from rolling_horizon import RollingHorizon
+from route_cache import RouteCache
+from routing import (ROAD_DETOUR_FACTOR, calibrate_detour_factor, estimated_distance_matrix, get_route_cache,
+                     route_distances, set_local_router, set_route_cache)
+from run_report import RunReport
+
+# Home directory
+home_dir = os.path.expanduser("~")  # e.g., /home/user
+RESULTS_FOLDER = os.path.join(home_dir, "Desktop", "grad project", "app")
+
+# Minimum solve time (s) between two progress reports with the same incumbent
+PROGRESS_INTERVAL = 1.0
+
+# Times at most the used arcs of an estimated-distance plan are routed and the instance solved again
+REFINE_ROUNDS = 3
+
+# Frontier plans whose costs differ by less than this fraction (CPLEX's default MIP gap) count as equally cheap
+PARETO_COST_TOLERANCE = 1e-4
+
+
+class SolveProgress(ProgressListener):
+    """
+    Passes CPLEX progress to callback as a dict (stage, incumbent, bound, gap,
+    elapsed) and aborts the search once cancel_event is set. An aborted CPLEX
+    search still returns its best incumbent.
+    """
+
+    def __init__(self, callback=None, cancel_event=None):
+        super().__init__(ProgressClock.All)
+        self.callback = callback
+        self.cancel_event = cancel_event
+        self.stage = None
+        self._last_time = None
+        self._last_incumbent = None
+
+    def notify_start(self):
+        super().notify_start()
+        self._last_time = None
+        self._last_incumbent = None
+
+    def notify_progress(self, pdata):
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            self.abort()
+        if self.callback is None:
+            return
+
+        incumbent = pdata.current_objective if pdata.has_incumbent else None
+        if (self._last_time is not None and incumbent == self._last_incumbent
+                and pdata.time - self._last_time < PROGRESS_INTERVAL):
+            return
+        self._last_time = pdata.time
+        self._last_incumbent = incumbent
+        self.callback({
+            "stage": self.stage,
+            "incumbent": incumbent,
+            "bound": pdata.best_bound,
+            "gap": pdata.mip_gap if pdata.has_incumbent else None,
+            "elapsed": pdata.time,
+        })
+
+
+def road_distances(instance, distances=None):
+    """
+    Returns (uij, fallback_pairs) for the instance. Distances stored in the
+    instance are used as they are; otherwise they come from the routing service
+    (see DistanceMatrix.matrix), optionally through an existing DistanceMatrix.
+    """
+    uij = instance.uij()
+    if uij is not None:
+        return uij, []
+    if distances is None:
+        distances = DistanceMatrix()
+    return distances.matrix(instance.all_points)
+
+
+def estimated_distances(instance, detour_factor=None, calibration_pairs=0, report=None):
+    """
+    Returns (uij, estimated_pairs) with straight-line road distance estimates
+    for the whole instance, computed in one NumPy pass (see
+    routing.estimated_distance_matrix). The detour factor is detour_factor,
+    else calibrated on calibration_pairs routed pairs, else ROAD_DETOUR_FACTOR.
+    Distances stored in the instance are used as they are. report, if given,
+    records the factor in extra["distance_estimate"].
+    """
+    uij = instance.uij()
+    if uij is not None:
+        return uij, []
+    factor = detour_factor
+    if factor is None and calibration_pairs:
+        factor = calibrate_detour_factor(instance.all_points, sample_size=calibration_pairs)
+        if factor is None:
+            print("No pair could be routed to calibrate the detour factor.")
+    if factor is None:
+        factor = ROAD_DETOUR_FACTOR
+    print(f"Estimated distances: straight line x {factor:.3f}")
+    if report is not None:
+        report.extra["distance_estimate"] = {"detour_factor": factor, "calibration_pairs": calibration_pairs,
+                                             "refined_arcs": []}
+    n = instance.n_total
+    return (estimated_distance_matrix(instance.coords, factor),
+            [(i, j) for i in range(n) for j in range(n) if i != j])
+
+
+def refine_used_arcs(points, uij, estimated_pairs, usage_data):
+    """
+    Replaces the estimates of the arcs usage_data uses by road distances (in
+    place in uij) and returns the list of arcs refined. Arcs the routing service
+    cannot measure keep their estimate.
+    """
+    estimated = set(estimated_pairs)
+    arcs = [arc for arc, flow in usage_data.items() if flow > 0 and arc in estimated]
+    refined = []
+    for (i, j), km in zip(arcs, route_distances([(points[i], points[j]) for i, j in arcs])):
+        if km >= 0:
+            uij[(i, j)] = km
+            refined.append((i, j))
+    return refined
+
+
+def solve_two_stage(instance, uij, fallback_pairs=(), timelimit=36000, mipgap=0.15, log_output=True,
+                    progress=None, cancel_event=None, report=None, warm_start=True, threads=None, pareto=False):
+    """
+    Builds the model once and solves Stage 1 (time) and Stage 2 (cost).
+
+    Returns a result dict with the points, uij, fallback_pairs, optimal_time,
+    optimal_cost, usage_data, opened_tdwms and the RunReport of the run (report,
+    created if not given). optimal_time / optimal_cost are None when the corresponding
+    stage found no solution.
+
+    progress is called with the SolveProgress reports. Setting cancel_event stops
+    the running stage; the result then holds its best incumbent (a Stage-1
+    incumbent is costed as it is) and "cancelled" is True.
+
+    With warm_start, the greedy heuristic plan (heuristic.greedy_plan) is given
+    to CPLEX as a MIP start, so Stage 1 starts with an incumbent. threads limits
+    the CPLEX threads (default: all cores).
+
+    With pareto, Stage 2 is replaced by the time-cost frontier (see
+    _pareto_frontier): result["pareto"] lists the non-dominated plans and the
+    optimal_* values are those of the fastest one (optimal_time is the day it
+    clears the site).
+    """
+    if report is None:
+        report = RunReport()
+    report.record_instance(instance)
+    result = {
+        "points": instance.all_points,
+        "uij": uij,
+        "fallback_pairs": list(fallback_pairs),
+        "T_last": instance.T_last,
+        "optimal_time": None,
+        "optimal_cost": None,
+        "usage_data": {},
+        "opened_tdwms": [],
+        "cancelled": False,
+        "report": report,
+    }
+
+    def cancelled():
+        return cancel_event is not None and cancel_event.is_set()
+
+    def on_progress(data):
+        report.add_progress(data)
+        if progress is not None:
+            progress(data)
+
+    # Both stages share one model: the constraints are built once
+    with report.phase("model_build"):
+        model = CleanupModel(uij, instance.customer_idx_list, instance.tdwms_idx_list,
+                             instance.final_idx_list, instance.params,
+                             T_last=instance.T_last, depot_idx=instance.depot_idx)
+    report.record_model(model.mdl)
+    if threads:
+        model.mdl.parameters.threads = threads
+    if warm_start:
+        with report.phase("heuristic"):
+            plan = greedy_plan(uij, instance.customer_idx_list, instance.tdwms_idx_list,
+                               instance.final_idx_list, instance.params,
+                               T_last=instance.T_last, depot_idx=instance.depot_idx)
+            if plan is not None:
+                model.add_plan_start(plan)
+        report.extra["heuristic"] = (
+            {"time": plan.total_time, "cost": plan.total_cost} if plan is not None else None
+        )
+    listener = SolveProgress(on_progress, cancel_event)
+    model.mdl.add_progress_listener(listener)
+
+    # -------------------- Stage 1: Minimize Time --------------------
+    if cancelled():
+        result["cancelled"] = True
+        return result
+    print(">>> Solving Stage 1: Minimizing Time...")
+    listener.stage = 1
+    with report.phase("stage1_solve"):
+        optimal_time = model.solve_time(timelimit=timelimit, mipgap=mipgap, log_output=log_output)
+    report.record_stage(1, model.mdl, model.solution_time)
+    if optimal_time is None:
+        print("No solution found for time minimization.")
+        result["cancelled"] = cancelled()
+        return result
+    print("Optimal Time:", optimal_time)
+    result["optimal_time"] = optimal_time
+
+    if cancelled():
+        # Keep the Stage-1 incumbent: its cost and flows are those of a feasible plan
+        print("Solve cancelled, keeping the Stage-1 solution.")
+        result["cancelled"] = True
+        with report.phase("solution_extraction"):
+            result["optimal_cost"] = model.total_cost.solution_value
+            result["usage_data"] = model.usage_data(verbose=log_output)
+            result["opened_tdwms"] = model.opened_tdwms()
+        return result
+
+    if pareto:
+        print(">>> Enumerating the time-cost frontier...")
+        result["pareto"] = _pareto_frontier(model, instance, listener, report, timelimit, log_output, cancelled)
+        if result["pareto"]:
+            shortest = result["pareto"][0]
+            result["optimal_time"], result["optimal_cost"] = shortest["time"], shortest["cost"]
+            result["usage_data"], result["opened_tdwms"] = shortest["usage_data"], shortest["opened_tdwms"]
+        result["cancelled"] = cancelled()
+        return result
+
+    # -------------------- Stage 2: Minimize Cost with Time Constraint --------------------
+    print(">>> Solving Stage 2: Minimizing Cost...")
+    listener.stage = 2
+    with report.phase("stage2_solve"):
+        optimal_cost = model.solve_cost(optimal_time, timelimit=timelimit, log_output=log_output)
+    report.record_stage(2, model.mdl, model.solution_cost)
+    if optimal_cost is None:
+        print("No solution found for cost minimization.")
+        return result
+    print("Optimal Cost:", optimal_cost)
+    result["optimal_cost"] = optimal_cost
+    result["cancelled"] = cancelled()
+
+    # Collect usage data
+    with report.phase("solution_extraction"):
+        result["usage_data"] = model.usage_data(verbose=log_output)
+        result["opened_tdwms"] = model.opened_tdwms()
+    return result
+
+
+def _pareto_frontier(model, instance, listener, report, timelimit, log_output, cancelled):
+    """
+    Epsilon-constraint enumeration of the time-cost trade-off on the Stage-1
+    model. The time traded here is CleanupModel.clearance_time, the day the last
+    waste leaves the site: the Stage-1 time is the same for nearly every plan.
+    The cheapest plan comes first; then the site must be cleared a day sooner
+    than by the last plan found, until no plan fits (or none is found within
+    timelimit). Only the right-hand side of that limit changes between solves.
+    Returns the non-dominated plans ({"time", "cost", "usage_data",
+    "opened_tdwms"}) by increasing time.
+    """
+    found = []
+    last_day = instance.T_last
+    while last_day >= 1 and not cancelled():
+        listener.stage = f"Pareto (cleared by day {last_day})"
+        with report.phase(f"pareto_{last_day}"):
+            # Each plan starts from the previous one (the Stage-1 plan for the first)
+            cost = model.solve_cost_by_day(last_day, timelimit=timelimit, log_output=log_output,
+                                           mip_start=model.solution_cost if found else model.solution_time)
+        report.record_stage(f"pareto_{last_day}", model.mdl, model.solution_cost)
+        if cost is None:
+            break  # The site cannot be cleared sooner
+        time = round(model.clearance_time().solution_value)
+        print(f"Pareto point: cleared by day {time}, cost {cost}")
+        found.append({"time": time, "cost": cost, "usage_data": model.usage_data(verbose=False),
+                      "opened_tdwms": model.opened_tdwms()})
+        last_day = time - 1
+
+    # By increasing time; within the MIP gap a faster plan can come out no dearer than a slower one
+    points = []
+    for point in reversed(found):
+        if not points or point["cost"] < points[-1]["cost"] * (1 - PARETO_COST_TOLERANCE):
+            points.append(point)
+    if len(points) == 1:
+        report.extra["pareto_warning"] = ("The frontier has a single plan: the fastest clean-up found is also the "
+                                          "cheapest, so time and cost do not trade off on this instance.")
+        print(f"Warning: {report.extra['pareto_warning']}")
+    return points
+
+
+def _plan_result(instance, uij, fallback_pairs, plan, report):
+    """Result dict like solve_two_stage's for a heuristic plan (values None if there is no plan)."""
+    return {
+        "points": instance.all_points,
+        "uij": uij,
+        "fallback_pairs": list(fallback_pairs),
+        "T_last": instance.T_last,
+        "optimal_time": plan.total_time if plan is not None else None,
+        "optimal_cost": plan.total_cost if plan is not None else None,
+        "usage_data": plan.usage_data() if plan is not None else {},
+        "cancelled": False,
+        "report": report,
+    }
+
+
+def solve_greedy(instance, uij, fallback_pairs=(), report=None):
+    """
+    The greedy heuristic plan alone, as a result dict like solve_two_stage's:
+    optimal_time / optimal_cost hold the plan's values (None if no plan was found).
+    """
+    if report is None:
+        report = RunReport()
+    report.record_instance(instance)
+    with report.phase("heuristic"):
+        plan = greedy_plan(uij, instance.customer_idx_list, instance.tdwms_idx_list,
+                           instance.final_idx_list, instance.params,
+                           T_last=instance.T_last, depot_idx=instance.depot_idx)
+    if plan is None:
+        print("The greedy heuristic found no plan within the horizon.")
+    return _plan_result(instance, uij, fallback_pairs, plan, report)
+
+
+def solve_alns(instance, uij, fallback_pairs=(), time_budget=60.0, seed=0, report=None,
+               progress=None, cancel_event=None):
+    """
+    Adaptive large neighbourhood search (see alns.py) for time_budget seconds,
+    as a result dict like solve_two_stage's. No CPLEX is involved, so there is
+    no size limit and no optimality guarantee.
+    """
+    if report is None:
+        report = RunReport()
+    report.record_instance(instance)
+    search = ALNS(uij, instance.customer_idx_list, instance.tdwms_idx_list, instance.final_idx_list,
+                  instance.params, T_last=instance.T_last, depot_idx=instance.depot_idx, seed=seed)
+
+    def on_progress(data):
+        report.add_progress(data)
+        if progress is not None:
+            progress(data)
+
+    print(f">>> ALNS search for {time_budget:g} s...")
+    with report.phase("alns"):
+        plan = search.run(time_budget, progress=on_progress, cancel_event=cancel_event)
+    report.extra["alns"] = {"iterations": search.iterations, "operator_weights": search.operator_weights()}
+    if plan is None:
+        print("ALNS found no plan within the horizon.")
+    else:
+        print("Best Time:", plan.total_time)
+        print("Best Cost:", plan.total_cost)
+    result = _plan_result(instance, uij, fallback_pairs, plan, report)
+    result["cancelled"] = cancel_event is not None and cancel_event.is_set()
+    return result
+
+
+def solve_rolling(instance, uij, fallback_pairs=(), window=7, step=None, timelimit=36000, mipgap=0.15,
+                  log_output=True, progress=None, cancel_event=None, report=None):
+    """
+    Rolling-horizon solve (see rolling_horizon.py): windows of `window` days,
+    the first `step` of each fixed, as a result dict like solve_two_stage's.
+    timelimit and mipgap apply to every window stage.
+    """
+    if report is None:
+        report = RunReport()
+    report.record_instance(instance)
+    horizon = RollingHorizon(uij, instance.customer_idx_list, instance.tdwms_idx_list,
+                             instance.final_idx_list, instance.params, instance.T_last,
+                             window=window, step=step, depot_idx=instance.depot_idx)
+
+    def on_progress(data):
+        report.add_progress(data)
+        if progress is not None:
+            progress(data)
+
+    plan = horizon.run(timelimit=timelimit, mipgap=mipgap, log_output=log_output,
+                       listener=SolveProgress(on_progress, cancel_event), cancel_event=cancel_event,
+                       report=report)
+    report.extra["rolling_horizon"] = {
+        "window": horizon.window,
+        "step": horizon.step,
+        "windows": plan.windows if plan is not None else None,
+    }
+    if plan is None:
+        print("The rolling horizon found no plan within the horizon.")
+    else:
+        print("Total Time:", plan.total_time)
+        print("Total Cost:", plan.total_cost)
+    result = _plan_result(instance, uij, fallback_pairs, plan, report)
+    result["cancelled"] = cancel_event is not None and cancel_event.is_set()
+    return result
+
+
+def solve_decomposed(instance, uij, fallback_pairs=(), n_clusters=None, workers=None, timelimit=36000,
+                     mipgap=0.15, report=None):
+    """
+    Geographic decomposition (see decomposition.py): both stages per cluster of
+    customers, in parallel worker processes, as a result dict like
+    solve_two_stage's.
+    """
+    if report is None:
+        report = RunReport()
+    report.record_instance(instance)
+    plan = solve_clusters(instance, uij, n_clusters=n_clusters, workers=workers, timelimit=timelimit,
+                          mipgap=mipgap, report=report)
+    if plan is not None:
+        print("Total Time:", plan.total_time)
+        print("Total Cost:", plan.total_cost)
+    return _plan_result(instance, uij, fallback_pairs, plan, report)
+
+
+def solve(instance, distances=None, timelimit=36000, mipgap=0.15, log_output=True, method="mip",
+          warm_start=True, time_budget=60.0, window=7, step=None, n_clusters=None, workers=None,
+          estimate=False, detour_factor=None, calibration_pairs=0, refine=False):
+    """
+    Fetches the distances of the instance and runs both stages (method "mip", see
+    solve_two_stage), only the greedy heuristic (method "greedy", see
+    solve_greedy), the ALNS search (method "alns", see solve_alns), the
+    rolling horizon (method "rolling", see solve_rolling), the geographic
+    decomposition (method "clusters", see solve_decomposed) or the time-cost
+    frontier (method "pareto", see solve_two_stage).
+
+    With estimate, no road distances are fetched: straight-line estimates are
+    used instead (see estimated_distances). With refine as well, the arcs the
+    plan uses are then routed and the instance solved again, up to
+    REFINE_ROUNDS times or until the plan uses no estimated arc; the estimated
+    pairs left are reported as fallback_pairs.
+    """
+    report = RunReport()
+    with report.phase("distance_matrix"):
+        if estimate:
+            uij, fallback_pairs = estimated_distances(instance, detour_factor, calibration_pairs, report)
+        else:
+            uij, fallback_pairs = road_distances(instance, distances)
+
+    def run():
+        if method == "greedy":
+            return solve_greedy(instance, uij, fallback_pairs, report=report)
+        if method == "alns":
+            return solve_alns(instance, uij, fallback_pairs, time_budget=time_budget, report=report)
+        if method == "pareto":
+            return solve_two_stage(instance, uij, fallback_pairs, timelimit=timelimit, mipgap=mipgap,
+                                   log_output=log_output, report=report, warm_start=warm_start, pareto=True)
+        if method == "clusters":
+            return solve_decomposed(instance, uij, fallback_pairs, n_clusters=n_clusters, workers=workers,
+                                    timelimit=timelimit, mipgap=mipgap, report=report)
+        if method == "rolling":
+            return solve_rolling(instance, uij, fallback_pairs, window=window, step=step, timelimit=timelimit,
+                                 mipgap=mipgap, log_output=log_output, report=report)
+        return solve_two_stage(instance, uij, fallback_pairs, timelimit=timelimit, mipgap=mipgap,
+                               log_output=log_output, report=report, warm_start=warm_start)
+
+    result = run()
+    if not (estimate and refine):
+        return result
+    for n in range(1, REFINE_ROUNDS + 1):
+        if result["optimal_cost"] is None or result.get("cancelled"):
+            break
+        with report.phase(f"refine_{n}"):
+            refined = refine_used_arcs(instance.all_points, uij, fallback_pairs, result["usage_data"])
+        if not refined:
+            break
+        print(f">>> Refinement {n}: road distances for {len(refined)} arcs of the plan, solving again...")
+        report.extra["distance_estimate"]["refined_arcs"].append(len(refined))
+        refined = set(refined)
+        fallback_pairs = [pair for pair in fallback_pairs if pair not in refined]
+        result = run()
+    return result
+
+
+def _solve_worker(instance, uij, fallback_pairs, timelimit, mipgap, window, report, messages, cancel_event):
+    """Body of the SolveJob process: reports ("progress", report), then ("done", result) or ("error", text)."""
+    progress = lambda data: messages.put(("progress", data))  # noqa: E731
+    try:
+        if window and window < instance.T_last:
+            result = solve_rolling(instance, uij, fallback_pairs, window=window, timelimit=timelimit,
+                                   mipgap=mipgap, progress=progress, cancel_event=cancel_event, report=report)
+        else:
+            result = solve_two_stage(instance, uij, fallback_pairs, timelimit=timelimit, mipgap=mipgap,
+                                     progress=progress, cancel_event=cancel_event, report=report)
+        messages.put(("done", result))
+    except Exception as e:
+        messages.put(("error", f"{type(e).__name__}: {e}"))
+
+
+class SolveJob:
+    """
+    solve_two_stage in a worker process, so that a solve of several hours neither
+    blocks the caller nor keeps it from cancelling. With a window shorter than
+    the horizon, solve_rolling runs instead.
+
+    The caller polls messages with poll(); cancel() asks CPLEX to stop and the
+    job still finishes with a ("done", result) message holding the best incumbent.
+    """
+
+    def __init__(self, instance, uij, fallback_pairs=(), timelimit=36000, mipgap=0.15, report=None, window=None):
+        # spawn: the GUI process has Tk and routing threads that must not be forked
+        ctx = multiprocessing.get_context("spawn")
+        self.messages = ctx.Queue()
+        self.cancel_event = ctx.Event()
+        self.process = ctx.Process(
+            target=_solve_worker,
+            args=(instance, uij, list(fallback_pairs), timelimit, mipgap, window, report or RunReport(),
+                  self.messages, self.cancel_event),
+            daemon=True,
+        )
+        self.finished = False
+
+    def start(self):
+        self.process.start()
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    @property
+    def cancelling(self):
+        return self.cancel_event.is_set()
+
+    def poll(self):
+        """Returns the (kind, data) messages received since the last call."""
+        alive = self.process.is_alive()
+        messages = []
+        while True:
+            try:
+                messages.append(self.messages.get_nowait())
+            except queue.Empty:
+                break
+        if any(kind in ("done", "error") for kind, _ in messages):
+            self.finished = True
+        elif not alive and not self.finished:
+            # The worker died without reporting (e.g. killed or out of memory)
+            self.finished = True
+            messages.append(("error", f"Solver process exited with code {self.process.exitcode}"))
+        return messages
+
+    def terminate(self):
+        if self.process.is_alive():
+            self.process.terminate()
+
+
+def format_solution(result):
+    """Returns the text written to solution_output_N.txt."""
+    all_points = result["points"]
+    uij = result["uij"]
+    n_total = len(all_points)
+
+    text = ""
+    text += "\n--- SELECTED POINTS (Lat, Lon) ---\n"
+    for idx, (la, lo) in enumerate(all_points):
+        text += f"  [{idx}] => ({la:.5f}, {lo:.5f})\n"
+
+    text += "\n--- DISTANCE MATRIX (KM) ---\n"
+    for i in range(n_total):
+        row_dists = [f"{uij[(i, j)]:.2f}" for j in range(n_total)]
+        text += f"Row {i}: " + "  ".join(row_dists) + "\n"
+
+    estimate = result["report"].extra.get("distance_estimate") if result.get("report") else None
+    if estimate is not None:
+        text += "\n--- ESTIMATED DISTANCES ---\n"
+        text += (f"{len(result['fallback_pairs'])} of {n_total * (n_total - 1)} pairs are straight line"
+                 f" x {estimate['detour_factor']:.3f}")
+        if estimate["calibration_pairs"]:
+            text += f" (factor calibrated on {estimate['calibration_pairs']} routed pairs)"
+        text += "\n"
+        if estimate["refined_arcs"]:
+            text += f"Arcs of the plan refined with road distances: {' + '.join(map(str, estimate['refined_arcs']))}\n"
+    elif result["fallback_pairs"]:
+        text += "\n--- ESTIMATED DISTANCES (OSRM FAILED) ---\n"
+        for i, j in result["fallback_pairs"]:
+            text += f"  [{i}] -> [{j}] = {uij[(i, j)]:.2f} km (straight line x {ROAD_DETOUR_FACTOR})\n"
+
+    if result["optimal_cost"] is not None:
+        text += "\n--- MODEL SOLUTION RESULTS ---\n"
+        if result.get("cancelled"):
+            text += "Solve cancelled: the values below are the best solution found before stopping.\n"
+        text += f"Optimal Time: {result['optimal_time']}\n"
+        text += f"Optimal Cost: {result['optimal_cost']}\n"
+
+    if result.get("pareto"):
+        text += "\n--- TIME-COST FRONTIER ---\n"
+        for point in result["pareto"]:
+            text += f"  Cleared by day: {point['time']:g}  Cost: {point['cost']:.2f}\n"
+        if len(result["pareto"]) == 1:
+            text += "  Only one plan: the fastest clean-up found is also the cheapest, so time and cost do not trade off.\n"
+    return text
+
+
+def next_solution_path(folder):
+    """Returns the first free solution_output_N.txt path in folder."""
+    # File name (solution_output_1.txt, solution_output_2.txt, ...)
+    base_name = "solution_output_"
+    file_index = 1
+    while True:
+        candidate_name = f"{base_name}{file_index}.txt"
+        candidate_path = os.path.join(folder, candidate_name)
+        if not os.path.exists(candidate_path):
+            return candidate_path
+        file_index += 1
+
+
+def write_results(result, folder, heatmap=True, text=None):
+    """
+    Writes solution_output_N.txt, a machine-readable solution_output_N.json next
+    to it, the run report as solution_output_N_report.json and, if heatmap is
+    set, a heatmap PNG. Returns the .txt path.
+    """
+    report = result.get("report") or RunReport()
+    os.makedirs(folder, exist_ok=True)
+    sol_path = next_solution_path(folder)
+    with open(sol_path, "w", encoding="utf-8") as f:
+        f.write(text if text is not None else format_solution(result))
+
+    with open(os.path.splitext(sol_path)[0] + ".json", "w", encoding="utf-8") as f:
+        json.dump({
+            "points": [list(p) for p in result["points"]],
+            "T_last": result["T_last"],
+            "optimal_time": result["optimal_time"],
+            "optimal_cost": result["optimal_cost"],
+            "cancelled": result.get("cancelled", False),
+            "usage": [[x, y, flow] for (x, y), flow in sorted(result["usage_data"].items())],
+            "fallback_pairs": [list(pair) for pair in result["fallback_pairs"]],
+            "pareto": [
+                {"time": point["time"], "cost": point["cost"], "opened_tdwms": point["opened_tdwms"],
+                 "usage": [[x, y, flow] for (x, y), flow in sorted(point["usage_data"].items())]}
+                for point in result.get("pareto", [])
+            ],
+        }, f, indent=2)
+
+    if heatmap and result["usage_data"]:
+        with report.phase("heatmap"):
+            draw_heatmap(result["usage_data"], result["points"], folder)
+
+    if get_route_cache() is not None:
+        report.extra["route_cache"] = get_route_cache().stats()
+    report.save(os.path.splitext(sol_path)[0] + "_report.json")
+    return sol_path
+
+
+def flow_color(flow):
+    if flow <= 5:
+        return "yellow"
+    elif flow <= 10:
+        return "orange"
+    else:
+        return "red"
+
+
+def draw_heatmap(usage_data, all_points, folder):
+    """Draws the node-to-node usage graph and saves it as heatmap_<timestamp>.png in folder."""
+    # Imported here so that importing the engine stays cheap
+    from datetime import datetime
+    import matplotlib.pyplot as plt
+    import networkx as nx
+
+    # Start a new matplotlib figure
+    plt.figure(figsize=(10, 10))
+    G = nx.DiGraph()  # Directed graph
+
+    # Add all nodes
+    for idx, (lat, lon) in enumerate(all_points):
+        G.add_node(idx, pos=(lon, lat))  # (longitude, latitude)
+
+    # Associate density data and draw
+    for (x, y), flow in usage_data.items():
+        color = flow_color(flow)
+        G.add_edge(x, y, weight=flow, color=color)
+
+    # Set node positions
+    pos = nx.get_node_attributes(G, 'pos')
+
+    # Get edge colors and weights
+    edges = G.edges(data=True)
+    edge_colors = [edge[2]['color'] for edge in edges]
+    edge_weights = [edge[2]['weight'] for edge in edges]
+
+    # Draw the graph
+    nx.draw_networkx_nodes(G, pos, node_size=300, node_color='blue', alpha=0.7)
+    nx.draw_networkx_labels(G, pos, font_size=10, font_color='black')
+    nx.draw_networkx_edges(G, pos, edge_color=edge_colors, width=[w / 5 for w in edge_weights], alpha=0.8)
+
+    # Add legend
+    legend_elements = [
+        plt.Line2D([0], [0], color='yellow', lw=2, label='Flow ≤ 5'),
+        plt.Line2D([0], [0], color='orange', lw=2, label='5 < Flow ≤ 10'),
+        plt.Line2D([0], [0], color='red', lw=2, label='Flow > 10')
+    ]
+    plt.legend(handles=legend_elements, loc='upper left', bbox_to_anchor=(1.05, 1))
+
+    # Adjust layout to make room for legend
+    plt.subplots_adjust(right=0.85)
+
+    # Title
+    plt.title("Heatmap (Node-to-Node Usage)", fontsize=15)
+
+    # Save with timestamp
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    filename = f"heatmap_{timestamp}.png"
+    path = os.path.join(folder, filename)
+    plt.savefig(path, bbox_inches='tight')
+    plt.close()
+    return path
+
+
+def parse_overrides(pairs):
+    """Turns ["m=2", "K=3", "g=0.4"] into a parameter dict (values parsed as JSON)."""
+    overrides = {}
+    for pair in pairs or []:
+        key, _, value = pair.partition("=")
+        if not value:
+            raise ValueError(f"Expected key=value, got {pair!r}")
+        try:
+            overrides[key.strip()] = json.loads(value)
+        except json.JSONDecodeError:
+            overrides[key.strip()] = value
+    return overrides
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Solve a waste clean-up instance without the GUI.")
+    parser.add_argument("instance", help="instance file (.json or .csv, see instance.py)")
+    parser.add_argument("--out", default=RESULTS_FOLDER, help="folder for the result files")
+    parser.add_argument("--set", action="append", metavar="KEY=VALUE", dest="overrides",
+                        help="override a model parameter, e.g. --set m=2 --set K=3 (repeatable)")
+    parser.add_argument("--horizon", type=int, help="planning horizon T_last in days")
+    parser.add_argument("--timelimit", type=float, default=36000, help="CPLEX time limit per stage (s)")
+    parser.add_argument("--mipgap", type=float, default=0.15, help="relative MIP gap for Stage 1")
+    parser.add_argument("--method", choices=["mip", "greedy", "alns", "rolling", "clusters", "pareto"],
+                        default="mip",
+                        help="exact two-stage model, the instant greedy plan, the ALNS search, the "
+                             "two-stage model over rolling windows or per cluster of customers, or the "
+                             "whole time-cost frontier")
+    parser.add_argument("--time-budget", type=float, default=60.0, help="ALNS search time (s)")
+    parser.add_argument("--window", type=int, default=7, help="rolling-horizon window length in days")
+    parser.add_argument("--step", type=int, help="days fixed per rolling-horizon window (default: half the window)")
+    parser.add_argument("--clusters", type=int, help="number of customer clusters (default: one per worker)")
+    parser.add_argument("--workers", type=int, help="parallel cluster solves (default: CPU count)")
+    parser.add_argument("--no-warm-start", action="store_true",
+                        help="do not give the greedy plan to CPLEX as a MIP start")
+    parser.add_argument("--no-heatmap", action="store_true", help="do not draw the heatmap PNG")
+    parser.add_argument("--no-cache", action="store_true", help="do not use the on-disk route cache")
+    parser.add_argument("--osm", metavar="PATH",
+                        help="route offline on this road graph (OSM extract or .npz, see local_routing.py)")
+    parser.add_argument("--estimate", action="store_true",
+                        help="use straight-line distance estimates instead of road distances")
+    parser.add_argument("--detour-factor", type=float,
+                        help=f"road / straight-line ratio of the estimates (default: {ROAD_DETOUR_FACTOR}, "
+                             "or calibrated with --calibrate)")
+    parser.add_argument("--calibrate", type=int, default=0, metavar="PAIRS",
+                        help="route this many random pairs to calibrate the detour factor")
+    parser.add_argument("--refine", action="store_true",
+                        help="with --estimate, route the arcs the plan uses and solve again")
+    parser.add_argument("--quiet", action="store_true", help="hide the CPLEX log")
+    args = parser.parse_args(argv)
+
+    instance = Instance.load(args.instance, parse_overrides(args.overrides))
+    if args.horizon is not None:
+        instance.T_last = args.horizon
+    if not args.no_cache and instance.distances is None:
+        set_route_cache(RouteCache(os.path.join(args.out, "route_cache.sqlite3")))
+    if args.osm and instance.distances is None:
+        set_local_router(LocalRouter.load(args.osm))
+
+    result = solve(instance, timelimit=args.timelimit, mipgap=args.mipgap, log_output=not args.quiet,
+                   method=args.method, warm_start=not args.no_warm_start, time_budget=args.time_budget,
+                   window=args.window, step=args.step, n_clusters=args.clusters, workers=args.workers,
+                   estimate=args.estimate, detour_factor=args.detour_factor, calibration_pairs=args.calibrate,
+                   refine=args.refine)
+    sol_path = write_results(result, args.out, heatmap=not args.no_heatmap)
+    print(result["report"].summary())
+    print(f"Results written to {sol_path}")
+    return 0 if result["optimal_cost"] is not None else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,518 @@
+"""
+Two-stage waste clean-up model (Cheng et al., 2020) built once with docplex.
+
+Stage 1 minimizes the total clean-up time. Stage 2 minimizes the total cost on
+the same model, with the clean-up time limited to the Stage-1 optimum (+1 day)
+and the Stage-1 solution given to CPLEX as a MIP start.
+
+Node indices follow the GUI layout: [Depot] + [Customers] + [TDWMS] + [Finals].
+"""
+import numpy as np
+from docplex.mp.constants import EffortLevel
+from docplex.mp.model import Model
+
+
+def default_point_arrays(n_customers, n_tdwms):
+    """
+    The per-point values of default_parameters as NumPy arrays: Wi and ti over
+    the customers, Ej, Oj and sj over the TDWMS, each in node order.
+    """
+
+    # Wi: Total demand of customer node i (in tonnes).
+    # Represents the total amount of waste generated at each customer node (destroyed building).
+    # Source: Paper (Section 3.2, Equation 6).
+    # Example: customers 1, 2 and 3 generate 120, 200 and 180 tonnes; the others 100 tonnes.
+    Wi = np.full(n_customers, 100.0)
+    Wi[:3] = [120, 200, 180][:n_customers]
+
+    # ti: Time required to demolish customer node i (in days).
+    # Represents the number of days needed to demolish each destroyed building.
+    # Source: Paper (Section 3.2, Equation 4).
+    # Example: customers 1, 2 and 3 take 2, 1 and 3 days to demolish; the others 2 days.
+    ti = np.full(n_customers, 2, dtype=np.int32)
+    ti[:3] = [2, 1, 3][:n_customers]
+
+    # Ej: Fixed cost for building the TDWMS j (in AUD).
+    # Represents the establishment cost for each temporary disaster waste management site (TDWMS).
+    # Source: Paper (Section 3.2, Equation 1).
+    Ej = np.full(n_tdwms, 8000.0)  # Example: TDWMS j has an establishment cost of 8000 AUD.
+    # Oj: Operation cost of TDWMS j (in AUD/day).
+    # Represents the daily operational cost for each TDWMS.
+    # Source: Paper (Section 3.2, Equation 1).
+    Oj = np.full(n_tdwms, 1500.0)  # Example: TDWMS j has an operational cost of 1500 AUD/day.
+    # sj: Capacity of TDWMS j (in tonnes).
+    # Represents the maximum amount of waste that can be stored at each TDWMS.
+    # Source: Paper (Section 3.2, Equation 24).
+    sj = np.full(n_tdwms, 25000.0)  # Example: TDWMS j has a capacity of 25000 tonnes.
+
+    return {"Wi": Wi, "ti": ti, "Ej": Ej, "Oj": Oj, "sj": sj}
+
+
+def default_parameters(customer_idx_list, tdwms_idx_list):
+    """Returns the example parameter set used by the GUI (see the paper, Section 3.2)."""
+    customer_idx_list, tdwms_idx_list = list(customer_idx_list), list(tdwms_idx_list)
+    arrays = default_point_arrays(len(customer_idx_list), len(tdwms_idx_list))
+    Wi, ti = (dict(zip(customer_idx_list, arrays[key].tolist())) for key in ("Wi", "ti"))
+    Ej, Oj, sj = (dict(zip(tdwms_idx_list, arrays[key].tolist())) for key in ("Ej", "Oj", "sj"))
+
+    return {
+        "Wi": Wi,
+        "ti": ti,
+        "Ej": Ej,
+        "Oj": Oj,
+        "sj": sj,
+        # m: Number of demolition machines available.
+        # Represents the total number of machines available for demolishing buildings.
+        # Source: Paper (Section 3.2, Equation 5).
+        "m": 1,  # Example: 1 demolition machine is available.
+        # K: Set of available collection vehicles in a day.
+        # Represents the collection vehicles available for waste collection.
+        # Source: Paper (Section 3.2, Equation 14).
+        "K": [1],  # Example: 1 collection vehicle is available.
+        # K0: Set of available transportation vehicles in a day.
+        # Represents the transportation vehicles available for waste transportation.
+        # Source: Paper (Section 3.2, Equation 23).
+        "K0": [1],  # Example: 1 transportation vehicle is available.
+        # Q: Capacity of each collection vehicle (in tonnes).
+        # Represents the maximum amount of waste that can be transported by a collection vehicle in one trip.
+        # Source: Paper (Section 3.2, Equation 9).
+        "Q": 50,  # Example: Each collection vehicle can carry 50 tonnes of waste.
+        # Q0: Capacity of each transportation vehicle (in tonnes).
+        # Represents the maximum amount of waste that can be transported by a transportation vehicle in one trip.
+        # Source: Paper (Section 3.2, Equation 18).
+        "Q0": 40,  # Example: Each transportation vehicle can carry 40 tonnes of waste.
+        # v: Speed of collection vehicles (in km/h).
+        # Represents the speed at which collection vehicles travel.
+        # Source: Paper (Section 3.2, Equation 10).
+        "v": 25,  # Example: Collection vehicles travel at 25 km/h.
+        # v0: Speed of transportation vehicles (in km/h).
+        # Represents the speed at which transportation vehicles travel.
+        # Source: Paper (Section 3.2, Equation 19).
+        "v0": 30,  # Example: Transportation vehicles travel at 30 km/h.
+        # R: Total working time of a vehicle in a day (in minutes).
+        # Represents the maximum daily working time for each vehicle (collection or transportation).
+        # Source: Paper (Section 3.2, Equations 10 and 19).
+        "R": 150,  # Example: Each vehicle can work for 150 minutes per day.
+        # g: Waste recycling rate.
+        # Represents the fraction of waste that can be recycled.
+        # Source: Paper (Section 3.2, Equation 16).
+        "g": 0.35,  # Example: 35% of the waste can be recycled.
+        # ck: Cost per kilometer for collection vehicles (in AUD/km).
+        # Represents the cost of traveling one kilometer for a collection vehicle.
+        # Source: Paper (Section 3.2, Equation 1).
+        "ck": 100,  # Example: Collection vehicles cost 100 AUD per kilometer.
+        # ck0: Cost per kilometer for transportation vehicles (in AUD/km).
+        # Represents the cost of traveling one kilometer for a transportation vehicle.
+        # Source: Paper (Section 3.2, Equation 1).
+        "ck0": 150,  # Example: Transportation vehicles cost 150 AUD per kilometer.
+    }
+
+
+def echelon_arcs(groups):
+    """Returns every (x, y) arc between nodes of two different groups."""
+    return [(x, y) for a in groups for b in groups if a is not b for x in a for y in b]
+
+
+def cost_legs(depot_idx, customer_idx_list, tdwms_idx_list, final_idx_list):
+    """
+    Returns (collection_legs, transport_legs): the arcs charged per km in the cost
+    objective, depot->customer->TDWMS->depot and depot->TDWMS->final->depot.
+    """
+    collection_legs = ([(depot_idx, i) for i in customer_idx_list]
+                       + [(i, j) for i in customer_idx_list for j in tdwms_idx_list]
+                       + [(j, depot_idx) for j in tdwms_idx_list])
+    transport_legs = ([(depot_idx, j) for j in tdwms_idx_list]
+                      + [(j, f) for j in tdwms_idx_list for f in final_idx_list]
+                      + [(f, depot_idx) for f in final_idx_list])
+    return collection_legs, transport_legs
+
+
+class CleanupModel:
+    """
+    Holds the docplex model, its variables and the two objectives.
+
+    uij: {(i, j): road distance in km} over all node indices.
+    params: dict with the paper's parameters, as returned by default_parameters.
+
+    By default the model covers the whole clean-up, from the untouched site to
+    the last day. A rolling-horizon window (see rolling_horizon.py) instead
+    starts from the state the earlier days left (start, a HorizonState: waste
+    at customers and TDWMS, demolitions under way, TDWMS already paid for) and,
+    unless final, does not have to finish the clean-up by its last day.
+    """
+
+    def __init__(self, uij, customer_idx_list, tdwms_idx_list, final_idx_list, params,
+                 T_last=6, depot_idx=0, name="Waste Clean-up", start=None, final=True):
+        self.uij = uij
+        self.depot_idx = depot_idx
+        self.customer_idx_list = list(customer_idx_list)
+        self.tdwms_idx_list = list(tdwms_idx_list)
+        self.final_idx_list = list(final_idx_list)
+        self.params = params
+        self.T_last = T_last
+        self.start = start
+        self.final = final
+        self.T = range(0, T_last + 1)
+        self.days = range(1, T_last + 1)
+
+        # Arcs each vehicle echelon may use. Collection vehicles (aijd) travel between
+        # the depot, customers and TDWMS; transport vehicles (bjld) between the depot,
+        # TDWMS and finals. Arcs inside one group (customer->customer, TDWMS->TDWMS,
+        # ...) or to another echelon's nodes appear in no flow balance, so they could
+        # only waste working time; no variables are created for them.
+        self.collection_arcs = echelon_arcs([[depot_idx], self.customer_idx_list, self.tdwms_idx_list])
+        self.transport_arcs = echelon_arcs([[depot_idx], self.tdwms_idx_list, self.final_idx_list])
+
+        self.mdl = Model(name=name, checker="off")
+        self.solution_time = None
+        self.solution_cost = None
+        self.time_cut = None
+        self.clearance_cut = None
+        self._clearance_time = None
+
+        self._build_variables()
+        self._build_constraints()
+        self._build_objectives()
+
+    def _build_variables(self):
+        mdl = self.mdl
+        customers, tdwms, finals = self.customer_idx_list, self.tdwms_idx_list, self.final_idx_list
+        T, days = self.T, self.days
+
+        self.xid = mdl.binary_var_matrix(customers, days, name="xid")
+        self.yid = mdl.binary_var_matrix(customers, days, name="yid")
+        self.cid = mdl.continuous_var_matrix(customers, T, name="cid", lb=0)
+        self.rid = mdl.continuous_var_matrix(customers, T, name="rid", lb=0)
+        self.sd = mdl.binary_var_list(T, name="sd")
+
+        self.xj = mdl.binary_var_dict(tdwms, name="xj")
+        self.rjd = mdl.continuous_var_matrix(tdwms, T, name="rjd", lb=0)
+        self.lj = mdl.continuous_var_dict(tdwms, name="lj", lb=0)
+
+        self.aijd = mdl.integer_var_dict([(x, y, d) for (x, y) in self.collection_arcs for d in days],
+                                         name="aijd", lb=0)
+        self.zijd = mdl.continuous_var_cube(customers, tdwms, days, name="zijd", lb=0)
+
+        self.bjld = mdl.integer_var_dict([(x, y, d) for (x, y) in self.transport_arcs for d in days],
+                                         name="bjld", lb=0)
+        self.fjld = mdl.continuous_var_cube(tdwms, finals, days, name="fjld", lb=0)
+
+    def _build_constraints(self):
+        # Constraints are generated family by family and handed to docplex in bulk
+        # (add_constraints); sums use sum_vars / scal_prod over precomputed variable
+        # and coefficient lists instead of nested mdl.sum generator expressions.
+        mdl = self.mdl
+        uij = self.uij
+        depot_idx = self.depot_idx
+        customers, tdwms, finals = self.customer_idx_list, self.tdwms_idx_list, self.final_idx_list
+        T_last = self.T_last
+        days = list(self.days)
+        xid, yid, cid, rid, sd = self.xid, self.yid, self.cid, self.rid, self.sd
+        xj, rjd, lj = self.xj, self.rjd, self.lj
+        aijd, zijd, bjld, fjld = self.aijd, self.zijd, self.bjld, self.fjld
+        p = self.params
+        Wi, ti, Oj, sj = p["Wi"], p["ti"], p["Oj"], p["sj"]
+        m, K, K0, Q, Q0, v, v0, R, g = p["m"], p["K"], p["K0"], p["Q"], p["Q0"], p["v"], p["v0"], p["R"], p["g"]
+        final = self.final
+
+        # Day-0 state: the untouched site, or what the days before a rolling-horizon window left
+        start = self.start
+        cid0 = start.cid if start is not None else Wi
+        rid0 = start.rid if start is not None else {i: 0 for i in customers}
+        rjd0 = start.rjd if start is not None else {j: 0 for j in tdwms}
+        started = start.started if start is not None else set()
+        demolition_left = start.demolition_left if start is not None else {}
+        to_start = [i for i in customers if i not in started]
+
+        # Waste shipped from customer i on day d, and into TDWMS j on day d
+        z_out = {(i, d): [zijd[i, j, d] for j in tdwms] for i in customers for d in days}
+        z_in = {(j, d): [zijd[i, j, d] for i in customers] for j in tdwms for d in days}
+        f_out = {(j, d): [fjld[j, f, d] for f in finals] for j in tdwms for d in days}
+
+        mdl.add_constraint(mdl.sum_vars(xj[j] for j in tdwms) >= 1, "min_one_tdwms_open")
+        if start is not None:
+            mdl.add_constraints(xj[j] == 1 for j in tdwms if j in start.opened)
+
+        # Every customer is demolished exactly once; demolition lasts ti days. A
+        # non-final window may leave demolitions to later windows, and demolitions
+        # started before the window go on for their remaining days.
+        if final:
+            mdl.add_constraints(mdl.sum_vars(xid[i, d] for d in days) == 1 for i in to_start)
+        else:
+            mdl.add_constraints(mdl.sum_vars(xid[i, d] for d in days) <= 1 for i in to_start)
+        mdl.add_constraints(mdl.sum_vars(xid[i, d] for d in days) == 0 for i in started)
+        mdl.add_constraints(
+            yid[i, d] == mdl.sum_vars(xid[i, dd] for dd in range(max(1, d - ti[i] + 1), d+1))
+            + (1 if d <= demolition_left.get(i, 0) else 0)
+            for i in customers for d in days
+        )
+        mdl.add_constraints(mdl.sum_vars(yid[i, d] for i in customers) <= m for d in days)
+
+        # Remaining waste at customers: cid[i, d] == Wi[i] - (all waste shipped from i
+        # up to day d), written day over day so each row has J + 2 terms, not J * d + 1
+        mdl.add_constraints(cid[i, 0] == cid0[i] for i in customers)
+        mdl.add_constraints(
+            cid[i, d] == cid[i, d-1] - mdl.sum_vars(z_out[i, d])
+            for i in customers for d in days
+        )
+
+        # Demolished but not yet collected waste at customers
+        mdl.add_constraints(rid[i, 0] == rid0[i] for i in customers)
+        mdl.add_constraints(
+            yid[i, d] * (Wi[i]/ti[i]) + rid[i, d-1] == rid[i, d] + mdl.sum_vars(z_out[i, d])
+            for i in customers for d in days
+        )
+        if final:
+            mdl.add_constraints(rid[i, T_last] == 0 for i in customers)
+
+        # Collection echelon
+        mdl.add_constraints(
+            zijd[i, j, d] <= aijd[i, j, d] * Q
+            for i in customers for j in tdwms for d in days
+        )
+
+        collection_minutes = [uij[(x, y)] / v * 60 for (x, y) in self.collection_arcs]
+        mdl.add_constraints(
+            mdl.scal_prod([aijd[x, y, d] for (x, y) in self.collection_arcs], collection_minutes) <= len(K)*R
+            for d in days
+        )
+
+        mdl.add_constraints(
+            mdl.sum_vars(aijd[depot_idx, i, d] for i in customers)
+            == mdl.sum_vars(aijd[j, depot_idx, d] for j in tdwms)
+            for d in days
+        )
+        mdl.add_constraints(
+            mdl.sum_vars(aijd[x, i, d] for x in [depot_idx]+tdwms)
+            == mdl.sum_vars(aijd[i, y, d] for y in [depot_idx]+tdwms)
+            for i in customers for d in days
+        )
+        mdl.add_constraints(
+            mdl.sum_vars(aijd[x, j, d] for x in [depot_idx]+customers)
+            == mdl.sum_vars(aijd[j, y, d] for y in [depot_idx]+customers)
+            for j in tdwms for d in days
+        )
+        mdl.add_constraints(mdl.sum_vars(aijd[depot_idx, i, d] for i in customers) <= len(K) for d in days)
+
+        if final:
+            mdl.add_constraints(
+                mdl.sum_vars(zijd[i, j, d] for j in tdwms for d in days) == cid0[i]
+                for i in customers
+            )
+
+        # Waste stored at TDWMS
+        mdl.add_constraints(rjd[j, 0] == rjd0[j] for j in tdwms)
+        mdl.add_constraints(
+            (1-g)*mdl.sum_vars(z_in[j, d]) + rjd[j, d-1] == rjd[j, d] + mdl.sum_vars(f_out[j, d])
+            for j in tdwms for d in days
+        )
+        if final:
+            mdl.add_constraints(rjd[j, T_last] == 0 for j in tdwms)
+
+        # Transport echelon
+        mdl.add_constraints(
+            fjld[j, f, d] <= bjld[j, f, d]*Q0
+            for j in tdwms for f in finals for d in days
+        )
+
+        transport_minutes = [uij[(x, y)] / v0 * 60 for (x, y) in self.transport_arcs]
+        mdl.add_constraints(
+            mdl.scal_prod([bjld[x, y, d] for (x, y) in self.transport_arcs], transport_minutes) <= len(K0)*R
+            for d in days
+        )
+
+        mdl.add_constraints(
+            mdl.sum_vars(aijd[depot_idx, i, d] for i in customers + tdwms) >= 1
+            for d in days
+        )
+
+        mdl.add_constraints(
+            mdl.sum_vars(bjld[depot_idx, j, d] for j in tdwms)
+            == mdl.sum_vars(bjld[f, depot_idx, d] for f in finals)
+            for d in days
+        )
+        mdl.add_constraints(
+            mdl.sum_vars(bjld[x, j, d] for x in finals+[depot_idx])
+            == mdl.sum_vars(bjld[j, y, d] for y in finals+[depot_idx])
+            for j in tdwms for d in days
+        )
+        mdl.add_constraints(
+            mdl.sum_vars(bjld[x, f, d] for x in tdwms+[depot_idx])
+            == mdl.sum_vars(bjld[f, x, d] for x in tdwms+[depot_idx])
+            for f in finals for d in days
+        )
+        mdl.add_constraints(mdl.sum_vars(bjld[depot_idx, j, d] for j in tdwms) <= len(K0) for d in days)
+
+        mdl.add_constraints(rjd[j, d] <= xj[j]*sj[j] for j in tdwms for d in self.T)
+
+        if final:
+            mdl.add_constraint(
+                (1-g)*mdl.sum_vars(zijd.values()) + sum(rjd0.values()) == mdl.sum_vars(fjld.values())
+            )
+
+        # sd[d] is forced to 1 once every customer is cleared and every TDWMS emptied
+        mdl.add_constraints(sd[d] >= 1 - cid[i, d]/Wi[i] for d in days for i in customers)
+        mdl.add_constraints(sd[d] >= 1 - rjd[j, d]/sj[j] for d in days for j in tdwms)
+
+        all_sd = mdl.sum_vars(sd)
+        mdl.add_constraints(
+            lj[j] <= ((T_last+1) - all_sd + 1)*Oj[j] + (T_last+1)*Oj[j]*(1 - xj[j])
+            for j in tdwms
+        )
+
+    def _build_objectives(self):
+        mdl = self.mdl
+        uij = self.uij
+        depot_idx = self.depot_idx
+        customers, tdwms, finals = self.customer_idx_list, self.tdwms_idx_list, self.final_idx_list
+        days = list(self.days)
+        xj, lj, aijd, bjld = self.xj, self.lj, self.aijd, self.bjld
+        Ej, ck, ck0 = self.params["Ej"], self.params["ck"], self.params["ck0"]
+
+        # Stage 1: total clean-up time
+        self.total_time = mdl.sum_vars(self.sd[d] for d in days)
+
+        # Stage 2: total cost. Only the depot->customer->TDWMS->depot and
+        # depot->TDWMS->final->depot legs are charged per km. TDWMS opened before
+        # a rolling-horizon window are already paid for.
+        collection_legs, transport_legs = cost_legs(depot_idx, customers, tdwms, finals)
+        opened = self.start.opened if self.start is not None else set()
+
+        totalEstablishmentCost = mdl.scal_prod([xj[j] for j in tdwms],
+                                               [0 if j in opened else Ej[j] for j in tdwms])
+        totalTdwmsOperation = mdl.sum_vars(lj[j] for j in tdwms)
+        totalCollectionCost = mdl.scal_prod(
+            [aijd[x, y, d] for d in days for (x, y) in collection_legs],
+            [uij[(x, y)] * ck for d in days for (x, y) in collection_legs]
+        )
+        totalTransportCost = mdl.scal_prod(
+            [bjld[x, y, d] for d in days for (x, y) in transport_legs],
+            [uij[(x, y)] * ck0 for d in days for (x, y) in transport_legs]
+        )
+
+        self.total_cost = totalEstablishmentCost + totalTdwmsOperation + totalCollectionCost + totalTransportCost
+
+    def plan_solution(self, plan):
+        """Returns the heuristic.GreedyPlan as a docplex solution of this model (every variable set)."""
+        values = {}
+        for name in ("xid", "yid", "cid", "rid", "xj", "rjd", "lj", "aijd", "zijd", "bjld", "fjld"):
+            plan_values = getattr(plan, name)
+            for key, var in getattr(self, name).items():
+                values[var] = plan_values.get(key, 0)
+        for d, var in enumerate(self.sd):
+            values[var] = plan.sd.get(d, 0)
+        return self.mdl.new_solution(values, name="greedy")
+
+    def add_plan_start(self, plan):
+        """Gives the plan to CPLEX as a MIP start for the following solves."""
+        solution = self.plan_solution(plan)
+        self.mdl.add_mip_start(solution)
+        return solution
+
+    def solve_time(self, timelimit=36000, mipgap=0.15, log_output=True):
+        """Stage 1: minimizes the total clean-up time. Returns the optimal time or None."""
+        self.mdl.parameters.timelimit = timelimit
+        self.mdl.parameters.mip.tolerances.mipgap = mipgap
+        self.mdl.minimize(self.total_time)
+        self.solution_time = self.mdl.solve(log_output=log_output)
+        if not self.solution_time:
+            return None
+        return self.solution_time.objective_value
+
+    def solve_cost(self, optimal_time, timelimit=36000, log_output=True):
+        """
+        Stage 2: minimizes the total cost with the clean-up time limited to
+        optimal_time + 1 (small tolerance). Returns the optimal cost or None.
+
+        The constraint set is the one solved in Stage 1; only the objective and the
+        time limit change. The Stage-1 solution satisfies the limit, so it is passed
+        to CPLEX as a MIP start.
+        """
+        return self.solve_cost_within(optimal_time + 1, timelimit=timelimit, log_output=log_output,
+                                      mip_start=self.solution_time)
+
+    def solve_cost_within(self, max_time, timelimit=36000, log_output=True, mip_start=None):
+        """
+        Minimizes the total cost with the clean-up time at most max_time. Only the
+        right-hand side of the time limit changes between calls, so the model is
+        never rebuilt; mip_start (a solution within the limit) is passed to CPLEX.
+        Returns the optimal cost or None.
+        """
+        if self.time_cut is None:
+            self.time_cut = self.mdl.add_constraint(self.total_time <= max_time, "stage2_time_limit")
+        else:
+            self.time_cut.rhs = max_time
+        return self._solve_cost(timelimit, log_output, mip_start)
+
+    def clearance_time(self):
+        """
+        The day the last waste leaves the site: the number of days that end with
+        waste at a customer (cid) or stored at a TDWMS (rjd). total_time cannot
+        tell plans apart by speed (sd is 1 on every day some TDWMS is empty, so
+        on every day unless all of them are in use); this can. Built on first use.
+        """
+        if self._clearance_time is None:
+            mdl = self.mdl
+            days = list(self.days)
+            Wi, sj = self.params["Wi"], self.params["sj"]
+            left = mdl.binary_var_dict(days, name="left")
+            mdl.add_constraints(left[d] >= self.cid[i, d] / Wi[i] for d in days for i in self.customer_idx_list)
+            mdl.add_constraints(left[d] >= self.rjd[j, d] / sj[j] for d in days for j in self.tdwms_idx_list)
+            # Once the site is clear it stays clear, so the sum is the last day with waste
+            mdl.add_constraints(left[d] >= left[d + 1] for d in days[:-1])
+            self._clearance_time = mdl.sum_vars(left[d] for d in days)
+        return self._clearance_time
+
+    def solve_cost_by_day(self, last_day, timelimit=36000, log_output=True, mip_start=None):
+        """
+        Minimizes the total cost with the site cleared by last_day (see
+        clearance_time). Like solve_cost_within, only the right-hand side of the
+        limit changes between calls. mip_start need not fit the new limit (it is
+        typically the plan found for a later day): CPLEX repairs it, and it
+        replaces the MIP starts of earlier calls. Returns the optimal cost or None.
+        """
+        if self.clearance_cut is None:
+            self.clearance_cut = self.mdl.add_constraint(self.clearance_time() <= last_day, "clearance_day_limit")
+        else:
+            self.clearance_cut.rhs = last_day
+            if mip_start:
+                self.mdl.clear_mip_starts()
+        return self._solve_cost(timelimit, log_output, mip_start, effort_level=EffortLevel.Repair)
+
+    def _solve_cost(self, timelimit, log_output, mip_start, effort_level=None):
+        self.mdl.parameters.timelimit = timelimit
+        self.mdl.parameters.mip.tolerances.mipgap.reset()
+        if mip_start:
+            self.mdl.add_mip_start(mip_start, effort_level=effort_level)
+
+        self.mdl.minimize(self.total_cost)
+        self.solution_cost = self.mdl.solve(log_output=log_output)
+        if not self.solution_cost:
+            return None
+        return self.solution_cost.objective_value
+
+    def opened_tdwms(self):
+        """Returns the TDWMS opened (xj = 1) in the last solution."""
+        return [j for j in self.tdwms_idx_list if self.xj[j].solution_value > 0.5]
+
+    def usage_data(self, verbose=True):
+        """Returns {(x, y): number of trips over the horizon} for every arc used by the last solution."""
+        usage_data = {}
+
+        # First echelon (depot -> customer/tdwms)
+        for (x, y) in self.collection_arcs:
+            total_flow = sum(self.aijd[x, y, d].solution_value for d in self.days)
+            if total_flow > 0:  # Only add and print flows greater than zero
+                usage_data[(x, y)] = total_flow
+                if verbose:
+                    print(f"Flow from {x} to {y}: {total_flow}")
+
+        # Second echelon (tdwms -> final)
+        for (x, y) in self.transport_arcs:
+            total_flow = sum(self.bjld[x, y, d].solution_value for d in self.days)
+            if total_flow > 0:  # Only add and print flows greater than zero
+                usage_data[(x, y)] = total_flow
+                if verbose:
+                    print(f"Flow from {x} to {y}: {total_flow}")
+
+        return usage_data
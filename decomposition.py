@@ -0,0 +1,304 @@
+"""
+Geographic decomposition: one small two-stage model per cluster of customers,
+solved in parallel worker processes.
+
+1. Customers are clustered by k-medoids on the road distance matrix, with the
+   medoids chosen among the TDWMS: each cluster is a TDWMS and the customers
+   closest to it, weighted by their waste. Every other TDWMS joins the cluster
+   of its nearest medoid.
+2. Clusters may also use the medoids of their SHARED_NEIGHBOURS nearest
+   clusters. A TDWMS usable by n clusters gives each of them 1/n of its
+   capacity and is charged to each at 1/n of its fixed and daily costs, so
+   neighbouring clusters can settle on one site instead of opening one each.
+3. The fleet is split between the clusters by workload: demolition machines
+   by machine-days (sum of ti), collection and transport vehicles by waste
+   (sum of Wi), at least one of each per cluster. The number of clusters is
+   therefore limited by the smallest fleet.
+4. Each cluster is solved as its own Instance (cleanup_engine.solve_two_stage)
+   in a process pool. Finals have no capacity in the model and are shared.
+5. Coordination: a cluster without a solution (e.g. too little TDWMS capacity
+   or too few vehicles for its waste) is merged with the nearest other
+   cluster, pooling their TDWMS and fleets, and the merged cluster is solved
+   again. This repeats until every cluster has a solution or a single cluster
+   (the whole instance) has none. A TDWMS opened by several clusters is then
+   paid for once.
+
+The clusters work on the same days, so the clean-up time is that of the
+slowest cluster; trips add up. As every cluster keeps to its share of the
+machines, vehicles and TDWMS capacity, the joined plan is feasible for the
+whole instance but not necessarily optimal.
+"""
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+
+from instance import Instance
+
+# Neighbouring clusters whose medoid TDWMS a cluster may share
+SHARED_NEIGHBOURS = 2
+
+
+class Cluster:
+    """Original node indices of one sub-problem, and its fleet share."""
+
+    def __init__(self, medoid, customers, tdwms):
+        self.medoid = medoid
+        self.customers = list(customers)
+        self.tdwms = list(tdwms)  # TDWMS of this cluster
+        self.shared = []  # medoids of neighbouring clusters it may use too
+        self.m = self.K = self.K0 = None
+        self.result = None  # summary of the last solve, see _solve_cluster
+        self.error = None  # why the last solve failed, if it raised
+
+    def merge(self, other):
+        self.customers += other.customers
+        self.tdwms += other.tdwms
+        self.shared = list(dict.fromkeys(j for j in self.shared + other.shared if j not in self.tdwms))
+        self.m += other.m
+        self.K += other.K
+        self.K0 += other.K0
+        self.result = None
+        self.error = None
+
+
+class ClusterPlan:
+    """Joined cluster solutions (GreedyPlan-like totals and usage_data)."""
+
+    def __init__(self, clusters, Ej):
+        self.clusters = clusters
+        self.total_time = max(c.result["time"] for c in clusters)
+        # Each cluster paid its share of the TDWMS it opened; a TDWMS is built once
+        opened = set()
+        self.total_cost = 0.0
+        for c in clusters:
+            self.total_cost += c.result["cost"] - sum(c.result["opened"].values())
+            opened.update(c.result["opened"])
+        self.total_cost += sum(Ej[j] for j in opened)
+        self.opened_tdwms = sorted(opened)
+
+    def usage_data(self):
+        usage_data = {}
+        for cluster in self.clusters:
+            for arc, flow in cluster.result["usage"].items():
+                usage_data[arc] = usage_data.get(arc, 0) + flow
+        return usage_data
+
+
+def _assignment_cost(uij, customers, medoids, weights):
+    return sum(weights[i] * min(uij[(i, j)] for j in medoids) for i in customers)
+
+
+def k_medoids(uij, customer_idx_list, tdwms_idx_list, k, weights=None):
+    """
+    Picks k TDWMS as medoids minimizing the weighted customer -> nearest medoid
+    distance: greedy build, then swaps while they improve (PAM). Returns the
+    medoid list.
+    """
+    weights = weights or {i: 1.0 for i in customer_idx_list}
+    medoids = []
+    while len(medoids) < k:
+        best = min((j for j in tdwms_idx_list if j not in medoids),
+                   key=lambda j: _assignment_cost(uij, customer_idx_list, medoids + [j], weights))
+        medoids.append(best)
+
+    cost = _assignment_cost(uij, customer_idx_list, medoids, weights)
+    improved = True
+    while improved:
+        improved = False
+        for n in range(len(medoids)):
+            for j in tdwms_idx_list:
+                if j in medoids:
+                    continue
+                candidate = medoids[:n] + [j] + medoids[n+1:]
+                candidate_cost = _assignment_cost(uij, customer_idx_list, candidate, weights)
+                if candidate_cost < cost - 1e-9:
+                    medoids, cost, improved = candidate, candidate_cost, True
+    return medoids
+
+
+def cluster_instance(instance, uij, k):
+    """Splits the instance into k clusters around TDWMS medoids (see k_medoids)."""
+    Wi = instance.params["Wi"]
+    medoids = k_medoids(uij, instance.customer_idx_list, instance.tdwms_idx_list, k, weights=Wi)
+    clusters = {j: Cluster(j, [], [j]) for j in medoids}
+    for i in instance.customer_idx_list:
+        clusters[min(medoids, key=lambda j: uij[(i, j)])].customers.append(i)
+    # A medoid no customer is closest to gives no sub-problem; its TDWMS go with the others
+    kept = [j for j in medoids if clusters[j].customers]
+    for j in instance.tdwms_idx_list:
+        if j not in kept:
+            clusters[min(kept, key=lambda med: uij[(j, med)])].tdwms.append(j)
+    return [clusters[j] for j in kept]
+
+
+def share_sites(uij, clusters):
+    """Sets every cluster's shared list to the medoids of its nearest clusters."""
+    for cluster in clusters:
+        others = sorted((c for c in clusters if c is not cluster), key=lambda c: uij[(cluster.medoid, c.medoid)])
+        cluster.shared = [c.medoid for c in others[:SHARED_NEIGHBOURS] if c.medoid not in cluster.tdwms]
+
+
+def _split(total, loads):
+    """Splits an integer total in proportion to loads, at least 1 each (largest remainder)."""
+    shares = [1] * len(loads)
+    spare = total - len(loads)
+    load_sum = sum(loads) or 1.0
+    exact = [spare * load / load_sum for load in loads]
+    for n, value in enumerate(exact):
+        shares[n] += int(value)
+    left = spare - sum(int(value) for value in exact)
+    for n in sorted(range(len(loads)), key=lambda n: exact[n] - int(exact[n]), reverse=True)[:left]:
+        shares[n] += 1
+    return shares
+
+
+def split_fleet(instance, clusters):
+    """Gives every cluster its share of the machines (m) and vehicles (K, K0)."""
+    p = instance.params
+    machine_days = [sum(p["ti"][i] for i in c.customers) for c in clusters]
+    waste = [sum(p["Wi"][i] for i in c.customers) for c in clusters]
+    for cluster, m, K, K0 in zip(clusters, _split(p["m"], machine_days), _split(len(p["K"]), waste),
+                                 _split(len(p["K0"]), waste)):
+        cluster.m, cluster.K, cluster.K0 = m, K, K0
+
+
+def sub_instance(instance, uij, cluster, users):
+    """
+    Returns (Instance, nodes): the cluster as an instance of its own, with the
+    distances and parameters of its points, and nodes[k] the original index of
+    its node k. users[j] is the number of clusters that may use TDWMS j.
+    """
+    p = instance.params
+    tdwms_nodes = cluster.tdwms + cluster.shared
+    nodes = [instance.depot_idx] + cluster.customers + tdwms_nodes + instance.final_idx_list
+    points = instance.all_points
+    customers = range(1, len(cluster.customers) + 1)
+    tdwms = range(len(cluster.customers) + 1, len(cluster.customers) + len(tdwms_nodes) + 1)
+
+    params = {key: p[key] for key in ("Q", "Q0", "v", "v0", "R", "g", "ck", "ck0")}
+    params.update({"m": cluster.m, "K": cluster.K, "K0": cluster.K0})
+    for key in ("Wi", "ti"):
+        params[key] = {k: p[key][nodes[k]] for k in customers}
+    for key in ("Ej", "Oj", "sj"):
+        params[key] = {k: p[key][nodes[k]] / users[nodes[k]] for k in tdwms}
+
+    sub = Instance(points[nodes[0]], [points[i] for i in cluster.customers], [points[j] for j in tdwms_nodes],
+                   [points[f] for f in instance.final_idx_list], params=params, T_last=instance.T_last,
+                   distances=[[uij[(x, y)] for y in nodes] for x in nodes])
+    return sub, nodes
+
+
+def _solve_cluster(sub, nodes, timelimit, mipgap, threads):
+    """
+    Pool task: both stages on one cluster. Returns a summary in original node
+    indices (opened: {TDWMS: fixed cost charged}), or None without a solution.
+    """
+    # Imported here: cleanup_engine imports this module
+    from cleanup_engine import solve_two_stage
+
+    started = time.perf_counter()
+    try:
+        result = solve_two_stage(sub, sub.uij(), timelimit=timelimit, mipgap=mipgap, log_output=False,
+                                 threads=threads)
+    except Exception as e:
+        # docplex exceptions do not always survive the trip back to the parent process
+        raise RuntimeError(f"{type(e).__name__}: {e}") from None
+    if result["optimal_cost"] is None:
+        return None
+    return {
+        "time": result["optimal_time"],
+        "cost": result["optimal_cost"],
+        "usage": {(nodes[x], nodes[y]): flow for (x, y), flow in result["usage_data"].items()},
+        "opened": {nodes[j]: sub.params["Ej"][j] for j in result["opened_tdwms"]},
+        "seconds": time.perf_counter() - started,
+        "variables": result["report"].model.get("variables"),
+    }
+
+
+def solve_clusters(instance, uij, n_clusters=None, workers=None, timelimit=36000, mipgap=0.15, report=None):
+    """
+    Runs the decomposition described above and returns the ClusterPlan, or
+    None if even the merged instance has no solution. n_clusters defaults to
+    the number of worker processes (workers defaults to the CPU count); it is
+    lowered to the number of TDWMS and the smallest fleet.
+    """
+    p = instance.params
+    workers = workers or os.cpu_count() or 1
+    limits = {"clusters asked for": n_clusters or workers, "TDWMS": len(instance.tdwms_idx_list),
+              "machines (m)": p["m"], "collection vehicles (K)": len(p["K"]),
+              "transport vehicles (K0)": len(p["K0"])}
+    k = max(min(limits.values()), 1)
+    if k == 1:
+        limit = min(limits, key=limits.get)
+        warning = (f"Only one cluster is possible ({limit}: {limits[limit]}), so the decomposition solves the whole "
+                   "instance as one model; method mip does the same without the worker process.")
+        print(f"Warning: {warning}")
+        if report is not None:
+            report.extra["cluster_warning"] = warning
+
+    def phase(name):
+        return report.phase(name) if report is not None else nullcontext()
+
+    with phase("clustering"):
+        clusters = cluster_instance(instance, uij, k)
+        split_fleet(instance, clusters)
+        share_sites(uij, clusters)
+    print(f">>> Solving {len(clusters)} clusters in {min(workers, len(clusters))} processes...")
+
+    # spawn: callers (the GUI) may have threads that must not be forked
+    ctx = multiprocessing.get_context("spawn")
+    rounds = 0
+    with ProcessPoolExecutor(max_workers=min(workers, len(clusters)), mp_context=ctx) as pool:
+        while True:
+            rounds += 1
+            users = {}
+            for c in clusters:
+                for j in c.tdwms + c.shared:
+                    users[j] = users.get(j, 0) + 1
+
+            pending = [c for c in clusters if c.result is None]
+            # CPLEX threads per solve, so the parallel solves share the cores
+            threads = max(1, (os.cpu_count() or 1) // min(workers, len(pending)))
+            with phase(f"cluster_solves_{rounds}"):
+                futures = [pool.submit(_solve_cluster, *sub_instance(instance, uij, c, users), timelimit, mipgap,
+                                       threads)
+                           for c in pending]
+                for cluster, future in zip(pending, futures):
+                    # A solve that raises is handled like one without a solution
+                    try:
+                        cluster.result = future.result()
+                    except Exception as e:
+                        cluster.error = str(e)
+                        print(f"Cluster around node {cluster.medoid} could not be solved: {e}")
+
+            failed = [c for c in clusters if c.result is None]
+            if not failed:
+                break
+            if len(clusters) == 1:
+                print(f"The instance could not be solved: {clusters[0].error}" if clusters[0].error
+                      else "The instance has no solution.")
+                return None
+            # Coordination: pool each failed cluster's sites and fleet with its nearest neighbour.
+            # A merged cluster shares no site its parts did not, so the capacity shares
+            # only grow and the clusters already solved stay within their TDWMS capacity.
+            for cluster in failed:
+                if len(clusters) == 1:
+                    break
+                clusters.remove(cluster)
+                nearest = min(clusters, key=lambda c: uij[(cluster.medoid, c.medoid)])
+                print(f"Cluster around node {cluster.medoid} has no solution; merging it with node {nearest.medoid}.")
+                nearest.merge(cluster)
+
+    plan = ClusterPlan(clusters, p["Ej"])
+    if report is not None:
+        report.extra["clusters"] = [
+            {"medoid": c.medoid, "customers": c.customers, "tdwms": c.tdwms, "shared": c.shared,
+             "m": c.m, "K": c.K, "K0": c.K0, "time": c.result["time"], "cost": c.result["cost"],
+             "opened": sorted(c.result["opened"]), "seconds": c.result["seconds"],
+             "variables": c.result["variables"]}
+            for c in clusters
+        ]
+        report.extra["cluster_rounds"] = rounds
+    return plan
@@ -0,0 +1,145 @@
+"""
+Road distance matrix kept up to date while points are placed on the map.
+
+Every new point is measured against the points already placed (one row and one
+column of the matrix), so by the time the model is started all pairs are
+usually known and no further routing calls are needed.
+"""
+import threading
+
+from routing import table_distance_matrix, route_distances, estimated_distance_km
+
+
+class DistanceMatrix:
+    """
+    Driving distances (km) and durations (min) between placed points.
+
+    Pairs are stored by coordinates rather than by index, because the models
+    order the points as [Depot] + [Customers] + [TDWMS] + [Finals] while the
+    map adds them in click order.
+    """
+
+    def __init__(self):
+        self.points = []
+        self._pairs = {}  # (p, q) -> (km, minutes)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.points)
+
+    def __contains__(self, point):
+        return point in self.points
+
+    def known_pairs(self, points):
+        """Returns {(i, j): (km, minutes)} for the pairs of points already measured."""
+        with self._lock:
+            known = {}
+            for i, p in enumerate(points):
+                for j, q in enumerate(points):
+                    pair = self._pairs.get((p, q))
+                    if pair is not None:
+                        known[(i, j)] = pair
+            return known
+
+    def _fetch(self, points):
+        """Measures every missing pair among points and stores the results."""
+        matrix = table_distance_matrix(points, known=self.known_pairs(points))
+        if matrix is None:
+            return None
+        uij, tij = matrix
+        with self._lock:
+            for (i, j), dkm in uij.items():
+                if dkm >= 0:
+                    self._pairs[(points[i], points[j])] = (dkm, tij[(i, j)])
+        return uij
+
+    def add_point(self, point):
+        """
+        Adds point and measures its row and column against the existing points.
+
+        Returns {existing_point: km} with the distances from point to each point
+        placed before it; -1 marks a pair that could not be measured.
+        """
+        with self._lock:
+            existing = [p for p in self.points if p != point]
+            if point not in self.points:
+                self.points.append(point)
+            self._pairs[(point, point)] = (0.0, 0.0)
+        if not existing:
+            return {}
+
+        uij = self._fetch([point] + existing)
+        if uij is None:
+            return {p: -1 for p in existing}
+        return {p: uij[(0, k)] for k, p in enumerate(existing, start=1)}
+
+    def add_points(self, points):
+        """
+        Adds several points at once (a file import) and measures every missing
+        pair among all points with one table fetch.
+
+        Returns {(p, q): km} for the pairs with at least one new point; -1 marks
+        a pair that could not be measured.
+        """
+        with self._lock:
+            new = [p for p in dict.fromkeys(points) if p not in self.points]
+            self.points.extend(new)
+            for p in new:
+                self._pairs[(p, p)] = (0.0, 0.0)
+            everything = list(self.points)
+        if len(everything) < 2:
+            return {}
+
+        uij = self._fetch(everything)
+        new = set(new)
+        return {(p, q): (uij[(i, j)] if uij is not None else -1)
+                for i, p in enumerate(everything) for j, q in enumerate(everything)
+                if i != j and (p in new or q in new)}
+
+    def remove_point(self, point):
+        """Forgets point and every pair that involves it; other pairs are kept."""
+        with self._lock:
+            if point in self.points:
+                self.points.remove(point)
+            for pair in [pair for pair in self._pairs if point in pair]:
+                del self._pairs[pair]
+
+    def clear(self):
+        with self._lock:
+            self.points.clear()
+            self._pairs.clear()
+
+    def matrix(self, points, retries=2):
+        """
+        Returns (uij, fallback_pairs) for the models, uij being the dict of road
+        distances (km) keyed by index into points.
+
+        Only the pairs that are not known yet are fetched, with one /table request.
+        Pairs the table could not provide are retried one by one up to retries
+        times. Whatever is still missing gets a straight-line estimate
+        (estimated_distance_km) instead of failing the whole matrix; those (i, j)
+        pairs are listed in fallback_pairs. Estimates are not stored, so the next
+        call tries the routing service again.
+        """
+        n = len(points)
+        known = self.known_pairs(points)
+        if len(known) < n * n:
+            self._fetch(points)
+            known = self.known_pairs(points)
+
+        missing = [(i, j) for i in range(n) for j in range(n) if (i, j) not in known]
+        for _ in range(retries):
+            if not missing:
+                break
+            results = route_distances([(points[i], points[j]) for i, j in missing])
+            with self._lock:
+                for (i, j), dkm in zip(missing, results):
+                    if dkm >= 0:
+                        self._pairs[(points[i], points[j])] = (dkm, None)
+            known = self.known_pairs(points)
+            missing = [(i, j) for (i, j) in missing if (i, j) not in known]
+
+        uij = {(i, j): pair[0] for (i, j), pair in known.items()}
+        for i, j in missing:
+            uij[(i, j)] = estimated_distance_km(points[i], points[j])
+        return uij, missing
@@ -0,0 +1,342 @@
+"""
+Greedy constructive heuristic for the clean-up model.
+
+Builds a complete plan (every model variable) in one pass over the days:
+
+1. Demolitions are list-scheduled, longest first, at the earliest start that
+   keeps at most m machines busy and ends within the horizon.
+2. Each day the collection vehicles run tours depot -> customer -> TDWMS ->
+   customer -> ... -> depot, or depot -> TDWMS -> customer -> ... -> customer
+   -> depot where it fits, which the cost objective charges less. A tour always
+   goes to the nearest customer with demolished waste, carries at most Q per
+   trip to the nearest open TDWMS with room left (opening the nearest closed
+   one only when no open site has room) and stops when the next trip would not
+   fit the R minute budget.
+3. The transport vehicles then empty the TDWMS the same way, TDWMS -> nearest
+   final, Q0 per trip, within R minutes.
+
+The plan is used as a MIP start for Stage 1 (CleanupModel.add_plan_start), or
+on its own as an instant plan. greedy_plan returns None when the greedy
+schedule does not clear everything within the horizon.
+
+The choices the greedy makes up front can be overridden with PlanDecisions
+(demolition start days, TDWMS opened from the start, preferred TDWMS per
+customer, visiting order weights and full-load-only customers); the ALNS
+search in alns.py works on those.
+"""
+from cleanup_model import cost_legs
+
+# Amounts (tonnes) below this are treated as zero
+EPS = 1e-6
+
+
+class GreedyPlan:
+    """
+    Values of the model variables, keyed like the CleanupModel attributes of the
+    same name. Missing keys are zero.
+    """
+
+    def __init__(self, T_last):
+        self.T_last = T_last
+        self.xid, self.yid, self.cid, self.rid, self.sd = {}, {}, {}, {}, {}
+        self.xj, self.rjd, self.lj = {}, {}, {}
+        self.aijd, self.zijd, self.bjld, self.fjld = {}, {}, {}, {}
+        self.total_time = None
+        self.total_cost = None
+
+    def usage_data(self):
+        """Returns {(x, y): number of trips over the horizon}, like CleanupModel.usage_data."""
+        usage_data = {}
+        for trips in (self.aijd, self.bjld):
+            for (x, y, d), n in trips.items():
+                if n > 0:
+                    usage_data[(x, y)] = usage_data.get((x, y), 0) + n
+        return usage_data
+
+
+class PlanDecisions:
+    """
+    Choices that steer greedy_plan.
+
+    start: {customer: demolition start day}; must respect the machine limit.
+    opened: TDWMS open from day 1 (others open only when these are full).
+    assign: {customer: preferred TDWMS}, used while it has room.
+    weight: {customer: factor on the distance used to pick the next customer}.
+    full_loads: customers collected only in full loads of Q until their
+        demolition has finished.
+    free_tours: try tours that start at a TDWMS (final) and end at a customer
+        (TDWMS) first; see greedy_plan.
+    """
+
+    def __init__(self, start, opened, assign=None, weight=None, full_loads=None, free_tours=True):
+        self.start = dict(start)
+        self.opened = list(opened)
+        self.assign = dict(assign or {})
+        self.weight = dict(weight or {})
+        self.full_loads = set(full_loads or ())
+        self.free_tours = free_tours
+
+    def copy(self):
+        return PlanDecisions(self.start, self.opened, self.assign, self.weight, self.full_loads,
+                             self.free_tours)
+
+
+def initial_decisions(uij, customer_idx_list, tdwms_idx_list, params, T_last=6):
+    """The greedy's own choices, or None if the demolitions do not fit the horizon."""
+    start = _schedule_demolitions(customer_idx_list, params["ti"], params["m"], T_last)
+    if start is None:
+        return None
+    # Start with the TDWMS closest to all customers open; more open on demand
+    opened = [min(tdwms_idx_list, key=lambda j: sum(uij[(i, j)] for i in customer_idx_list))]
+    return PlanDecisions(start, opened)
+
+
+def _add(values, key, amount):
+    values[key] = values.get(key, 0) + amount
+
+
+def _schedule_demolitions(customers, ti, m, T_last):
+    """Returns {customer: start day}, or None if some demolition does not fit."""
+    busy = {d: 0 for d in range(1, T_last + 1)}
+    start = {}
+    for i in sorted(customers, key=lambda i: -ti[i]):
+        for s in range(1, T_last - ti[i] + 2):
+            window = range(s, s + ti[i])
+            if all(busy[d] < m for d in window):
+                for d in window:
+                    busy[d] += 1
+                start[i] = s
+                break
+        else:
+            return None
+    return start
+
+
+def greedy_plan(uij, customer_idx_list, tdwms_idx_list, final_idx_list, params, T_last=6, depot_idx=0,
+                decisions=None):
+    """
+    Returns a GreedyPlan for the model data (see CleanupModel), or None.
+    decisions defaults to initial_decisions.
+    """
+    customers, tdwms, finals = list(customer_idx_list), list(tdwms_idx_list), list(final_idx_list)
+    days = range(1, T_last + 1)
+    p = params
+    Wi, ti, Ej, sj = p["Wi"], p["ti"], p["Ej"], p["sj"]
+    m, Q, Q0, v, v0, R, g = p["m"], p["Q"], p["Q0"], p["v"], p["v0"], p["R"], p["g"]
+    n_vehicles, n_transport = len(p["K"]), len(p["K0"])
+
+    def minutes(x, y):
+        return uij[(x, y)] / v * 60
+
+    def minutes0(x, y):
+        return uij[(x, y)] / v0 * 60
+
+    plan = GreedyPlan(T_last)
+
+    if decisions is None:
+        decisions = initial_decisions(uij, customers, tdwms, params, T_last)
+        if decisions is None:
+            return None
+        plan = greedy_plan(uij, customers, tdwms, finals, params, T_last, depot_idx, decisions)
+        if plan is None:
+            # Depot-to-depot tours only, which leave more of the R minutes for trips
+            decisions.free_tours = False
+            plan = greedy_plan(uij, customers, tdwms, finals, params, T_last, depot_idx, decisions)
+        return plan
+
+    start = decisions.start
+    busy = {d: 0 for d in days}
+    for i in customers:
+        if start[i] < 1 or start[i] + ti[i] - 1 > T_last:
+            return None
+        plan.xid[(i, start[i])] = 1
+        for d in range(start[i], start[i] + ti[i]):
+            plan.yid[(i, d)] = 1
+            busy[d] += 1
+    if any(n > m for n in busy.values()):
+        return None
+
+    opened = list(decisions.opened)
+    assign = decisions.assign
+    weight = decisions.weight
+    full_loads = decisions.full_loads
+    last_day = {i: start[i] + ti[i] - 1 for i in customers}
+    nearest_final = {j: min(finals, key=lambda f: uij[(j, f)]) for j in tdwms}
+
+    remaining = {i: float(Wi[i]) for i in customers}  # cid
+    waiting = {i: 0.0 for i in customers}  # rid
+    stock = {j: 0.0 for j in tdwms}  # rjd
+    for i in customers:
+        plan.cid[(i, 0)] = remaining[i]
+        plan.rid[(i, 0)] = 0.0
+    for j in tdwms:
+        plan.rjd[(j, 0)] = 0.0
+
+    def target_tdwms(i, load):
+        """Preferred TDWMS if it has room, else the nearest open one with room, else the nearest closed one."""
+        j = assign.get(i)
+        if j is not None and stock[j] + (1 - g) * load <= sj[j] + EPS:
+            return j
+        for candidates in (opened, [j for j in tdwms if j not in opened]):
+            fitting = [j for j in candidates if stock[j] + (1 - g) * load <= sj[j] + EPS]
+            if fitting:
+                return min(fitting, key=lambda j: uij[(i, j)])
+        return None
+
+    # Tours that leave the depot towards a TDWMS (a final) and return from a
+    # customer (a TDWMS) keep the depot balanced and are only charged for their
+    # loaded legs (see cleanup_model.cost_legs); they are used whenever they fit.
+    free_tours = decisions.free_tours
+    entry = min(tdwms, key=lambda j: minutes(depot_idx, j))
+    exit_via = {j: min(customers, key=lambda i: minutes(j, i) + minutes(i, depot_idx)) for j in tdwms}
+    entry0 = min(finals, key=lambda f: minutes0(depot_idx, f))
+    exit0_via = {f: min(tdwms, key=lambda j: minutes0(f, j) + minutes0(j, depot_idx)) for f in finals}
+
+    def collection_tour(d, free):
+        """Runs one collection tour on day d; returns False if it could make no trip."""
+        if free:
+            pos, used = entry, minutes(depot_idx, entry)
+            back = lambda j: minutes(j, exit_via[j]) + minutes(exit_via[j], depot_idx)  # noqa: E731
+        else:
+            pos, used = depot_idx, 0.0
+            back = lambda j: minutes(j, depot_idx)  # noqa: E731
+        trips = 0
+        while True:
+            best = None
+            for i in customers:
+                if waiting[i] <= EPS:
+                    continue
+                if i in full_loads and waiting[i] < Q - EPS and d < last_day[i]:
+                    continue
+                load = min(Q, waiting[i])
+                j = target_tdwms(i, load)
+                if j is None:
+                    continue
+                needed = minutes(pos, i) + minutes(i, j) + back(j)
+                key = minutes(pos, i) * weight.get(i, 1.0)
+                if used + needed <= R and (best is None or key < best[0]):
+                    best = (key, i, j, load)
+            if best is None:
+                break
+            _, i, j, load = best
+            _add(plan.aijd, (pos, i, d), 1)
+            _add(plan.aijd, (i, j, d), 1)
+            _add(plan.zijd, (i, j, d), load)
+            used += minutes(pos, i) + minutes(i, j)
+            waiting[i] -= load
+            remaining[i] -= load
+            stock[j] += (1 - g) * load
+            if j not in opened:
+                opened.append(j)
+            pos, trips = j, trips + 1
+        if trips == 0:
+            return False
+        if free:
+            _add(plan.aijd, (depot_idx, entry, d), 1)
+            _add(plan.aijd, (pos, exit_via[pos], d), 1)
+            _add(plan.aijd, (exit_via[pos], depot_idx, d), 1)
+        else:
+            _add(plan.aijd, (pos, depot_idx, d), 1)
+        return True
+
+    def transport_tour(d, free):
+        """Runs one transport tour on day d; returns False if it could make no trip."""
+        if free:
+            pos, used = entry0, minutes0(depot_idx, entry0)
+            back = lambda f: minutes0(f, exit0_via[f]) + minutes0(exit0_via[f], depot_idx)  # noqa: E731
+        else:
+            pos, used = depot_idx, 0.0
+            back = lambda f: minutes0(f, depot_idx)  # noqa: E731
+        trips = 0
+        while True:
+            best = None
+            for j in tdwms:
+                if stock[j] <= EPS:
+                    continue
+                f = nearest_final[j]
+                needed = minutes0(pos, j) + minutes0(j, f) + back(f)
+                if used + needed <= R and (best is None or minutes0(pos, j) < best[0]):
+                    best = (minutes0(pos, j), j, f)
+            if best is None:
+                break
+            _, j, f = best
+            load = min(Q0, stock[j])
+            _add(plan.bjld, (pos, j, d), 1)
+            _add(plan.bjld, (j, f, d), 1)
+            _add(plan.fjld, (j, f, d), load)
+            used += minutes0(pos, j) + minutes0(j, f)
+            stock[j] -= load
+            pos, trips = f, trips + 1
+        if trips == 0:
+            return False
+        if free:
+            _add(plan.bjld, (depot_idx, entry0, d), 1)
+            _add(plan.bjld, (pos, exit0_via[pos], d), 1)
+            _add(plan.bjld, (exit0_via[pos], depot_idx, d), 1)
+        else:
+            _add(plan.bjld, (pos, depot_idx, d), 1)
+        return True
+
+    shapes = (True, False) if free_tours else (False,)
+    for d in days:
+        for i in customers:
+            if plan.yid.get((i, d)):
+                waiting[i] += Wi[i] / ti[i]
+
+        # -------------------- Collection tours --------------------
+        tours = 0
+        for _ in range(n_vehicles):
+            if not any(collection_tour(d, free) for free in shapes):
+                break
+            tours += 1
+
+        if tours == 0:
+            # Every day needs at least one vehicle leaving the depot; send an empty
+            # one around the shortest loop
+            if free_tours:
+                i = min(customers, key=lambda i: minutes(entry, i) + minutes(i, depot_idx))
+                loop = [(depot_idx, entry), (entry, i), (i, depot_idx)]
+            else:
+                i, j = min(((i, j) for i in customers for j in tdwms),
+                           key=lambda ij: minutes(depot_idx, ij[0]) + minutes(*ij) + minutes(ij[1], depot_idx))
+                loop = [(depot_idx, i), (i, j), (j, depot_idx)]
+            if sum(minutes(x, y) for x, y in loop) > R:
+                return None
+            for x, y in loop:
+                _add(plan.aijd, (x, y, d), 1)
+
+        # -------------------- Transport tours --------------------
+        for _ in range(n_transport):
+            if not any(transport_tour(d, free) for free in shapes):
+                break
+
+        for i in customers:
+            plan.cid[(i, d)] = remaining[i] if remaining[i] > EPS else 0.0
+            plan.rid[(i, d)] = waiting[i] if waiting[i] > EPS else 0.0
+        for j in tdwms:
+            if stock[j] > sj[j] + EPS:
+                return None
+            plan.rjd[(j, d)] = stock[j] if stock[j] > EPS else 0.0
+
+    if any(remaining[i] > EPS for i in customers) or any(stock[j] > EPS for j in tdwms):
+        return None
+
+    for j in tdwms:
+        plan.xj[j] = 1 if j in opened else 0
+        plan.lj[j] = 0.0
+
+    # sd[d] is the smallest value its constraints allow
+    for d in range(0, T_last + 1):
+        cleared = any(plan.cid[(i, d)] < Wi[i] - EPS for i in customers)
+        emptied = any(plan.rjd[(j, d)] < sj[j] - EPS for j in tdwms)
+        plan.sd[d] = 1 if cleared or emptied else 0
+
+    collection_legs, transport_legs = cost_legs(depot_idx, customers, tdwms, finals)
+    plan.total_time = sum(plan.sd[d] for d in days)
+    plan.total_cost = (
+        sum(Ej[j] * plan.xj[j] for j in tdwms)
+        + sum(plan.lj.values())
+        + sum(plan.aijd.get((x, y, d), 0) * uij[(x, y)] * p["ck"] for d in days for (x, y) in collection_legs)
+        + sum(plan.bjld.get((x, y, d), 0) * uij[(x, y)] * p["ck0"] for d in days for (x, y) in transport_legs)
+    )
+    return plan
@@ -0,0 +1,404 @@
+"""
+Problem instance for the clean-up model: the points and every model parameter.
+
+Instances can be built from the GUI's point lists or loaded from a file.
+
+JSON layout (per-point values are optional; missing ones take the defaults of
+cleanup_model.default_parameters):
+
+    {
+      "depot": [lat, lon],
+      "customers": [{"lat": .., "lon": .., "W": 120, "t": 2}, ...],
+      "tdwms": [{"lat": .., "lon": .., "E": 8000, "O": 1500, "s": 25000}, ...],
+      "finals": [[lat, lon], ...],
+      "parameters": {"m": 1, "K": 1, "K0": 1, "Q": 50, ...},
+      "T_last": 6,
+      "distances": [[km, ...], ...]
+    }
+
+"distances" is an optional n x n road distance matrix in model order
+([Depot] + [Customers] + [TDWMS] + [Finals]); without it the distances are
+fetched from the routing service. K and K0 may be given as vehicle counts.
+
+CSV layout: one row per point with the columns
+type,lat,lon,W,t,E,O,s where type is depot, customer, tdwms or final.
+Fleet parameters are not part of the CSV; pass them as overrides.
+
+GeoJSON layout: a FeatureCollection of Point features whose properties hold
+the type and the per-point values of the CSV columns; "parameters", "T_last"
+and "distances" may be given as in the JSON layout, next to "features":
+
+    {
+      "type": "FeatureCollection",
+      "features": [
+        {"type": "Feature", "geometry": {"type": "Point", "coordinates": [lon, lat]},
+         "properties": {"type": "customer", "W": 120, "t": 2}},
+        ...
+      ],
+      "parameters": {"m": 2, ...}
+    }
+
+The points of each type keep the order of the file.
+"""
+import copy
+import csv
+import json
+
+import numpy as np
+
+from cleanup_model import default_parameters, default_point_arrays
+
+# Fleet and site parameters that apply to the whole instance
+SCALAR_PARAMETERS = ["m", "K", "K0", "Q", "Q0", "v", "v0", "R", "g", "ck", "ck0"]
+
+# Per-point parameters: file field -> (model parameter, type)
+CUSTOMER_FIELDS = {"W": ("Wi", float), "t": ("ti", int)}
+TDWMS_FIELDS = {"E": ("Ej", float), "O": ("Oj", float), "s": ("sj", float)}
+CUSTOMER_PARAMETERS = {param for param, _ in CUSTOMER_FIELDS.values()}
+# Model parameter -> (file field, the fields it belongs to), to check overrides like the files
+_PARAMETER_FIELDS = {param: (field, fields) for fields in (CUSTOMER_FIELDS, TDWMS_FIELDS)
+                     for field, (param, _) in fields.items()}
+
+# Per-point fields the model divides by (W, t, s), which must be positive; E and O may be 0
+POSITIVE_FIELDS = {"W", "t", "s"}
+
+# Point types of the CSV and GeoJSON layouts
+POINT_TYPES = ("depot", "customer", "tdwms", "final")
+
+# Decimals (km) kept when the float32 distance matrix is read back
+DISTANCE_DECIMALS = 4
+
+
+def _point(value):
+    if isinstance(value, dict):
+        return (float(value["lat"]), float(value["lon"]))
+    return (float(value[0]), float(value[1]))
+
+
+def point_array(points):
+    """(n, 2) float64 array of points given as (lat, lon) pairs, {"lat", "lon"} dicts or an array."""
+    if isinstance(points, np.ndarray):
+        return points.astype(np.float64).reshape(-1, 2)
+    return np.array([_point(p) for p in points], dtype=np.float64).reshape(-1, 2)
+
+
+def _tuples(coords):
+    return [tuple(p) for p in coords.tolist()]
+
+
+def _vehicle_set(value):
+    """K and K0 are sets of vehicles in the model; files may give a count instead."""
+    if isinstance(value, (list, tuple)):
+        return list(value)
+    return list(range(1, int(value) + 1))
+
+
+def _empty_rows():
+    return {kind: [] for kind in POINT_TYPES}
+
+
+def _point_type(value, path):
+    kind = str(value).strip().lower()
+    if kind not in POINT_TYPES:
+        raise ValueError(f"Unknown point type in {path}: {value}")
+    return kind
+
+
+def _csv_records(path):
+    rows = _empty_rows()
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        for row in csv.DictReader(f):
+            rows[_point_type(row["type"], path)].append({k: v for k, v in row.items() if v not in (None, "")})
+    return rows
+
+
+def _json_records(data, path):
+    if data.get("type") == "FeatureCollection":
+        rows = _empty_rows()
+        for feature in data["features"]:
+            properties = dict(feature.get("properties") or {})
+            lon, lat = feature["geometry"]["coordinates"][:2]
+            rows[_point_type(properties.pop("type", None), path)].append({"lat": lat, "lon": lon, **properties})
+        return rows
+    return {"depot": [data["depot"]] if "depot" in data else [], "customer": list(data.get("customers", [])),
+            "tdwms": list(data.get("tdwms", [])), "final": list(data.get("finals", []))}
+
+
+def check_point_record(record, fields):
+    """
+    Raises ValueError if a per-point value of the record (CUSTOMER_FIELDS or
+    TDWMS_FIELDS) is not a number, is negative, is 0 in one of POSITIVE_FIELDS,
+    or is not whole where the model takes an integer (t, in days). Absent
+    fields are fine.
+    """
+    for field, (_, kind) in fields.items():
+        if field not in record:
+            continue
+        try:
+            value = float(record[field])
+        except (TypeError, ValueError):
+            raise ValueError(f"{field} must be a number, got {record[field]!r}") from None
+        if not np.isfinite(value) or value < 0 or (value == 0 and field in POSITIVE_FIELDS):
+            raise ValueError(f"{field} must be {'greater than 0' if field in POSITIVE_FIELDS else '0 or more'}, "
+                             f"got {record[field]!r}")
+        if kind is int and not value.is_integer():
+            raise ValueError(f"{field} must be a whole number, got {record[field]!r}")
+
+
+def read_point_records(path):
+    """
+    Returns {type: [record, ...]} with the points of a .csv, .json or .geojson
+    file in any of the layouts above, by type (depot, customer, tdwms, final).
+    A record is a {"lat", "lon", ...} dict or a [lat, lon] pair. Unlike
+    Instance.load, any type may be missing, e.g. in a survey of damaged
+    buildings only.
+    """
+    if path.lower().endswith(".csv"):
+        return _csv_records(path)
+    with open(path, "r", encoding="utf-8") as f:
+        return _json_records(json.load(f), path)
+
+
+class Instance:
+    """
+    Points (latitude, longitude) of one clean-up problem and its parameters,
+    held in NumPy arrays so that sites with thousands of damaged buildings
+    carry no per-point Python objects:
+
+    coords: (n_total, 2) float64 array in model order.
+    arrays: per-point parameters ("Wi", "ti" over the customers, "Ej", "Oj",
+        "sj" over the TDWMS), each an array in node order within its group.
+    scalars: the fleet and site parameters (m, K, K0, Q, ...).
+    distances: dense (n_total, n_total) float32 road distance matrix (km), or None.
+
+    params gives the parameters in the form the model builders take.
+    """
+
+    def __init__(self, depot, customers, tdwms, finals, params=None, T_last=6, distances=None):
+        self.n_customers, self.n_tdwms, self.n_finals = len(customers), len(tdwms), len(finals)
+        self.coords = np.concatenate([point_array([depot]), point_array(customers), point_array(tdwms),
+                                      point_array(finals)])
+        self.T_last = int(T_last)
+        self.distances = distances
+
+        self.arrays = default_point_arrays(self.n_customers, self.n_tdwms)
+        self.scalars = {key: value for key, value in default_parameters([], []).items()
+                        if key in SCALAR_PARAMETERS}
+        if params:
+            self.update_parameters(params)
+
+    @property
+    def distances(self):
+        return self._distances
+
+    @distances.setter
+    def distances(self, value):
+        if value is not None:
+            value = np.asarray(value, dtype=np.float32)
+            if value.shape != (self.n_total, self.n_total):
+                raise ValueError(f"Expected a {self.n_total} x {self.n_total} distance matrix, got {value.shape}")
+        self._distances = value
+
+    @property
+    def depot(self):
+        return tuple(self.coords[0].tolist())
+
+    @property
+    def customers(self):
+        return _tuples(self.coords[1:1 + self.n_customers])
+
+    @property
+    def tdwms(self):
+        start = 1 + self.n_customers
+        return _tuples(self.coords[start:start + self.n_tdwms])
+
+    @property
+    def finals(self):
+        return _tuples(self.coords[1 + self.n_customers + self.n_tdwms:])
+
+    @property
+    def all_points(self):
+        # [Depot] + [Customers] + [TDWMS] + [Finals]
+        return _tuples(self.coords)
+
+    @property
+    def n_total(self):
+        return 1 + self.n_customers + self.n_tdwms + self.n_finals
+
+    @property
+    def depot_idx(self):
+        return 0
+
+    @property
+    def customer_idx_list(self):
+        return list(range(1, self.n_customers + 1))
+
+    @property
+    def tdwms_idx_list(self):
+        start = self.n_customers + 1
+        return list(range(start, start + self.n_tdwms))
+
+    @property
+    def final_idx_list(self):
+        start = self.n_customers + self.n_tdwms + 1
+        return list(range(start, start + self.n_finals))
+
+    def _offset(self, key):
+        """Node index of the first element of per-point array key."""
+        return 1 if key in CUSTOMER_PARAMETERS else 1 + self.n_customers
+
+    @property
+    def params(self):
+        """
+        The parameters as cleanup_model.default_parameters returns them:
+        per-point dicts keyed by node index plus the scalars. Built from the
+        arrays on every access; change parameters with update_parameters.
+        """
+        params = {key: list(value) if isinstance(value, list) else value for key, value in self.scalars.items()}
+        for key, values in self.arrays.items():
+            offset = self._offset(key)
+            params[key] = dict(zip(range(offset, offset + len(values)), values.tolist()))
+        return params
+
+    def update_parameters(self, overrides):
+        """
+        Applies parameter overrides. Scalars (m, K, Q, ...) replace the defaults.
+        Per-point parameters (Wi, ti, Ej, Oj, sj) take a dict merged by node
+        index, a sequence with one value per point, or one number for every point;
+        they must be valid point values (see check_point_record), or ValueError
+        is raised before anything changes.
+        """
+        for key, value in overrides.items():
+            if key in _PARAMETER_FIELDS:
+                field, fields = _PARAMETER_FIELDS[key]
+                for point_value in (value.values() if isinstance(value, dict) else np.ravel(value).tolist()):
+                    try:
+                        check_point_record({field: point_value}, {field: fields[field]})
+                    except ValueError as e:
+                        raise ValueError(f"{key}: {e}") from None
+        for key, value in overrides.items():
+            if key in ("K", "K0"):
+                self.scalars[key] = _vehicle_set(value)
+            elif key in SCALAR_PARAMETERS:
+                self.scalars[key] = value
+            elif key in self.arrays:
+                values = self.arrays[key]
+                if isinstance(value, dict):
+                    positions = np.array([int(k) for k in value], dtype=np.int64) - self._offset(key)
+                    if len(positions) and (positions.min() < 0 or positions.max() >= len(values)):
+                        raise ValueError(f"{key} given for a node that is not a "
+                                         f"{'customer' if key in CUSTOMER_PARAMETERS else 'TDWMS'}")
+                    values[positions] = list(value.values())
+                else:
+                    values[:] = value
+            else:
+                raise ValueError(f"Unknown parameter: {key}")
+
+    def copy(self):
+        """A copy whose arrays and parameters can be changed without touching this instance."""
+        other = copy.copy(self)
+        other.coords = self.coords.copy()
+        other.arrays = {key: values.copy() for key, values in self.arrays.items()}
+        other.scalars = copy.deepcopy(self.scalars)
+        return other
+
+    def _distance_rows(self):
+        # float32 keeps about 7 digits; rounding to 0.1 m drops the noise the conversion adds
+        return np.round(self.distances.astype(np.float64), DISTANCE_DECIMALS).tolist()
+
+    def uij(self):
+        """Returns the distance dict used by the model, or None if the instance has no distances."""
+        if self.distances is None:
+            return None
+        rows = self._distance_rows()
+        n = self.n_total
+        return {(i, j): rows[i][j] for i in range(n) for j in range(n)}
+
+    # ------------------------------------------------------------------ loading
+
+    @classmethod
+    def load(cls, path, overrides=None):
+        """Loads a .json, .geojson or .csv instance file; overrides are applied on top."""
+        if path.lower().endswith(".csv"):
+            instance = cls.from_csv(path)
+        else:
+            instance = cls.from_json(path)
+        if overrides:
+            instance.update_parameters(overrides)
+        return instance
+
+    @classmethod
+    def from_json(cls, path):
+        """Reads the JSON layout, or a GeoJSON FeatureCollection (see the module docstring)."""
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        instance = cls._from_rows(_json_records(data, path), path, T_last=data.get("T_last", 6),
+                                  distances=data.get("distances"))
+        if data.get("parameters"):
+            instance.update_parameters(data["parameters"])
+        return instance
+
+    @classmethod
+    def from_csv(cls, path):
+        return cls._from_rows(_csv_records(path), path)
+
+    @classmethod
+    def _from_rows(cls, rows, path, **kwargs):
+        """Builds the instance from point records grouped by type (see _empty_rows)."""
+        if len(rows["depot"]) != 1:
+            raise ValueError(f"{path} must contain exactly one depot")
+        instance = cls(rows["depot"][0], rows["customer"], rows["tdwms"], rows["final"], **kwargs)
+        instance.apply_point_records(rows["customer"], rows["tdwms"])
+        return instance
+
+    def apply_point_records(self, customer_records, tdwms_records):
+        """
+        Sets the per-point parameters given in the records of the customers and
+        TDWMS ({"W": .., "t": ..} and {"E": .., "O": .., "s": ..} dicts, in node
+        order, as read_point_records returns them); absent fields keep their value.
+        Raises ValueError, before changing anything, if a value is invalid (see
+        check_point_record).
+        """
+        for name, records, fields in (("Customer", customer_records, CUSTOMER_FIELDS),
+                                      ("TDWMS", tdwms_records, TDWMS_FIELDS)):
+            for n, record in enumerate(records, start=1):
+                if isinstance(record, dict):
+                    try:
+                        check_point_record(record, fields)
+                    except ValueError as e:
+                        raise ValueError(f"{name} {n}: {e}") from None
+        self._apply_point_fields(customer_records, self.customer_idx_list, CUSTOMER_FIELDS)
+        self._apply_point_fields(tdwms_records, self.tdwms_idx_list, TDWMS_FIELDS)
+
+    def _apply_point_fields(self, records, indices, fields):
+        """Copies the per-point fields of records (dicts; other records are skipped) into the arrays."""
+        positions = np.asarray(indices, dtype=np.int64)
+        for field, (param, kind) in fields.items():
+            values = np.array([float(record[field]) if isinstance(record, dict) and field in record else np.nan
+                               for record in records], dtype=np.float64)
+            given = ~np.isnan(values)
+            if given.any():
+                self.arrays[param][positions[given] - self._offset(param)] = values[given].astype(kind)
+
+    def to_json(self, path):
+        """Writes the instance in the JSON layout described above."""
+        W, t = self.arrays["Wi"].tolist(), self.arrays["ti"].tolist()
+        E, O, cap = self.arrays["Ej"].tolist(), self.arrays["Oj"].tolist(), self.arrays["sj"].tolist()
+        data = {
+            "depot": list(self.depot),
+            "customers": [
+                {"lat": lat, "lon": lon, "W": W[k], "t": t[k]}
+                for k, (lat, lon) in enumerate(self.customers)
+            ],
+            "tdwms": [
+                {"lat": lat, "lon": lon, "E": E[k], "O": O[k], "s": cap[k]}
+                for k, (lat, lon) in enumerate(self.tdwms)
+            ],
+            "finals": [list(pt) for pt in self.finals],
+            "parameters": dict(self.scalars),
+            "T_last": self.T_last,
+        }
+        if self.distances is not None:
+            data["distances"] = self._distance_rows()
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
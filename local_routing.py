@@ -0,0 +1,329 @@
+"""
+Offline road routing over an OpenStreetMap extract.
+
+The drivable ways of an .osm extract (plain, .gz or .bz2 XML; convert a .pbf
+with `osmium cat extract.osm.pbf -o extract.osm`) are loaded into a compact
+road graph in CSR form: for node u, its outgoing edges are
+indices[indptr[u]:indptr[u + 1]], with their lengths (km) and driving times
+(min) at the same positions. A parsed graph can be saved as .npz and loaded
+again much faster:
+
+    python local_routing.py extract.osm.bz2 site_roads.npz
+
+Distances are shortest paths by length, found with Dijkstra's algorithm: one
+search per source point, stopped once every destination is settled, so a full
+matrix costs one bounded search per row. Points are snapped to the nearest
+road node, and the straight line between a point and its node is added to the
+distance and to the path.
+
+Install a LocalRouter with routing.set_local_router and route_distance,
+route_geometry and table_distance_matrix answer from it instead of OSRM.
+"""
+import argparse
+import bz2
+import gzip
+import heapq
+import re
+import xml.etree.ElementTree as ET
+
+import numpy as np
+
+from routing import EARTH_RADIUS_KM, haversine_km
+
+# Assumed speed (km/h) per highway type, used when a way has no usable maxspeed.
+# Ways of any other highway type (footways, tracks, ...) are not driven on.
+HIGHWAY_SPEEDS = {
+    "motorway": 100, "motorway_link": 60,
+    "trunk": 80, "trunk_link": 50,
+    "primary": 65, "primary_link": 40,
+    "secondary": 55, "secondary_link": 35,
+    "tertiary": 45, "tertiary_link": 30,
+    "unclassified": 35, "residential": 25, "living_street": 10, "service": 15,
+    "road": 30,
+}
+
+# Highway types that are one-way unless tagged otherwise
+IMPLIED_ONEWAY = {"motorway", "motorway_link", "trunk_link", "primary_link"}
+
+# Access values that close a way to trucks
+NO_ACCESS = {"no", "private"}
+
+# Speed (km/h) assumed between a point and the road node it is snapped to
+ACCESS_SPEED_KMH = 15
+
+
+def _open(path):
+    if path.endswith(".bz2"):
+        return bz2.open(path, "rb")
+    if path.endswith(".gz"):
+        return gzip.open(path, "rb")
+    return open(path, "rb")
+
+
+def _speed(tags):
+    """Driving speed (km/h) of a way: its maxspeed if numeric, else the highway default."""
+    match = re.match(r"\s*(\d+(?:\.\d+)?)\s*(mph)?", tags.get("maxspeed", ""))
+    if match:
+        speed = float(match.group(1)) * (1.609344 if match.group(2) else 1.0)
+        if speed > 0:
+            return speed
+    return HIGHWAY_SPEEDS[tags["highway"]]
+
+
+def _direction(tags):
+    """1 for a one-way way in node order, -1 against it, 0 for both directions."""
+    oneway = tags.get("oneway", "")
+    if oneway in ("yes", "true", "1"):
+        return 1
+    if oneway == "-1":
+        return -1
+    if oneway == "no":
+        return 0
+    if tags["highway"] in IMPLIED_ONEWAY or tags.get("junction") in ("roundabout", "circular"):
+        return 1
+    return 0
+
+
+def _drivable(tags):
+    return (tags.get("highway") in HIGHWAY_SPEEDS
+            and tags.get("access") not in NO_ACCESS
+            and tags.get("motor_vehicle") not in NO_ACCESS
+            and tags.get("area") != "yes")
+
+
+def _read_ways(path):
+    """First pass: the node lists, speeds and directions of the drivable ways."""
+    ways = []
+    with _open(path) as f:
+        for _, element in ET.iterparse(f, events=("end",)):
+            if element.tag == "way":
+                tags = {tag.get("k"): tag.get("v") for tag in element.iter("tag")}
+                if _drivable(tags):
+                    refs = [int(nd.get("ref")) for nd in element.iter("nd")]
+                    if len(refs) > 1:
+                        ways.append((refs, _speed(tags), _direction(tags)))
+                element.clear()
+            elif element.tag in ("node", "relation"):
+                element.clear()
+    return ways
+
+
+def _read_nodes(path, wanted):
+    """Second pass: {OSM id: (lat, lon)} of the wanted nodes only."""
+    coords = {}
+    with _open(path) as f:
+        for _, element in ET.iterparse(f, events=("end",)):
+            if element.tag == "node":
+                osm_id = int(element.get("id"))
+                if osm_id in wanted:
+                    coords[osm_id] = (float(element.get("lat")), float(element.get("lon")))
+                element.clear()
+            elif element.tag in ("way", "relation"):
+                element.clear()
+    return coords
+
+
+class RoadGraph:
+    """Directed road graph in CSR form; see the module docstring."""
+
+    def __init__(self, lat, lon, indptr, indices, km, minutes):
+        self.lat = np.asarray(lat, dtype=np.float64)
+        self.lon = np.asarray(lon, dtype=np.float64)
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int32)
+        self.km = np.asarray(km, dtype=np.float32)
+        self.minutes = np.asarray(minutes, dtype=np.float32)
+        self._adjacency = None
+
+    @property
+    def n_nodes(self):
+        return len(self.lat)
+
+    @property
+    def n_edges(self):
+        return len(self.indices)
+
+    @classmethod
+    def from_edges(cls, lat, lon, tails, heads, km, minutes):
+        """Builds the CSR arrays from parallel edge arrays (tail node -> head node)."""
+        tails = np.asarray(tails, dtype=np.int64)
+        order = np.argsort(tails, kind="stable")
+        indptr = np.zeros(len(lat) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(tails, minlength=len(lat)), out=indptr[1:])
+        return cls(lat, lon, indptr, np.asarray(heads)[order], np.asarray(km)[order],
+                   np.asarray(minutes)[order])
+
+    @classmethod
+    def from_osm(cls, path):
+        """Reads the drivable road network of an OSM XML extract."""
+        ways = _read_ways(path)
+        coords = _read_nodes(path, {ref for refs, _, _ in ways for ref in refs})
+        index = {}
+        edges = []  # (tail, head, speed)
+        for refs, speed, direction in ways:
+            refs = [ref for ref in refs if ref in coords]  # extracts may clip ways at their border
+            for a, b in zip(refs, refs[1:]):
+                u = index.setdefault(a, len(index))
+                v = index.setdefault(b, len(index))
+                if direction >= 0:
+                    edges.append((u, v, speed))
+                if direction <= 0:
+                    edges.append((v, u, speed))
+        if not edges:
+            raise ValueError(f"No drivable roads in {path}")
+
+        latlon = np.array([coords[osm_id] for osm_id in index], dtype=np.float64)
+        tails, heads, speeds = (np.array(column) for column in zip(*edges))
+        # Segment lengths: haversine between the end nodes of every edge at once
+        lat1, lon1 = np.radians(latlon[tails, 0]), np.radians(latlon[tails, 1])
+        lat2, lon2 = np.radians(latlon[heads, 0]), np.radians(latlon[heads, 1])
+        a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+        km = 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+        minutes = km / speeds * 60.0
+        return cls.from_edges(latlon[:, 0], latlon[:, 1], tails, heads, km, minutes)
+
+    @classmethod
+    def load(cls, path):
+        """Loads a graph saved with save (.npz) or parses an OSM extract."""
+        if path.endswith(".npz"):
+            with np.load(path) as data:
+                return cls(data["lat"], data["lon"], data["indptr"], data["indices"], data["km"],
+                           data["minutes"])
+        return cls.from_osm(path)
+
+    def save(self, path):
+        np.savez_compressed(path, lat=self.lat, lon=self.lon, indptr=self.indptr, indices=self.indices,
+                            km=self.km, minutes=self.minutes)
+
+    def adjacency(self):
+        """The CSR arrays as Python lists, which the search loop indexes much faster than arrays."""
+        if self._adjacency is None:
+            self._adjacency = (self.indptr.tolist(), self.indices.tolist(), self.km.tolist(),
+                               self.minutes.tolist())
+        return self._adjacency
+
+    def shortest_paths(self, source, targets=None):
+        """
+        Dijkstra by length from node source. Stops once every node in targets
+        is settled (or the reachable graph is exhausted). Returns the dicts
+        (km, minutes, predecessor) of the settled nodes; minutes is the driving
+        time along the shortest path.
+        """
+        indptr, indices, lengths, times = self.adjacency()
+        remaining = set(targets) if targets is not None else None
+        dist = {source: 0.0}
+        minutes = {source: 0.0}
+        pred = {source: -1}
+        settled = {}
+        heap = [(0.0, source)]
+        while heap:
+            d, u = heapq.heappop(heap)
+            if u in settled:
+                continue
+            settled[u] = d
+            if remaining is not None:
+                remaining.discard(u)
+                if not remaining:
+                    break
+            for e in range(indptr[u], indptr[u + 1]):
+                v = indices[e]
+                nd = d + lengths[e]
+                if v not in settled and nd < dist.get(v, float("inf")):
+                    dist[v] = nd
+                    minutes[v] = minutes[u] + times[e]
+                    pred[v] = u
+                    heapq.heappush(heap, (nd, v))
+        return settled, {u: minutes[u] for u in settled}, pred
+
+    def path(self, pred, target):
+        """Node list source -> target from the predecessors of shortest_paths."""
+        nodes = []
+        while target != -1:
+            nodes.append(target)
+            target = pred[target]
+        return nodes[::-1]
+
+
+class LocalRouter:
+    """
+    Answers routing queries for (latitude, longitude) points from a RoadGraph.
+    Snapping only considers nodes with both incoming and outgoing roads, so a
+    point is never stuck on a dead one-way end.
+    """
+
+    def __init__(self, graph):
+        self.graph = graph
+        out_degree = np.diff(graph.indptr)
+        in_degree = np.bincount(graph.indices, minlength=graph.n_nodes)
+        self._candidates = np.flatnonzero((out_degree > 0) & (in_degree > 0))
+        self._candidate_coords = np.column_stack((graph.lat[self._candidates], graph.lon[self._candidates]))
+        self._snapped = {}  # point -> (node, km to node)
+
+    @classmethod
+    def load(cls, path):
+        return cls(RoadGraph.load(path))
+
+    def snap(self, point):
+        """Returns (node, straight-line km from point to node) for the nearest road node."""
+        if point not in self._snapped:
+            offsets = haversine_km(point, self._candidate_coords)
+            k = int(np.argmin(offsets))
+            self._snapped[point] = (int(self._candidates[k]), float(offsets[k]))
+        return self._snapped[point]
+
+    def _access_minutes(self, km):
+        return km / ACCESS_SPEED_KMH * 60.0
+
+    def table(self, points, pairs):
+        """
+        Returns {(i, j): (km, minutes)} for the (i, j) index pairs into points;
+        pairs with no road path between them are left out. One search runs per
+        distinct source.
+        """
+        snapped = [self.snap(p) for p in points]
+        targets = {}
+        for i, j in pairs:
+            targets.setdefault(i, set()).add(j)
+
+        results = {}
+        for i, js in targets.items():
+            source, offset_i = snapped[i]
+            km, minutes, _ = self.graph.shortest_paths(source, {snapped[j][0] for j in js})
+            for j in js:
+                if points[i] == points[j]:
+                    results[(i, j)] = (0.0, 0.0)
+                    continue
+                node, offset_j = snapped[j]
+                if node in km:
+                    access = offset_i + offset_j
+                    results[(i, j)] = (km[node] + access, minutes[node] + self._access_minutes(access))
+        return results
+
+    def distance(self, p1, p2):
+        """Returns (km, minutes) p1 -> p2, or None if no road connects them."""
+        return self.table([p1, p2], [(0, 1)]).get((0, 1))
+
+    def geometry(self, p1, p2):
+        """Returns the path p1 -> p2 as a list of (latitude, longitude), or None."""
+        (source, _), (target, _) = self.snap(p1), self.snap(p2)
+        km, _, pred = self.graph.shortest_paths(source, {target})
+        if target not in km:
+            return None
+        lat, lon = self.graph.lat, self.graph.lon
+        return [tuple(p1)] + [(float(lat[u]), float(lon[u])) for u in self.graph.path(pred, target)] + [tuple(p2)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert an OSM extract into a road graph for offline routing.")
+    parser.add_argument("osm", help="OSM XML extract (.osm, .osm.gz or .osm.bz2)")
+    parser.add_argument("out", help="graph file to write (.npz)")
+    args = parser.parse_args(argv)
+
+    graph = RoadGraph.from_osm(args.osm)
+    graph.save(args.out)
+    print(f"{graph.n_nodes} nodes and {graph.n_edges} edges written to {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,127 @@
+"""
+Zoom-dependent clustering of the point markers on the map.
+
+TkinterMapView redraws every marker on each pan and zoom, so a survey of
+hundreds of customers makes the map crawl. MarkerIndex keeps the points in
+arrays with their Web Mercator positions and groups them, per zoom level and
+point type, into a grid of CELL_PX x CELL_PX screen pixels: a cell with one
+point is drawn as that point's marker, a fuller cell as one badge at the
+centroid of its points with their count. From CLUSTER_MAX_ZOOM on, every point
+gets its own marker. Only cells in the visible area (plus a margin) are drawn,
+so the number of markers on the canvas is bounded by the screen size, not by
+the number of points.
+"""
+import math
+from collections import namedtuple
+
+import numpy as np
+
+# Size of a map tile and of a cluster cell, in screen pixels
+TILE_PX = 256
+CELL_PX = 64
+
+# From this zoom level on every point has its own marker
+CLUSTER_MAX_ZOOM = 17
+
+# Web Mercator is cut off at this latitude
+MAX_LATITUDE = 85.0511287798
+
+# One marker to draw: a single point (count 1, with its label) or a cluster badge
+# (count > 1 at the centroid of its points, label None)
+MapMarker = namedtuple("MapMarker", ["lat", "lon", "kind", "count", "label"])
+
+
+def mercator(points):
+    """(n, 2) array of Web Mercator positions in [0, 1) of the (lat, lon) points, x east and y south."""
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    lat = np.radians(np.clip(points[:, 0], -MAX_LATITUDE, MAX_LATITUDE))
+    x = (points[:, 1] + 180.0) / 360.0
+    y = (1.0 - np.log(np.tan(lat) + 1.0 / np.cos(lat)) / math.pi) / 2.0
+    return np.column_stack((x, y))
+
+
+class MarkerIndex:
+    """
+    The points on the map and their grid cells per zoom level. Every add or
+    clear bumps version, so callers can tell when to draw again.
+    """
+
+    def __init__(self):
+        self.kinds = []  # point type of every point, in the order added
+        self.labels = []  # marker text of every point
+        self._coords = np.empty((0, 2))
+        self._xy = np.empty((0, 2))
+        self._kind_codes = np.empty(0, dtype=np.int64)
+        self._codes = {}  # point type -> small integer, for the grid keys
+        self._groups = {}  # zoom -> (cell of every point, point count per cell)
+        self.version = 0
+
+    def __len__(self):
+        return len(self.labels)
+
+    def add(self, points, kind, labels):
+        """Adds (lat, lon) points of one type with their marker texts."""
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        if len(points) != len(labels):
+            raise ValueError(f"Got {len(points)} points but {len(labels)} labels")
+        code = self._codes.setdefault(kind, len(self._codes))
+        self.kinds += [kind] * len(points)
+        self.labels += list(labels)
+        self._coords = np.vstack((self._coords, points))
+        self._xy = np.vstack((self._xy, mercator(points)))
+        self._kind_codes = np.concatenate((self._kind_codes, np.full(len(points), code, dtype=np.int64)))
+        self._groups.clear()
+        self.version += 1
+
+    def clear(self):
+        version = self.version
+        self.__init__()
+        self.version = version + 1
+
+    def cells(self, zoom):
+        """(cell of every point, point count per cell) at the zoom level; points of different types never share a cell."""
+        if zoom not in self._groups:
+            scale = 2.0 ** zoom * TILE_PX / CELL_PX
+            grid = np.floor(self._xy * scale).astype(np.int64)
+            keys = np.column_stack((self._kind_codes, grid))
+            _, cell, counts = np.unique(keys, axis=0, return_inverse=True, return_counts=True)
+            self._groups[zoom] = (cell.ravel(), counts)
+        return self._groups[zoom]
+
+    def markers(self, zoom, bounds=None):
+        """
+        The MapMarkers to draw at the zoom level. bounds, if given, is the area
+        to draw as ((x0, y0), (x1, y1)) Web Mercator positions (see mercator):
+        points outside it are left out, and so are clusters with no point in it.
+        """
+        n = len(self)
+        if n == 0:
+            return []
+        zoom = int(round(zoom))
+        if bounds is None:
+            visible = np.ones(n, dtype=bool)
+        else:
+            (x0, y0), (x1, y1) = bounds
+            x, y = self._xy[:, 0], self._xy[:, 1]
+            visible = (x >= x0) & (x <= x1) & (y >= y0) & (y <= y1)
+
+        if zoom >= CLUSTER_MAX_ZOOM:
+            return [MapMarker(*self._coords[k].tolist(), self.kinds[k], 1, self.labels[k])
+                    for k in np.flatnonzero(visible).tolist()]
+
+        cell, counts = self.cells(zoom)
+        lat = np.bincount(cell, weights=self._coords[:, 0], minlength=len(counts)) / counts
+        lon = np.bincount(cell, weights=self._coords[:, 1], minlength=len(counts)) / counts
+        shown = np.bincount(cell, weights=visible, minlength=len(counts)) > 0
+        # Any point of a cell, for its type (and its label if it is alone)
+        member = np.empty(len(counts), dtype=np.int64)
+        member[cell] = np.arange(n)
+
+        markers = []
+        for c in np.flatnonzero(shown).tolist():
+            k = int(member[c])
+            if counts[c] == 1:
+                markers.append(MapMarker(*self._coords[k].tolist(), self.kinds[k], 1, self.labels[k]))
+            else:
+                markers.append(MapMarker(float(lat[c]), float(lon[c]), self.kinds[k], int(counts[c]), None))
+        return markers
@@ -0,0 +1,223 @@
+"""
+Rolling-horizon decomposition of the clean-up model for long horizons.
+
+Every time-indexed variable grows with T_last, so a clean-up of several weeks
+is out of the exact model's reach. Instead, a window of `window` days is
+solved, its first `step` days are fixed, and the waste still at customers
+(cid), demolished but not collected (rid) and stored at TDWMS (rjd) is carried
+into the next window, together with the demolitions under way and the TDWMS
+already opened. The window that reaches T_last is solved as the usual two
+stages and must finish the clean-up; the earlier ones first minimize the waste
+left at their end, then the cost of doing so.
+"""
+from contextlib import nullcontext
+
+from cleanup_model import CleanupModel, cost_legs
+
+# Values below this are solver noise and carried as zero
+EPS = 1e-6
+# Slack on the Stage-1 waste left when a non-final window minimizes its cost (tonnes)
+LEFTOVER_TOLERANCE = 1e-3
+
+
+class HorizonState:
+    """The site after the fixed days: what the next window starts from."""
+
+    def __init__(self, day, cid, rid, rjd, started=(), demolition_left=None, opened=()):
+        self.day = day  # days already fixed
+        self.cid = dict(cid)  # waste still at customer i (tonnes)
+        self.rid = dict(rid)  # demolished, not collected waste at customer i
+        self.rjd = dict(rjd)  # waste stored at TDWMS j
+        self.started = set(started)  # customers whose demolition has started
+        self.demolition_left = dict(demolition_left or {})  # i -> demolition days still to come
+        self.opened = set(opened)  # TDWMS already opened (and paid for)
+
+
+def initial_state(customer_idx_list, tdwms_idx_list, params):
+    """The untouched site on day 0."""
+    return HorizonState(0, {i: params["Wi"][i] for i in customer_idx_list},
+                        {i: 0 for i in customer_idx_list}, {j: 0 for j in tdwms_idx_list})
+
+
+class RollingPlan:
+    """The fixed days of every window, joined into one plan (GreedyPlan-like totals and usage_data)."""
+
+    def __init__(self):
+        self.total_time = 0
+        self.total_cost = 0.0
+        self.usage = {}
+        self.windows = []  # per-window summaries, see RollingHorizon.run
+
+    def usage_data(self):
+        return {arc: flow for arc, flow in self.usage.items() if flow > 0}
+
+
+def _value(solution, var):
+    value = solution.get_value(var)
+    return value if value > EPS else 0.0
+
+
+class RollingHorizon:
+    """Solves the horizon T_last window by window; see run."""
+
+    def __init__(self, uij, customer_idx_list, tdwms_idx_list, final_idx_list, params, T_last,
+                 window=7, step=None, depot_idx=0):
+        if window < 1:
+            raise ValueError("The rolling-horizon window must be at least one day")
+        self.uij = uij
+        self.customers = list(customer_idx_list)
+        self.tdwms = list(tdwms_idx_list)
+        self.finals = list(final_idx_list)
+        self.params = params
+        self.T_last = T_last
+        self.window = window
+        # Fixing half of each window leaves the other half as look-ahead
+        self.step = min(step or max(1, window // 2), window)
+        self.depot_idx = depot_idx
+
+    def run(self, timelimit=36000, mipgap=0.15, log_output=True, listener=None, cancel_event=None,
+            report=None):
+        """
+        Returns the RollingPlan, or None if a window has no solution (the clean-up
+        cannot be finished from the state the earlier windows left; a longer
+        window or horizon may help) or cancel_event was set.
+
+        listener (a cleanup_engine.SolveProgress) is attached to every window
+        model; its stage is set to a "Window n ..." label. report, if given,
+        gets a window_n phase and the solve details of both stages per window.
+        """
+        state = initial_state(self.customers, self.tdwms, self.params)
+        plan = RollingPlan()
+        n = 0
+        while state.day < self.T_last:
+            if cancel_event is not None and cancel_event.is_set():
+                return None
+            n += 1
+            days = min(self.window, self.T_last - state.day)
+            final = state.day + days == self.T_last
+            fixed = days if final else min(self.step, days)
+            print(f">>> Window {n}: days {state.day + 1}-{state.day + days}"
+                  + (" (final)" if final else f", fixing {fixed}"))
+
+            with report.phase(f"window_{n}") if report is not None else nullcontext():
+                model, solution = self._solve_window(n, state, days, final, timelimit, mipgap,
+                                                     log_output, listener, report)
+            if not solution:
+                print(f"Window {n} has no solution.")
+                return None
+            state = self._fix_days(model, solution, state, fixed, plan)
+        return plan
+
+    def _solve_window(self, n, state, days, final, timelimit, mipgap, log_output, listener, report):
+        model = CleanupModel(self.uij, self.customers, self.tdwms, self.finals, self.params,
+                             T_last=days, depot_idx=self.depot_idx, name=f"Waste Clean-up window {n}",
+                             start=state, final=final)
+        mdl = model.mdl
+        # Demolitions must end within the whole horizon, not only within the window
+        ti = self.params["ti"]
+        for i in self.customers:
+            for d in model.days:
+                if state.day + d + ti[i] - 1 > self.T_last:
+                    model.xid[i, d].ub = 0
+        if report is not None and n == 1:
+            report.record_model(mdl)
+        if listener is not None:
+            mdl.add_progress_listener(listener)
+
+        def label(text):
+            if listener is not None:
+                listener.stage = f"Window {n} ({text})"
+
+        if final:
+            label("time")
+            optimal_time = model.solve_time(timelimit=timelimit, mipgap=mipgap, log_output=log_output)
+            if report is not None:
+                report.record_stage(f"{n}.1", mdl, model.solution_time)
+            if optimal_time is None:
+                return model, None
+            label("cost")
+            model.solve_cost(optimal_time, timelimit=timelimit, log_output=log_output)
+            if report is not None:
+                report.record_stage(f"{n}.2", mdl, model.solution_cost)
+            return model, model.solution_cost or model.solution_time
+
+        # Stage 1: as little waste as possible left at the end of the window
+        leftover = (mdl.sum_vars(model.cid[i, days] for i in self.customers)
+                    + mdl.sum_vars(model.rjd[j, days] for j in self.tdwms))
+        mdl.parameters.timelimit = timelimit
+        mdl.parameters.mip.tolerances.mipgap = mipgap
+        label("waste left")
+        mdl.minimize(leftover)
+        solution = mdl.solve(log_output=log_output)
+        if report is not None:
+            report.record_stage(f"{n}.1", mdl, solution)
+        if not solution:
+            return model, None
+
+        # Stage 2: the cheapest way to leave no more than that
+        mdl.add_constraint(leftover <= solution.objective_value + LEFTOVER_TOLERANCE, "window_leftover")
+        mdl.add_mip_start(solution)
+        mdl.parameters.mip.tolerances.mipgap.reset()
+        label("cost")
+        mdl.minimize(model.total_cost)
+        cost_solution = mdl.solve(log_output=log_output)
+        if report is not None:
+            report.record_stage(f"{n}.2", mdl, cost_solution)
+        return model, cost_solution or solution
+
+    def _fix_days(self, model, solution, state, fixed, plan):
+        """Adds the first `fixed` days of the window to plan and returns the state after them."""
+        p = self.params
+        Wi, ti, sj, Ej, ck, ck0 = p["Wi"], p["ti"], p["sj"], p["Ej"], p["ck"], p["ck0"]
+        days = range(1, fixed + 1)
+        collection_legs, transport_legs = cost_legs(self.depot_idx, self.customers, self.tdwms, self.finals)
+        collection_legs, transport_legs = set(collection_legs), set(transport_legs)
+
+        cost = 0.0
+        for (x, y) in model.collection_arcs:
+            trips = sum(_value(solution, model.aijd[x, y, d]) for d in days)
+            plan.usage[(x, y)] = plan.usage.get((x, y), 0) + trips
+            if (x, y) in collection_legs:
+                cost += trips * self.uij[(x, y)] * ck
+        for (x, y) in model.transport_arcs:
+            trips = sum(_value(solution, model.bjld[x, y, d]) for d in days)
+            plan.usage[(x, y)] = plan.usage.get((x, y), 0) + trips
+            if (x, y) in transport_legs:
+                cost += trips * self.uij[(x, y)] * ck0
+
+        # A TDWMS the window opens is paid for now and kept open in the next windows. Its use
+        # in the fixed days cannot tell: rjd <= xj * sj only caps the stock at the end of a
+        # day, so waste passes through TDWMS the model leaves closed.
+        opened = set(state.opened)
+        for j in self.tdwms:
+            if j not in opened and _value(solution, model.xj[j]) > 0.5:
+                opened.add(j)
+                cost += Ej[j]
+        if model.final:
+            cost += sum(_value(solution, model.lj[j]) for j in self.tdwms)
+
+        # Clean-up days as the model counts them (sd at its lower bound)
+        time = 0
+        for d in days:
+            if any(1 - _value(solution, model.cid[i, d]) / Wi[i] > EPS for i in self.customers) or any(
+                    1 - _value(solution, model.rjd[j, d]) / sj[j] > EPS for j in self.tdwms):
+                time += 1
+
+        started = set(state.started)
+        demolition_left = {i: max(0, left - fixed) for i, left in state.demolition_left.items()}
+        for i in self.customers:
+            for d in days:
+                if _value(solution, model.xid[i, d]) > 0.5:
+                    started.add(i)
+                    demolition_left[i] = max(0, d + ti[i] - 1 - fixed)
+
+        plan.total_time += time
+        plan.total_cost += cost
+        plan.windows.append({"start_day": state.day + 1, "fixed_days": fixed, "time": time, "cost": cost})
+        return HorizonState(
+            state.day + fixed,
+            {i: _value(solution, model.cid[i, fixed]) for i in self.customers},
+            {i: _value(solution, model.rid[i, fixed]) for i in self.customers},
+            {j: _value(solution, model.rjd[j, fixed]) for j in self.tdwms},
+            started, demolition_left, opened,
+        )
@@ -0,0 +1,185 @@
+"""
+Persistent SQLite cache for road distances and route geometries.
+
+Entries are keyed by routing profile and the two end points rounded to a fixed
+number of decimals (5 decimals is about 1 m), so clicking the same spot again,
+or re-running a what-if on the same disaster site, does not hit the routing
+service again.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS routes (
+    profile TEXT NOT NULL,
+    lat1 INTEGER NOT NULL,
+    lon1 INTEGER NOT NULL,
+    lat2 INTEGER NOT NULL,
+    lon2 INTEGER NOT NULL,
+    distance_km REAL,
+    duration_min REAL,
+    geometry TEXT,
+    created REAL NOT NULL,
+    accessed REAL NOT NULL,
+    PRIMARY KEY (profile, lat1, lon1, lat2, lon2)
+)
+"""
+
+
+class RouteCache:
+    """
+    Cache of p1->p2 road distances (km), durations (min) and geometries.
+
+    ttl: entries older than this many seconds are treated as missing (None = never expire).
+    max_entries: once exceeded, the least recently used entries are evicted.
+    precision: number of decimals the coordinates are rounded to before lookup.
+    """
+
+    # Evicting needs a COUNT(*), so it is only checked every this many writes
+    EVICT_EVERY = 500
+
+    def __init__(self, path, ttl=30 * 24 * 3600, max_entries=500000, precision=5):
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.precision = precision
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(_SCHEMA)
+        self._conn.commit()
+
+    def _key(self, profile, p1, p2):
+        scale = 10 ** self.precision
+        return (
+            profile,
+            round(p1[0] * scale), round(p1[1] * scale),
+            round(p2[0] * scale), round(p2[1] * scale),
+        )
+
+    def _is_fresh(self, created, now):
+        return self.ttl is None or now - created <= self.ttl
+
+    def _lookup(self, profile, pairs, column):
+        """Returns {pair: row} for the fresh cached pairs whose column is not NULL."""
+        found = {}
+        now = time.time()
+        with self._lock:
+            for pair in pairs:
+                key = self._key(profile, *pair)
+                row = self._conn.execute(
+                    f"SELECT distance_km, duration_min, geometry, created FROM routes "
+                    f"WHERE profile=? AND lat1=? AND lon1=? AND lat2=? AND lon2=? AND {column} IS NOT NULL",
+                    key
+                ).fetchone()
+                if row is not None and self._is_fresh(row[3], now):
+                    self._conn.execute(
+                        "UPDATE routes SET accessed=? "
+                        "WHERE profile=? AND lat1=? AND lon1=? AND lat2=? AND lon2=?",
+                        (now,) + key
+                    )
+                    found[pair] = row
+                    self.hits += 1
+                else:
+                    self.misses += 1
+            self._conn.commit()
+        return found
+
+    def get_distances(self, pairs, profile="driving"):
+        """
+        Looks up several (p1, p2) pairs at once.
+        Returns {(p1, p2): (distance_km, duration_min)} for the pairs found.
+        """
+        rows = self._lookup(profile, pairs, "distance_km")
+        return {pair: (row[0], row[1]) for pair, row in rows.items()}
+
+    def get_distance(self, p1, p2, profile="driving"):
+        """Returns (distance_km, duration_min) or None on a miss."""
+        return self.get_distances([(p1, p2)], profile).get((p1, p2))
+
+    def put_distances(self, entries, profile="driving"):
+        """Stores {(p1, p2): (distance_km, duration_min)}, keeping any cached geometry."""
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT INTO routes (profile, lat1, lon1, lat2, lon2, distance_km, duration_min, created, accessed) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (profile, lat1, lon1, lat2, lon2) DO UPDATE SET "
+                "distance_km=excluded.distance_km, duration_min=excluded.duration_min, "
+                "created=excluded.created, accessed=excluded.accessed",
+                [self._key(profile, p1, p2) + (dkm, dmin, now, now)
+                 for (p1, p2), (dkm, dmin) in entries.items()]
+            )
+            self._conn.commit()
+            self._after_write(len(entries))
+
+    def put_distance(self, p1, p2, distance_km, duration_min=None, profile="driving"):
+        self.put_distances({(p1, p2): (distance_km, duration_min)}, profile)
+
+    def get_geometry(self, p1, p2, profile="driving"):
+        """Returns the cached [(lat, lon), ...] path or None on a miss."""
+        row = self._lookup(profile, [(p1, p2)], "geometry").get((p1, p2))
+        if row is None:
+            return None
+        return [tuple(c) for c in json.loads(row[2])]
+
+    def put_geometry(self, p1, p2, path_coords, profile="driving"):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO routes (profile, lat1, lon1, lat2, lon2, geometry, created, accessed) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (profile, lat1, lon1, lat2, lon2) DO UPDATE SET "
+                "geometry=excluded.geometry, accessed=excluded.accessed",
+                self._key(profile, p1, p2) + (json.dumps(path_coords), now, now)
+            )
+            self._conn.commit()
+            self._after_write(1)
+
+    def _after_write(self, count):
+        # Called with the lock held
+        self._writes += count
+        if self._writes < self.EVICT_EVERY:
+            return
+        self._writes = 0
+        if self.ttl is not None:
+            self._conn.execute("DELETE FROM routes WHERE created < ?", (time.time() - self.ttl,))
+        total = self._conn.execute("SELECT COUNT(*) FROM routes").fetchone()[0]
+        if self.max_entries is not None and total > self.max_entries:
+            # Drop the least recently used rows, leaving some headroom
+            excess = total - int(self.max_entries * 0.9)
+            self._conn.execute(
+                "DELETE FROM routes WHERE rowid IN "
+                "(SELECT rowid FROM routes ORDER BY accessed ASC LIMIT ?)",
+                (excess,)
+            )
+        self._conn.commit()
+
+    def stats(self):
+        """Returns the hit/miss counters of this session and the number of stored entries."""
+        with self._lock:
+            size = self._conn.execute("SELECT COUNT(*) FROM routes").fetchone()[0]
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": size,
+        }
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM routes")
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
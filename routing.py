@@ -0,0 +1,451 @@
+"""
+Road-network distances for the waste clean-up model.
+
+All points are (latitude, longitude) tuples. OSRM expects (longitude, latitude),
+so every URL built here swaps the order.
+
+These functions require an internet connection to work, unless the answer is
+already in the route cache (see set_route_cache) or a local road graph is
+installed (see set_local_router), in which case OSRM is not used at all.
+"""
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+
+OSRM_BASE_URL = "https://router.project-osrm.org"
+OSRM_PROFILE = "driving"
+
+# The public OSRM server rejects /table requests with more than 100 coordinates.
+OSRM_TABLE_MAX_COORDS = 100
+
+# Requests per second allowed per host. The public demo server asks for at most
+# one request per second; self-hosted servers are not throttled unless listed here.
+HOST_RATE_LIMITS = {"router.project-osrm.org": 1.0}
+
+EARTH_RADIUS_KM = 6371.0088
+
+# Upper bound assumed for road distance / straight-line distance between nearby
+# points. Used to decide when a straight-line check is conclusive without routing.
+ROAD_DETOUR_MAX = 2.0
+
+# Typical road distance / straight-line distance ratio, used to estimate a road
+# distance when the routing service cannot provide one.
+ROAD_DETOUR_FACTOR = 1.3
+
+# Routing failures are logged, not printed: the engine, the CLIs and the worker
+# processes import this module too. Callers learn of them from the return values.
+logger = logging.getLogger(__name__)
+
+# Pairs closer than this (km) are not used to calibrate the detour factor
+MIN_CALIBRATION_KM = 0.2
+
+# Optional persistent RouteCache shared by every function in this module
+_route_cache = None
+
+# Optional local_routing.LocalRouter answering every query offline instead of OSRM
+_local_router = None
+
+# Shared RoutingClient, created on first use
+_routing_client = None
+_routing_client_lock = threading.Lock()
+
+
+class RoutingClient:
+    """
+    HTTP client shared by all routing calls.
+
+    Keeps one pooled keep-alive Session, spaces requests to each host according
+    to rate_limits (requests per second), retries connection errors, timeouts,
+    HTTP 429 and 5xx responses with exponential backoff, and fans independent
+    requests out over a bounded thread pool (see map).
+    """
+
+    RETRY_STATUS = {429, 500, 502, 503, 504}
+
+    def __init__(self, max_workers=8, rate_limits=None, max_retries=4, backoff=0.5, timeout=10):
+        self.max_workers = max_workers
+        self.rate_limits = dict(HOST_RATE_LIMITS if rate_limits is None else rate_limits)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="routing")
+        self._rate_lock = threading.Lock()
+        self._next_slot = {}  # host -> earliest time the next request may start
+
+    def _wait_for_slot(self, host):
+        rate = self.rate_limits.get(host)
+        if not rate:
+            return
+        with self._rate_lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + 1.0 / rate
+        if slot > now:
+            time.sleep(slot - now)
+
+    def get_json(self, url, params=None, timeout=None):
+        """GET url and return the decoded JSON body, retrying transient failures."""
+        host = urlparse(url).hostname
+        attempt = 0
+        while True:
+            self._wait_for_slot(host)
+            try:
+                r = self.session.get(url, params=params, timeout=timeout or self.timeout)
+                if r.status_code not in self.RETRY_STATUS:
+                    r.raise_for_status()
+                    return r.json()
+                error = requests.HTTPError(f"{r.status_code} from {host}", response=r)
+                retry_after = r.headers.get("Retry-After")
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = e
+                retry_after = None
+
+            if attempt >= self.max_retries:
+                raise error
+            delay = self.backoff * (2 ** attempt) * (1 + random.random() * 0.25)
+            if retry_after is not None and retry_after.isdigit():
+                delay = max(delay, float(retry_after))
+            time.sleep(delay)
+            attempt += 1
+
+    def map(self, fn, items):
+        """Returns [fn(item) for item in items], evaluated concurrently on the pool."""
+        items = list(items)
+        if len(items) <= 1:
+            return [fn(item) for item in items]
+        return list(self._executor.map(fn, items))
+
+    def submit(self, fn, *args):
+        """Runs fn(*args) on the pool and returns its Future."""
+        return self._executor.submit(fn, *args)
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        self.session.close()
+
+
+def get_routing_client():
+    """Returns the RoutingClient shared by every function in this module."""
+    global _routing_client
+    with _routing_client_lock:
+        if _routing_client is None:
+            _routing_client = RoutingClient()
+        return _routing_client
+
+
+def set_routing_client(client):
+    global _routing_client
+    with _routing_client_lock:
+        _routing_client = client
+
+
+def set_route_cache(cache):
+    """Installs the RouteCache used for all lookups (None disables caching)."""
+    global _route_cache
+    _route_cache = cache
+
+
+def get_route_cache():
+    return _route_cache
+
+
+def set_local_router(router):
+    """
+    Installs a local_routing.LocalRouter that answers all distance, table and
+    geometry queries offline (None goes back to OSRM). Its answers bypass the
+    route cache, which holds OSRM results.
+    """
+    global _local_router
+    _local_router = router
+
+
+def get_local_router():
+    return _local_router
+
+
+def route_distance(p1, p2):
+    """
+    Returns the driving distance (km) between p1->p2 via the OSRM public API.
+    p1, p2 = (latitude, longitude)
+
+    This function requires an internet connection to work, unless a local
+    router is installed.
+    """
+    if _local_router is not None:
+        pair = _local_router.distance(p1, p2)
+        return pair[0] if pair is not None else -1
+
+    if _route_cache is not None:
+        cached = _route_cache.get_distance(p1, p2, OSRM_PROFILE)
+        if cached is not None:
+            return cached[0]
+
+    lat1, lon1 = p1
+    lat2, lon2 = p2
+    # Request to OSRM
+    url = f"{OSRM_BASE_URL}/route/v1/{OSRM_PROFILE}/{lon1},{lat1};{lon2},{lat2}?overview=false"
+    try:
+        data = get_routing_client().get_json(url, timeout=10)  # 10 seconds timeout
+        dist_m = data["routes"][0]["distance"]  # in meters
+        dist_km = dist_m / 1000.0
+    except Exception as e:
+        # Return -1 (signal) in case of OSRM service error, etc.
+        logger.warning("OSRM route request %s -> %s failed: %s", p1, p2, e)
+        return -1
+
+    if _route_cache is not None:
+        _route_cache.put_distance(p1, p2, dist_km, data["routes"][0]["duration"] / 60.0, OSRM_PROFILE)
+    return dist_km
+
+
+def route_geometry(p1, p2):
+    """
+    Returns the driving path p1->p2 as a list of (latitude, longitude) points,
+    or None if OSRM (or the local router) could not provide it.
+    """
+    if _local_router is not None:
+        return _local_router.geometry(p1, p2)
+
+    if _route_cache is not None:
+        cached = _route_cache.get_geometry(p1, p2, OSRM_PROFILE)
+        if cached is not None:
+            return cached
+
+    lat1, lon1 = p1
+    lat2, lon2 = p2
+    url = (f"{OSRM_BASE_URL}/route/v1/{OSRM_PROFILE}/{lon1},{lat1};{lon2},{lat2}"
+           f"?overview=full&geometries=geojson")
+    try:
+        data = get_routing_client().get_json(url, timeout=10)
+        coordinates = data["routes"][0]["geometry"]["coordinates"]
+    except Exception as e:
+        logger.warning("OSRM route geometry %s -> %s failed: %s", p1, p2, e)
+        return None
+
+    # Convert coordinates returned from OSRM from (lon, lat) to (lat, lon) order
+    path_coords = [(lat, lon) for lon, lat in coordinates]
+    if _route_cache is not None:
+        _route_cache.put_geometry(p1, p2, path_coords, OSRM_PROFILE)
+    return path_coords
+
+
+def route_distances(pairs):
+    """Returns [route_distance(p1, p2) for (p1, p2) in pairs], fetched in parallel."""
+    return get_routing_client().map(lambda pair: route_distance(*pair), pairs)
+
+
+def route_geometries(pairs):
+    """Returns [route_geometry(p1, p2) for (p1, p2) in pairs], fetched in parallel."""
+    return get_routing_client().map(lambda pair: route_geometry(*pair), pairs)
+
+
+def submit_route_geometry(p1, p2):
+    """Starts route_geometry(p1, p2) on the routing pool and returns its Future."""
+    return get_routing_client().submit(route_geometry, p1, p2)
+
+
+def haversine_km(point, points):
+    """
+    Returns the great-circle distances (km) from point to each of points as a
+    NumPy array. Road distances are never shorter than these.
+    """
+    points = np.radians(np.asarray(points, dtype=float).reshape(-1, 2))
+    lat1, lon1 = np.radians(point)
+    lat2, lon2 = points[:, 0], points[:, 1]
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+
+def estimated_distance_km(p1, p2, detour_factor=ROAD_DETOUR_FACTOR):
+    """Returns a road distance estimate (km): straight-line distance times detour_factor."""
+    return float(haversine_km(p1, [p2])[0]) * detour_factor
+
+
+def haversine_matrix(points):
+    """Returns the n x n great-circle distances (km) between points as a NumPy array, in one pass."""
+    points = np.radians(np.asarray(points, dtype=float).reshape(-1, 2))
+    lat, lon = points[:, 0:1], points[:, 1:2]
+    a = np.sin((lat.T - lat) / 2) ** 2 + np.cos(lat) * np.cos(lat.T) * np.sin((lon.T - lon) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def estimated_distance_matrix(points, detour_factor=ROAD_DETOUR_FACTOR):
+    """
+    Returns the uij dict (km, keyed by index into points) of road distance
+    estimates: straight-line distance times detour_factor for every pair.
+    """
+    rows = (haversine_matrix(points) * detour_factor).tolist()
+    n = len(rows)
+    return {(i, j): rows[i][j] for i in range(n) for j in range(n)}
+
+
+def detour_factor(measured):
+    """
+    Returns the road / straight-line distance ratio of measured, a list of
+    (p1, p2, road_km) triples, or None if it holds no usable pair. Pairs closer
+    than MIN_CALIBRATION_KM are skipped: their ratio is mostly snapping noise.
+    """
+    road, straight = 0.0, 0.0
+    for p1, p2, road_km in measured:
+        line_km = float(haversine_km(p1, [p2])[0])
+        if road_km >= 0 and line_km >= MIN_CALIBRATION_KM:
+            road += road_km
+            straight += line_km
+    return max(1.0, road / straight) if straight > 0 else None
+
+
+def calibrate_detour_factor(points, sample_size=20, seed=0):
+    """
+    Measures the road distance of sample_size random pairs of points (in
+    parallel, through the route cache or the local router) and returns their
+    detour_factor, or None if none could be measured.
+    """
+    pairs = [(p1, p2) for p1 in points for p2 in points if p1 != p2]
+    pairs = random.Random(seed).sample(pairs, min(sample_size, len(pairs)))
+    return detour_factor([(p1, p2, km) for (p1, p2), km in zip(pairs, route_distances(pairs))])
+
+
+def _table_request(coords, sources, destinations):
+    """
+    Sends one OSRM /table request and returns (distances, durations) as
+    nested lists in metres and seconds. Unreachable pairs come back as None.
+    """
+    coord_str = ";".join(f"{lon},{lat}" for lat, lon in coords)
+    url = f"{OSRM_BASE_URL}/table/v1/{OSRM_PROFILE}/{coord_str}"
+    params = {"annotations": "distance,duration"}
+    if sources is not None:
+        params["sources"] = ";".join(str(s) for s in sources)
+        params["destinations"] = ";".join(str(d) for d in destinations)
+    data = get_routing_client().get_json(url, params=params, timeout=30)
+    if data.get("code") != "Ok":
+        raise RuntimeError(data.get("message", data.get("code")))
+    return data["distances"], data["durations"]
+
+
+def _chunks(items, size):
+    return [items[start:start + size] for start in range(0, len(items), size)]
+
+
+def _table_blocks(src_idx, dst_idx, max_coords):
+    """
+    Splits the src_idx x dst_idx sub-matrix into requests of at most max_coords
+    coordinates. Yields (coord_idx, sources, destinations) where sources and
+    destinations are positions into coord_idx (None meaning "all of them").
+    """
+    union = list(dict.fromkeys(src_idx + dst_idx))
+    if len(union) <= max_coords:
+        src_blocks, dst_blocks = [src_idx], [dst_idx]
+    else:
+        src_blocks = _chunks(src_idx, max_coords // 2)
+        dst_blocks = _chunks(dst_idx, max_coords // 2)
+
+    for src in src_blocks:
+        for dst in dst_blocks:
+            coord_idx = list(dict.fromkeys(src + dst))
+            if src == coord_idx and dst == coord_idx:
+                yield coord_idx, None, None
+            else:
+                pos = {p: k for k, p in enumerate(coord_idx)}
+                yield coord_idx, [pos[i] for i in src], [pos[j] for j in dst]
+
+
+def table_distance_matrix(points, max_coords=OSRM_TABLE_MAX_COORDS, known=None):
+    """
+    Returns (uij, tij) for every ordered pair of points using the OSRM /table endpoint.
+
+    uij[(i, j)] is the driving distance in km and tij[(i, j)] the driving time in
+    minutes, with i, j indexing into points (same layout as the uij dict used by
+    the models). Pairs OSRM could not route are set to -1.
+
+    known optionally maps (i, j) to an already measured (km, minutes) pair. Those
+    pairs and the pairs in the route cache are not requested again; only the rows
+    and columns that still have missing pairs go to the server. If there are more
+    points than the server accepts in one request, the matrix is fetched block by
+    block, each request carrying one block of sources and one block of destinations.
+
+    Returns None if any request fails, so the caller can fall back to route_distance.
+    With a local router installed, the missing pairs are computed locally instead.
+    """
+    n = len(points)
+    uij = {}
+    tij = {}
+    for (i, j), (dkm, dmin) in (known or {}).items():
+        uij[(i, j)], tij[(i, j)] = dkm, dmin
+
+    if _local_router is not None:
+        missing = [(i, j) for i in range(n) for j in range(n) if (i, j) not in uij]
+        routed = _local_router.table(points, missing)
+        for pair in missing:
+            uij[pair], tij[pair] = routed.get(pair, (-1, -1))
+        return uij, tij
+
+    if _route_cache is not None:
+        lookup = [(i, j) for i in range(n) for j in range(n) if (i, j) not in uij]
+        cached = _route_cache.get_distances([(points[i], points[j]) for i, j in lookup], OSRM_PROFILE)
+        for i, j in lookup:
+            hit = cached.get((points[i], points[j]))
+            if hit is not None and hit[1] is not None:
+                uij[(i, j)], tij[(i, j)] = hit
+
+    # Rows with no cached pair at all (typically newly added points) are fetched
+    # against every point; the remaining gaps only against their missing columns.
+    missing = [(i, j) for i in range(n) for j in range(n) if (i, j) not in uij]
+    if not missing:
+        return uij, tij
+    new_rows = {i for i in range(n) if all((i, j) not in uij for j in range(n) if j != i)}
+    groups = []
+    if new_rows:
+        groups.append((sorted(new_rows), list(range(n))))
+    rest = [(i, j) for (i, j) in missing if i not in new_rows]
+    if rest:
+        groups.append((sorted({i for i, _ in rest}), sorted({j for _, j in rest})))
+
+    requests_to_send = [
+        block for src_idx, dst_idx in groups
+        for block in _table_blocks(src_idx, dst_idx, max_coords)
+    ]
+
+    def fetch(block):
+        coord_idx, sources, destinations = block
+        try:
+            return _table_request([points[k] for k in coord_idx], sources, destinations)
+        except Exception as e:
+            logger.warning("OSRM table request for %d points failed: %s", len(coord_idx), e)
+            return None
+
+    # Blocks are independent, so they go out concurrently
+    responses = get_routing_client().map(fetch, requests_to_send)
+    if any(resp is None for resp in responses):
+        return None
+
+    fetched = {}
+    for (coord_idx, sources, destinations), (distances, durations) in zip(requests_to_send, responses):
+        rows = [coord_idx[s] for s in sources] if sources is not None else coord_idx
+        cols = [coord_idx[d] for d in destinations] if destinations is not None else coord_idx
+        for a, i in enumerate(rows):
+            for b, j in enumerate(cols):
+                dist_m = distances[a][b]
+                dur_s = durations[a][b]
+                if dist_m is None or dur_s is None:
+                    uij[(i, j)] = tij[(i, j)] = -1
+                    continue
+                uij[(i, j)] = dist_m / 1000.0
+                tij[(i, j)] = dur_s / 60.0
+                fetched[(points[i], points[j])] = (uij[(i, j)], tij[(i, j)])
+
+    if _route_cache is not None and fetched:
+        _route_cache.put_distances(fetched, OSRM_PROFILE)
+    return uij, tij
@@ -0,0 +1,91 @@
+"""
+Run report: where the time of one model run goes.
+
+Records the wall time of each phase (distance matrix, model build, Stage-1 and
+Stage-2 solves, solution extraction, heatmap), the model size, the CPLEX solve
+details of both stages and the incumbent / bound / gap time series reported by
+the progress listener. Saved as JSON next to the solution output.
+"""
+import json
+import time
+from contextlib import contextmanager
+
+
+class RunReport:
+    """Collects the measurements of one run. Plain attributes only, so it can be sent between processes."""
+
+    def __init__(self):
+        self.created = time.strftime("%Y-%m-%d %H:%M:%S")
+        self.instance = {}
+        self.phases = []  # [{"name", "seconds"}] in run order
+        self.model = {}
+        self.stages = {}  # stage -> solve details
+        self.progress = []  # progress listener reports
+        self.extra = {}
+
+    @contextmanager
+    def phase(self, name):
+        """Times the enclosed block as phase name."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append({"name": name, "seconds": time.perf_counter() - start})
+
+    def record_instance(self, instance):
+        self.instance = {
+            "customers": len(instance.customers),
+            "tdwms": len(instance.tdwms),
+            "finals": len(instance.finals),
+            "T_last": instance.T_last,
+        }
+
+    def record_model(self, mdl):
+        """Variable and constraint counts of a docplex model."""
+        self.model = {
+            "variables": mdl.number_of_variables,
+            "binary_variables": mdl.number_of_binary_variables,
+            "integer_variables": mdl.number_of_integer_variables,
+            "continuous_variables": mdl.number_of_continuous_variables,
+            "constraints": mdl.number_of_constraints,
+        }
+
+    def record_stage(self, stage, mdl, solution):
+        """Solve details of the last solve of mdl."""
+        details = mdl.solve_details
+        self.stages[str(stage)] = {
+            "status": details.status if details is not None else None,
+            "objective": solution.objective_value if solution else None,
+            "best_bound": details.best_bound if details is not None and solution else None,
+            "gap": details.mip_relative_gap if details is not None and solution else None,
+            "nodes": details.nb_nodes_processed if details is not None else None,
+            "solver_seconds": details.time if details is not None else None,
+        }
+
+    def add_progress(self, report):
+        self.progress.append(dict(report))
+
+    def total_seconds(self):
+        return sum(p["seconds"] for p in self.phases)
+
+    def summary(self):
+        """Short text table of the phase times."""
+        lines = [f"{p['name']:<20} {p['seconds']:10.2f} s" for p in self.phases]
+        lines.append(f"{'total':<20} {self.total_seconds():10.2f} s")
+        return "\n".join(lines)
+
+    def to_dict(self):
+        return {
+            "created": self.created,
+            "instance": self.instance,
+            "phases": self.phases,
+            "total_seconds": self.total_seconds(),
+            "model": self.model,
+            "stages": self.stages,
+            "progress": self.progress,
+            **self.extra,
+        }
+
+    def save(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2)
@@ -0,0 +1,269 @@
+"""
+Scenario runner: one instance, a grid of parameter overrides, every scenario
+solved in parallel worker processes, and a comparison table.
+
+    python scenarios.py site.json --vary K=1,2,3 --vary m=1,2 --out sweep/
+    python scenarios.py site.json --vary sj=15000,25000 --set Q=40 --method greedy
+
+Each --vary adds a parameter to the grid; the scenarios are all combinations.
+Fleet and site parameters (m, K, K0, Q, Q0, v, v0, R, g) are set as they are;
+per-site parameters (Ej, Oj, sj) given as one number apply to every TDWMS.
+
+The distance matrix is fetched once (or taken from the instance) and put in
+shared memory; every worker process maps it instead of receiving a copy with
+each scenario.
+"""
+import argparse
+import csv
+import itertools
+import json
+import os
+import time
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context, shared_memory
+
+import numpy as np
+
+from cleanup_engine import (RESULTS_FOLDER, estimated_distances, parse_overrides, road_distances, solve_alns,
+                            solve_greedy, solve_two_stage)
+from instance import Instance
+from local_routing import LocalRouter
+from route_cache import RouteCache
+from routing import set_local_router, set_route_cache
+
+
+def parse_grid(pairs):
+    """Turns ["K=1,2,3", "g=0.3,0.4"] into {"K": [1, 2, 3], "g": [0.3, 0.4]}."""
+    grid = {}
+    for pair in pairs or []:
+        key, _, values = pair.partition("=")
+        if not values:
+            raise ValueError(f"Expected key=value,value,..., got {pair!r}")
+        grid[key.strip()] = [parse_overrides([f"{key}={value}"])[key.strip()] for value in values.split(",")]
+    return grid
+
+
+def scenario_grid(grid):
+    """All combinations of the grid values, as override dicts."""
+    keys = list(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[k] for k in keys))]
+
+
+def apply_scenario(instance, overrides):
+    """
+    Returns a copy of the instance (without its distances) with the overrides
+    applied; a number given for a per-site parameter applies to every site.
+    """
+    scenario = instance.copy()
+    scenario.distances = None
+    scenario.update_parameters(overrides)
+    return scenario
+
+
+class MatrixView(Mapping):
+    """Read-only {(i, j): km} view of an n x n array, as the model builders index uij."""
+
+    def __init__(self, array):
+        self.array = array
+
+    def __getitem__(self, key):
+        i, j = key
+        n = len(self.array)
+        if not (0 <= i < n and 0 <= j < n):
+            raise KeyError(key)
+        return float(self.array[i, j])
+
+    def __iter__(self):
+        n = len(self.array)
+        return ((i, j) for i in range(n) for j in range(n))
+
+    def __len__(self):
+        return len(self.array) ** 2
+
+
+class SharedMatrix:
+    """
+    An n x n float64 matrix in a shared memory block. The creating process owns
+    the block (close and unlink it); workers attach to it by name.
+    """
+
+    def __init__(self, shm, n):
+        self.shm = shm
+        self.n = n
+        self.array = np.ndarray((n, n), dtype=np.float64, buffer=shm.buf)
+
+    @classmethod
+    def create(cls, uij, n):
+        shm = shared_memory.SharedMemory(create=True, size=max(1, n * n * 8))
+        matrix = cls(shm, n)
+        for (i, j), km in uij.items():
+            matrix.array[i, j] = km
+        return matrix
+
+    @classmethod
+    def attach(cls, name, n):
+        return cls(shared_memory.SharedMemory(name=name), n)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def uij(self):
+        """The matrix as uij, without copying it out of the shared block."""
+        return MatrixView(self.array)
+
+    def close(self):
+        self.array = None
+        self.shm.close()
+
+
+# Distances of the sweep in a worker process, set by _init_worker: a view of the
+# shared block, which stays attached for the life of the worker
+_worker_matrix = None
+_worker_uij = None
+
+
+def _init_worker(name, n):
+    global _worker_matrix, _worker_uij
+    _worker_matrix = SharedMatrix.attach(name, n)
+    _worker_uij = _worker_matrix.uij()
+
+
+def _run_scenario(number, scenario, overrides, method, timelimit, mipgap, time_budget, threads):
+    """Pool task: solves one scenario and returns its table row."""
+    started = time.perf_counter()
+    row = {"scenario": number, **overrides, "time": None, "cost": None, "opened_tdwms": None,
+           "seconds": None, "error": None}
+    try:
+        if method == "greedy":
+            result = solve_greedy(scenario, _worker_uij)
+        elif method == "alns":
+            result = solve_alns(scenario, _worker_uij, time_budget=time_budget)
+        else:
+            result = solve_two_stage(scenario, _worker_uij, timelimit=timelimit, mipgap=mipgap, log_output=False,
+                                     threads=threads)
+        row["time"] = result["optimal_time"]
+        row["cost"] = result["optimal_cost"]
+        if "opened_tdwms" in result:
+            row["opened_tdwms"] = len(result["opened_tdwms"])
+    except Exception as e:
+        row["error"] = f"{type(e).__name__}: {e}"
+    row["seconds"] = time.perf_counter() - started
+    return row
+
+
+def run_sweep(instance, scenarios, uij=None, workers=None, method="mip", timelimit=36000, mipgap=0.15,
+              time_budget=60.0):
+    """
+    Solves every scenario (override dicts) of the instance in a process pool
+    and returns their table rows in scenario order. uij defaults to the
+    instance's distances or the routing service (see road_distances).
+    """
+    if uij is None:
+        uij, _ = road_distances(instance)
+    workers = min(workers or os.cpu_count() or 1, len(scenarios)) or 1
+    # CPLEX threads per solve, so the parallel solves share the cores
+    threads = max(1, (os.cpu_count() or 1) // workers)
+
+    matrix = SharedMatrix.create(uij, instance.n_total)
+    try:
+        # spawn: callers (the GUI) may have threads that must not be forked
+        with ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn"), initializer=_init_worker,
+                                 initargs=(matrix.name, instance.n_total)) as pool:
+            futures = [pool.submit(_run_scenario, n, apply_scenario(instance, overrides), overrides, method,
+                                   timelimit, mipgap, time_budget, threads)
+                       for n, overrides in enumerate(scenarios, start=1)]
+            return [future.result() for future in futures]
+    finally:
+        matrix.close()
+        matrix.shm.unlink()
+
+
+def format_table(rows):
+    """Text table of the rows, cheapest feasible scenario marked with *."""
+    if not rows:
+        return ""
+    keys = list(rows[0])
+    costs = [row["cost"] for row in rows if row["cost"] is not None]
+    best = min(costs) if costs else None
+
+    def cell(key, value):
+        if value is None:
+            return "-"
+        if key == "cost":
+            return f"{value:.2f}" + ("*" if value == best else "")
+        if key == "seconds":
+            return f"{value:.1f}"
+        return str(value)
+
+    cells = [[cell(key, row[key]) for key in keys] for row in rows]
+    widths = [max(len(key), *(len(line[n]) for line in cells)) for n, key in enumerate(keys)]
+    lines = ["  ".join(key.rjust(w) for key, w in zip(keys, widths))]
+    lines += ["  ".join(value.rjust(w) for value, w in zip(line, widths)) for line in cells]
+    return "\n".join(lines)
+
+
+def write_table(rows, folder):
+    """Writes scenarios.csv and scenarios.json to folder; returns the CSV path."""
+    os.makedirs(folder, exist_ok=True)
+    csv_path = os.path.join(folder, "scenarios.csv")
+    with open(csv_path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        for row in rows:
+            writer.writerow({k: json.dumps(v) if isinstance(v, (list, dict)) else v for k, v in row.items()})
+    with open(os.path.join(folder, "scenarios.json"), "w", encoding="utf-8") as f:
+        json.dump(rows, f, indent=2)
+    return csv_path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Solve an instance for a grid of parameter overrides.")
+    parser.add_argument("instance", help="instance file (.json or .csv, see instance.py)")
+    parser.add_argument("--vary", action="append", metavar="KEY=V1,V2,...", required=True,
+                        help="parameter values to compare, e.g. --vary K=1,2,3 (repeatable: all combinations)")
+    parser.add_argument("--set", action="append", metavar="KEY=VALUE", dest="overrides",
+                        help="override a parameter in every scenario (repeatable)")
+    parser.add_argument("--horizon", type=int, help="planning horizon T_last in days")
+    parser.add_argument("--method", choices=["mip", "greedy", "alns"], default="mip")
+    parser.add_argument("--workers", type=int, help="parallel solves (default: CPU count)")
+    parser.add_argument("--timelimit", type=float, default=36000, help="CPLEX time limit per stage (s)")
+    parser.add_argument("--mipgap", type=float, default=0.15, help="relative MIP gap for Stage 1")
+    parser.add_argument("--time-budget", type=float, default=60.0, help="ALNS search time per scenario (s)")
+    parser.add_argument("--out", default=os.path.join(RESULTS_FOLDER, "scenarios"),
+                        help="folder for scenarios.csv / scenarios.json")
+    parser.add_argument("--no-cache", action="store_true", help="do not use the on-disk route cache")
+    parser.add_argument("--osm", metavar="PATH",
+                        help="route offline on this road graph (OSM extract or .npz, see local_routing.py)")
+    parser.add_argument("--estimate", action="store_true",
+                        help="use straight-line distance estimates instead of road distances")
+    parser.add_argument("--detour-factor", type=float, help="road / straight-line ratio of the estimates")
+    args = parser.parse_args(argv)
+
+    instance = Instance.load(args.instance, parse_overrides(args.overrides))
+    if args.horizon is not None:
+        instance.T_last = args.horizon
+    if not args.no_cache and instance.distances is None:
+        set_route_cache(RouteCache(os.path.join(args.out, "route_cache.sqlite3")))
+    if args.osm and instance.distances is None:
+        set_local_router(LocalRouter.load(args.osm))
+
+    scenarios = scenario_grid(parse_grid(args.vary))
+    if args.estimate:
+        uij, _ = estimated_distances(instance, args.detour_factor)
+        fallback_pairs = []
+    else:
+        uij, fallback_pairs = road_distances(instance)
+    if fallback_pairs:
+        print(f"Straight-line estimates used for {len(fallback_pairs)} pairs OSRM could not provide.")
+    print(f">>> Solving {len(scenarios)} scenarios...")
+    rows = run_sweep(instance, scenarios, uij=uij, workers=args.workers, method=args.method,
+                     timelimit=args.timelimit, mipgap=args.mipgap, time_budget=args.time_budget)
+    print(format_table(rows))
+    print(f"Table written to {write_table(rows, args.out)}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
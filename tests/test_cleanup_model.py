@@ -0,0 +1,62 @@
+"""
+The two-stage model against the objectives of the original GUI model (before
+arcs were restricted per echelon, the model was built once for both stages and
+its constraints were added in bulk) on three small seeded sites.
+"""
+import random
+
+import pytest
+
+pytest.importorskip("cplex")
+
+from cleanup_engine import solve_two_stage  # noqa: E402
+from instance import Instance  # noqa: E402
+from routing import haversine_matrix  # noqa: E402
+
+# (customers, TDWMS, finals, seed) -> (time, cost) of the original model
+BASELINE = {
+    (2, 2, 1, 1): (6.0, 10470.656654417671),
+    (3, 1, 1, 2): (6.0, 11302.85561563988),
+    (3, 2, 2, 3): (6.0, 11752.327898820628),
+}
+
+
+def seeded_site(n_customers, n_tdwms, n_finals, seed):
+    """Points within about 3 km, default parameters, straight-line distances x 1.3."""
+    rng = random.Random(seed)
+
+    def point():
+        return (41.0 + rng.random() * 0.03, 29.0 + rng.random() * 0.03)
+
+    customers = [point() for _ in range(n_customers)]
+    tdwms = [point() for _ in range(n_tdwms)]
+    depot = point()
+    finals = [point() for _ in range(n_finals)]
+    instance = Instance(depot, customers, tdwms, finals, T_last=6)
+    rows = (haversine_matrix(instance.coords) * 1.3).tolist()
+    uij = {(i, j): rows[i][j] for i in range(instance.n_total) for j in range(instance.n_total)}
+    return instance, uij
+
+
+@pytest.mark.parametrize("warm_start", [True, False])
+@pytest.mark.parametrize("site", sorted(BASELINE))
+def test_objectives_match_the_original_model(site, warm_start):
+    instance, uij = seeded_site(*site)
+    result = solve_two_stage(instance, uij, log_output=False, warm_start=warm_start)
+    time, cost = BASELINE[site]
+    assert result["optimal_time"] == time
+    assert result["optimal_cost"] == pytest.approx(cost, rel=1e-6)
+    assert result["opened_tdwms"]
+    assert result["usage_data"]
+
+
+@pytest.mark.parametrize("site", sorted(BASELINE))
+def test_pareto_frontier_is_non_dominated(site):
+    instance, uij = seeded_site(*site)
+    result = solve_two_stage(instance, uij, log_output=False, pareto=True)
+    frontier = result["pareto"]
+    assert frontier
+    assert frontier[-1]["cost"] == pytest.approx(BASELINE[site][1], rel=1e-6)
+    for faster, slower in zip(frontier, frontier[1:]):
+        assert faster["time"] < slower["time"]
+        assert faster["cost"] > slower["cost"]
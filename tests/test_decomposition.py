@@ -0,0 +1,35 @@
+"""Splitting an instance into clusters around TDWMS medoids."""
+import decomposition
+from decomposition import cluster_instance
+from instance import Instance
+from routing import haversine_matrix
+
+
+def site():
+    """Two customers next to the first TDWMS, the other two TDWMS kilometres away."""
+    depot = (41.000, 29.000)
+    customers = [(41.001, 29.001), (41.002, 29.000)]
+    tdwms = [(41.001, 29.000), (41.030, 29.030), (41.031, 29.029)]
+    instance = Instance(depot, customers, tdwms, [(41.010, 29.010)], T_last=6)
+    rows = haversine_matrix(instance.coords).tolist()
+    uij = {(i, j): rows[i][j] for i in range(instance.n_total) for j in range(instance.n_total)}
+    return instance, uij
+
+
+def test_every_tdwms_is_in_a_cluster():
+    instance, uij = site()
+    clusters = cluster_instance(instance, uij, 2)
+    tdwms = [j for cluster in clusters for j in cluster.tdwms]
+    assert sorted(tdwms) == instance.tdwms_idx_list
+    assert sorted(i for cluster in clusters for i in cluster.customers) == instance.customer_idx_list
+
+
+def test_tdwms_of_a_cluster_without_customers_join_the_nearest_kept_one(monkeypatch):
+    instance, uij = site()
+    near, far, farther = instance.tdwms_idx_list
+    monkeypatch.setattr(decomposition, "k_medoids", lambda *args, **kwargs: [near, far])
+    clusters = cluster_instance(instance, uij, 2)
+    assert len(clusters) == 1
+    assert clusters[0].medoid == near
+    assert sorted(clusters[0].tdwms) == [near, far, farther]
+    assert sorted(clusters[0].customers) == instance.customer_idx_list
@@ -0,0 +1,126 @@
+import pytest
+
+import distance_matrix
+from distance_matrix import DistanceMatrix
+from routing import estimated_distance_km
+
+A, B, C, D = (41.0, 29.0), (41.01, 29.0), (41.0, 29.01), (41.01, 29.01)
+
+
+def road_km(p, q):
+    return 0.0 if p == q else round(estimated_distance_km(p, q, detour_factor=1.5), 6)
+
+
+class FakeRouting:
+    """table_distance_matrix / route_distances stand-ins; pairs in unroutable come back as -1."""
+
+    def __init__(self):
+        self.unroutable = set()
+        self.table_calls = []  # the pairs each table call had to fetch
+        self.route_calls = []
+        self.table_fails = False
+
+    def table(self, points, known=None):
+        known = known or {}
+        if self.table_fails:
+            return None
+        n = len(points)
+        fetched = [(i, j) for i in range(n) for j in range(n) if (i, j) not in known]
+        self.table_calls.append([(points[i], points[j]) for i, j in fetched])
+        uij, tij = {}, {}
+        for i in range(n):
+            for j in range(n):
+                if (i, j) in known:
+                    uij[(i, j)], tij[(i, j)] = known[(i, j)]
+                elif (points[i], points[j]) in self.unroutable:
+                    uij[(i, j)] = tij[(i, j)] = -1
+                else:
+                    uij[(i, j)] = road_km(points[i], points[j])
+                    tij[(i, j)] = uij[(i, j)] * 2
+        return uij, tij
+
+    def routes(self, pairs):
+        self.route_calls.append(list(pairs))
+        return [-1 if pair in self.unroutable else road_km(*pair) for pair in pairs]
+
+
+@pytest.fixture
+def routing(monkeypatch):
+    fake = FakeRouting()
+    monkeypatch.setattr(distance_matrix, "table_distance_matrix", fake.table)
+    monkeypatch.setattr(distance_matrix, "route_distances", fake.routes)
+    return fake
+
+
+def test_add_point_measures_against_earlier_points(routing):
+    matrix = DistanceMatrix()
+    assert matrix.add_point(A) == {}
+    assert matrix.add_point(B) == {A: road_km(B, A)}
+    assert matrix.add_point(C) == {A: road_km(C, A), B: road_km(C, B)}
+    assert len(matrix) == 3 and B in matrix
+    # The third point only fetched its own row and column
+    assert sorted(routing.table_calls[-1]) == sorted([(C, A), (C, B), (A, C), (B, C)])
+
+
+def test_add_point_marks_unroutable_pairs(routing):
+    matrix = DistanceMatrix()
+    matrix.add_point(A)
+    routing.unroutable = {(B, A)}
+    assert matrix.add_point(B) == {A: -1}
+    routing.table_fails = True
+    assert matrix.add_point(C) == {A: -1, B: -1}
+
+
+def test_add_points_fetches_once_and_reports_new_pairs(routing):
+    matrix = DistanceMatrix()
+    matrix.add_point(A)
+    result = matrix.add_points([B, C, B])
+    assert len(routing.table_calls) == 1
+    assert set(result) == {(A, B), (B, A), (A, C), (C, A), (B, C), (C, B)}
+    assert result[(B, C)] == road_km(B, C)
+    assert matrix.points == [A, B, C]
+
+
+def test_matrix_reuses_known_pairs(routing):
+    matrix = DistanceMatrix()
+    for point in (A, B, C):
+        matrix.add_point(point)
+    calls = len(routing.table_calls)
+    uij, fallback = matrix.matrix([C, A, B])
+    assert len(routing.table_calls) == calls
+    assert fallback == []
+    assert uij[(0, 1)] == road_km(C, A)
+    assert uij[(2, 2)] == 0.0
+
+
+def test_matrix_retries_then_estimates_missing_pairs(routing):
+    matrix = DistanceMatrix()
+    routing.unroutable = {(A, B), (B, A)}
+    for point in (A, B, C):
+        matrix.add_point(point)
+    # B -> A comes back with the table fetch of the missing pairs; A -> B never does
+    routing.unroutable = {(A, B)}
+    uij, fallback = matrix.matrix([A, B, C], retries=2)
+    assert fallback == [(0, 1)]
+    assert uij[(1, 0)] == road_km(B, A)
+    assert uij[(0, 1)] == pytest.approx(estimated_distance_km(A, B))
+    assert routing.table_calls[-1] == [(A, B), (B, A)]
+    assert routing.route_calls == [[(A, B)], [(A, B)]]
+    # Estimates are not stored: the next matrix asks again
+    routing.unroutable = set()
+    uij, fallback = matrix.matrix([A, B, C])
+    assert fallback == []
+    assert uij[(0, 1)] == road_km(A, B)
+
+
+def test_remove_point_forgets_only_its_pairs(routing):
+    matrix = DistanceMatrix()
+    for point in (A, B, C):
+        matrix.add_point(point)
+    matrix.remove_point(B)
+    assert matrix.points == [A, C]
+    assert set(matrix.known_pairs([A, B, C])) == {(0, 0), (0, 2), (2, 0), (2, 2)}
+    matrix.add_point(D)
+    assert sorted(routing.table_calls[-1]) == sorted([(D, A), (D, C), (A, D), (C, D)])
+    matrix.clear()
+    assert len(matrix) == 0 and matrix.known_pairs([A, C]) == {}
@@ -0,0 +1,142 @@
+import json
+
+import numpy as np
+import pytest
+
+from instance import Instance, check_point_record, CUSTOMER_FIELDS, TDWMS_FIELDS, read_point_records
+
+CSV = """type,lat,lon,W,t,E,O,s
+depot,41.000,29.000,,,,,
+customer,41.010,29.010,120,2,,,
+customer,41.020,29.000,,,,,
+TDWMS,41.000,29.020,,,8000,1500,25000
+final,41.030,29.030,,,,,
+"""
+
+GEOJSON = {
+    "type": "FeatureCollection",
+    "features": [
+        {"type": "Feature", "geometry": {"type": "Point", "coordinates": [29.0, 41.0]},
+         "properties": {"type": "depot"}},
+        {"type": "Feature", "geometry": {"type": "Point", "coordinates": [29.01, 41.01]},
+         "properties": {"type": "customer", "W": 90, "t": 3}},
+        {"type": "Feature", "geometry": {"type": "Point", "coordinates": [29.02, 41.0]},
+         "properties": {"type": "tdwms", "s": 30000}},
+        {"type": "Feature", "geometry": {"type": "Point", "coordinates": [29.03, 41.03]},
+         "properties": {"type": "final"}},
+    ],
+    "parameters": {"m": 2},
+    "T_last": 8,
+}
+
+
+def write(tmp_path, name, text):
+    path = tmp_path / name
+    path.write_text(text, encoding="utf-8")
+    return str(path)
+
+
+def test_read_csv_records(tmp_path):
+    records = read_point_records(write(tmp_path, "points.csv", CSV))
+    assert [len(records[kind]) for kind in ("depot", "customer", "tdwms", "final")] == [1, 2, 1, 1]
+    # Empty cells are left out, so the defaults apply
+    assert records["customer"][0] == {"type": "customer", "lat": "41.010", "lon": "29.010", "W": "120", "t": "2"}
+    assert records["customer"][1] == {"type": "customer", "lat": "41.020", "lon": "29.000"}
+
+
+def test_read_geojson_records(tmp_path):
+    records = read_point_records(write(tmp_path, "points.geojson", json.dumps(GEOJSON)))
+    assert records["customer"] == [{"lat": 41.01, "lon": 29.01, "W": 90, "t": 3}]
+    assert records["tdwms"] == [{"lat": 41.0, "lon": 29.02, "s": 30000}]
+
+
+def test_read_records_without_depot(tmp_path):
+    records = read_point_records(write(tmp_path, "survey.csv", "type,lat,lon\ncustomer,41.0,29.0\n"))
+    assert records["depot"] == [] and len(records["customer"]) == 1
+
+
+def test_unknown_point_type(tmp_path):
+    with pytest.raises(ValueError, match="Unknown point type"):
+        read_point_records(write(tmp_path, "points.csv", "type,lat,lon\nhospital,41.0,29.0\n"))
+
+
+def test_load_csv(tmp_path):
+    instance = Instance.load(write(tmp_path, "points.csv", CSV))
+    assert instance.n_total == 5
+    assert instance.customers == [(41.01, 29.01), (41.02, 29.0)]
+    assert instance.params["Wi"][1] == 120 and instance.params["ti"][1] == 2
+    assert instance.params["Ej"][3] == 8000 and instance.params["sj"][3] == 25000
+
+
+def test_load_geojson(tmp_path):
+    instance = Instance.load(write(tmp_path, "points.geojson", json.dumps(GEOJSON)))
+    assert instance.depot == (41.0, 29.0)
+    assert instance.params["m"] == 2 and instance.T_last == 8
+    assert instance.params["Wi"][1] == 90 and instance.params["sj"][2] == 30000
+
+
+def test_load_requires_one_depot(tmp_path):
+    with pytest.raises(ValueError, match="exactly one depot"):
+        Instance.load(write(tmp_path, "points.csv", "type,lat,lon\ncustomer,41.0,29.0\nfinal,41.1,29.0\n"))
+
+
+def test_json_round_trip(tmp_path):
+    instance = Instance.load(write(tmp_path, "points.csv", CSV))
+    instance.distances = np.arange(25, dtype=float).reshape(5, 5)
+    path = str(tmp_path / "site.json")
+    instance.to_json(path)
+    loaded = Instance.load(path)
+    assert loaded.all_points == instance.all_points
+    assert loaded.params == instance.params
+    assert loaded.uij() == instance.uij()
+
+
+@pytest.mark.parametrize("record, fields, message", [
+    ({"W": "0"}, CUSTOMER_FIELDS, "W must be greater than 0"),
+    ({"t": -1}, CUSTOMER_FIELDS, "t must be greater than 0"),
+    ({"t": 2.5}, CUSTOMER_FIELDS, "t must be a whole number"),
+    ({"W": "heavy"}, CUSTOMER_FIELDS, "W must be a number"),
+    ({"s": 0}, TDWMS_FIELDS, "s must be greater than 0"),
+    ({"E": -5}, TDWMS_FIELDS, "E must be 0 or more"),
+    ({"O": float("nan")}, TDWMS_FIELDS, "O must be 0 or more"),
+])
+def test_invalid_point_values(record, fields, message):
+    with pytest.raises(ValueError, match=message):
+        check_point_record(record, fields)
+
+
+def test_valid_point_values():
+    check_point_record({"W": "12.5", "t": "2.0", "lat": 41.0}, CUSTOMER_FIELDS)
+    check_point_record({"E": 0, "O": 0, "s": 1}, TDWMS_FIELDS)
+
+
+def test_apply_point_records_checks_before_changing_anything():
+    instance = Instance((41.0, 29.0), [(41.01, 29.0), (41.02, 29.0)], [(41.0, 29.01)], [(41.03, 29.0)])
+    before = instance.params
+    with pytest.raises(ValueError, match="Customer 2: t must be a whole number"):
+        instance.apply_point_records([{"W": 50}, {"t": 1.5}], [None])
+    assert instance.params == before
+    instance.apply_point_records([{"W": 50}, None], [{"s": 100}])
+    assert instance.params["Wi"][1] == 50 and instance.params["sj"][3] == 100
+
+
+def test_update_parameters_per_point_values():
+    instance = Instance((41.0, 29.0), [(41.01, 29.0), (41.02, 29.0)], [(41.0, 29.01)], [(41.03, 29.0)])
+    instance.update_parameters({"Wi": {2: 80}, "ti": [1, 3], "sj": 20000})
+    assert instance.params["Wi"][2] == 80 and instance.params["ti"] == {1: 1, 2: 3}
+    assert instance.params["sj"] == {3: 20000}
+
+
+@pytest.mark.parametrize("overrides, message", [
+    ({"ti": 2.5}, "ti: t must be a whole number"),
+    ({"Wi": {1: -10}}, "Wi: W must be greater than 0"),
+    ({"sj": [0]}, "sj: s must be greater than 0"),
+    ({"Ej": "free"}, "Ej: E must be a number"),
+    ({"m": 3, "Oj": -1}, "Oj: O must be 0 or more"),
+])
+def test_update_parameters_rejects_invalid_point_values(overrides, message):
+    instance = Instance((41.0, 29.0), [(41.01, 29.0), (41.02, 29.0)], [(41.0, 29.01)], [(41.03, 29.0)])
+    before = instance.params
+    with pytest.raises(ValueError, match=message):
+        instance.update_parameters(overrides)
+    assert instance.params == before
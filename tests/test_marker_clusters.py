@@ -0,0 +1,94 @@
+import numpy as np
+import pytest
+
+from marker_clusters import CELL_PX, CLUSTER_MAX_ZOOM, TILE_PX, MarkerIndex, mercator
+
+
+def grid(n, origin=(41.0, 29.0), step=0.001):
+    """n points on a square grid, step degrees apart."""
+    side = int(np.ceil(np.sqrt(n)))
+    return [(origin[0] + step * (k // side), origin[1] + step * (k % side)) for k in range(n)]
+
+
+@pytest.fixture
+def index():
+    index = MarkerIndex()
+    customers = grid(100)
+    index.add(customers, "customer", [f"Customer {k + 1}" for k in range(len(customers))])
+    index.add([(41.02, 29.02), (41.0205, 29.0205)], "tdwms", ["TDWMS 1", "TDWMS 2"])
+    return index
+
+
+def test_mercator_corners():
+    xy = mercator([(0.0, -180.0), (0.0, 0.0), (90.0, 180.0)])
+    assert xy[0] == pytest.approx([0.0, 0.5])
+    assert xy[1] == pytest.approx([0.5, 0.5])
+    # Clipped at the Web Mercator limit instead of going to infinity
+    assert xy[2] == pytest.approx([1.0, 0.0], abs=1e-9)
+
+
+def test_every_point_is_counted_once_at_every_zoom(index):
+    for zoom in range(0, CLUSTER_MAX_ZOOM + 2):
+        markers = index.markers(zoom)
+        assert sum(m.count for m in markers) == len(index) == 102
+        # Types never share a cluster
+        assert sum(m.count for m in markers if m.kind == "tdwms") == 2
+
+
+def test_low_zoom_gives_one_badge_per_type(index):
+    markers = index.markers(3)
+    assert sorted((m.kind, m.count, m.label) for m in markers) == [("customer", 100, None), ("tdwms", 2, None)]
+    badge = next(m for m in markers if m.kind == "customer")
+    assert badge.lat == pytest.approx(41.0045)
+    assert badge.lon == pytest.approx(29.0045)
+
+
+def test_high_zoom_gives_individual_markers(index):
+    markers = index.markers(CLUSTER_MAX_ZOOM)
+    assert len(markers) == 102
+    assert all(m.count == 1 for m in markers)
+    assert {m.label for m in markers} >= {"Customer 1", "Customer 100", "TDWMS 2"}
+
+
+def test_clusters_split_as_the_zoom_grows(index):
+    counts = [len(index.markers(zoom)) for zoom in range(4, CLUSTER_MAX_ZOOM + 1)]
+    assert counts == sorted(counts)
+    assert counts[0] < counts[-1]
+
+
+def test_points_in_one_cell_share_a_badge():
+    index = MarkerIndex()
+    zoom = 12
+    cell = CELL_PX / (2 ** zoom * TILE_PX)  # a cell's size in Mercator units
+    x, y = 0.6 + cell / 4, 0.4 + cell / 4  # inside one cell at this zoom
+    lon = x * 360 - 180
+    lat = float(np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * y)))))
+    index.add([(lat, lon), (lat, lon + 0.0001)], "customer", ["a", "b"])
+    assert [m.count for m in index.markers(zoom)] == [2]
+    assert sorted(m.label for m in index.markers(CLUSTER_MAX_ZOOM)) == ["a", "b"]
+
+
+def test_bounds_leave_out_points_and_clusters_outside(index):
+    xy = mercator([(41.0, 29.0), (41.003, 29.003)])
+    bounds = (tuple(xy.min(axis=0) - 1e-12), tuple(xy.max(axis=0) + 1e-12))
+    markers = index.markers(CLUSTER_MAX_ZOOM, bounds)
+    # A 4 x 4 block of the 10 x 10 grid
+    assert len(markers) == 16 and all(m.kind == "customer" for m in markers)
+    # A cluster is kept if any of its points is in view
+    clustered = index.markers(3, bounds)
+    assert [(m.kind, m.count) for m in clustered] == [("customer", 100)]
+
+
+def test_add_and_clear_bump_the_version(index):
+    version = index.version
+    index.add([(41.05, 29.05)], "final", ["Final 1"])
+    assert index.version == version + 1
+    assert sum(m.count for m in index.markers(5)) == 103
+    index.clear()
+    assert index.version == version + 2
+    assert len(index) == 0 and index.markers(5) == []
+
+
+def test_labels_must_match_points():
+    with pytest.raises(ValueError):
+        MarkerIndex().add([(41.0, 29.0)], "customer", [])
@@ -0,0 +1,21 @@
+"""
+The rolling horizon plan against the exact two-stage model: every plan it
+fixes is feasible for the full model, so its cost can never beat the optimum.
+"""
+import pytest
+
+pytest.importorskip("cplex")
+
+from cleanup_engine import solve_rolling, solve_two_stage  # noqa: E402
+from test_cleanup_model import BASELINE, seeded_site  # noqa: E402
+
+
+@pytest.mark.parametrize("site", sorted(BASELINE))
+def test_rolling_cost_is_not_below_the_optimum(site):
+    instance, uij = seeded_site(*site)
+    rolling = solve_rolling(instance, uij, window=4, log_output=False)
+    exact = solve_two_stage(instance, uij, mipgap=0, log_output=False)
+    assert rolling["optimal_time"] >= exact["optimal_time"]
+    assert rolling["optimal_cost"] >= exact["optimal_cost"] * (1 - 1e-9)
+    windows = rolling["report"].extra["rolling_horizon"]["windows"]
+    assert sum(window["cost"] for window in windows) == pytest.approx(rolling["optimal_cost"])
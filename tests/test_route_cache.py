@@ -0,0 +1,110 @@
+import pytest
+
+import route_cache
+from route_cache import RouteCache
+
+P1, P2, P3 = (41.0, 29.0), (41.01, 29.02), (41.02, 29.01)
+
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(route_cache.time, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = RouteCache(str(tmp_path / "routes.sqlite3"))
+    yield cache
+    cache.close()
+
+
+def test_distance_round_trip(cache):
+    assert cache.get_distance(P1, P2) is None
+    cache.put_distance(P1, P2, 2.5, 4.0)
+    assert cache.get_distance(P1, P2) == (2.5, 4.0)
+    # Directed: the reverse pair is another entry
+    assert cache.get_distance(P2, P1) is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 2
+
+
+def test_points_are_rounded_to_the_precision(cache):
+    cache.put_distance(P1, P2, 2.5, 4.0)
+    assert cache.get_distance((41.000001, 29.000001), P2) == (2.5, 4.0)
+    assert cache.get_distance((41.0001, 29.0), P2) is None
+
+
+def test_profiles_are_kept_apart(cache):
+    cache.put_distance(P1, P2, 2.5, 4.0, profile="driving")
+    assert cache.get_distance(P1, P2, profile="walking") is None
+
+
+def test_geometry_and_distance_share_an_entry(cache):
+    cache.put_distance(P1, P2, 2.5, 4.0)
+    cache.put_geometry(P1, P2, [P1, P3, P2])
+    assert cache.get_geometry(P1, P2) == [P1, P3, P2]
+    assert cache.get_distance(P1, P2) == (2.5, 4.0)
+    # A geometry alone is no distance
+    cache.put_geometry(P2, P1, [P2, P1])
+    assert cache.get_distance(P2, P1) is None
+
+
+def test_get_distances_returns_only_found_pairs(cache):
+    cache.put_distances({(P1, P2): (1.0, 2.0), (P2, P3): (3.0, 4.0)})
+    assert cache.get_distances([(P1, P2), (P1, P3), (P2, P3)]) == {(P1, P2): (1.0, 2.0), (P2, P3): (3.0, 4.0)}
+
+
+def test_expired_entries_are_misses(tmp_path, clock):
+    cache = RouteCache(str(tmp_path / "routes.sqlite3"), ttl=60)
+    cache.put_distance(P1, P2, 2.5, 4.0)
+    clock.now += 60
+    assert cache.get_distance(P1, P2) == (2.5, 4.0)
+    clock.now += 1
+    assert cache.get_distance(P1, P2) is None
+    # Storing it again makes it fresh
+    cache.put_distance(P1, P2, 2.6, 4.1)
+    assert cache.get_distance(P1, P2) == (2.6, 4.1)
+    cache.close()
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path, clock):
+    cache = RouteCache(str(tmp_path / "routes.sqlite3"), ttl=None, max_entries=10)
+    cache.EVICT_EVERY = 1
+    points = [(41.0 + k / 1000, 29.0) for k in range(12)]
+    for k in range(10):
+        clock.now += 1
+        cache.put_distance(P1, points[k], float(k))
+    clock.now += 1
+    cache.get_distance(P1, points[0])  # now the most recently used
+    clock.now += 1
+    cache.put_distance(P1, points[10], 10.0)
+
+    # 11 entries: the 2 least recently used go, leaving 90 % of max_entries
+    assert cache.stats()["entries"] == 9
+    assert cache.get_distance(P1, points[0]) is not None
+    assert cache.get_distance(P1, points[1]) is None
+    assert cache.get_distance(P1, points[2]) is None
+    assert cache.get_distance(P1, points[3]) is not None
+    cache.close()
+
+
+def test_entries_survive_reopening(tmp_path):
+    path = str(tmp_path / "routes.sqlite3")
+    cache = RouteCache(path)
+    cache.put_distance(P1, P2, 2.5, 4.0)
+    cache.close()
+    cache = RouteCache(path)
+    assert cache.get_distance(P1, P2) == (2.5, 4.0)
+    cache.clear()
+    assert cache.stats()["entries"] == 0
+    cache.close()
@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+from routing import _table_blocks, detour_factor, estimated_distance_matrix, haversine_km, haversine_matrix
+
+POINTS = [(41.0, 29.0), (41.01, 29.02), (40.99, 29.03), (41.02, 28.99)]
+
+
+def test_haversine_matrix_matches_haversine_km():
+    matrix = haversine_matrix(POINTS)
+    assert matrix.shape == (4, 4)
+    for i, point in enumerate(POINTS):
+        assert matrix[i] == pytest.approx(haversine_km(point, POINTS))
+    assert np.allclose(matrix, matrix.T)
+    assert np.all(np.diag(matrix) == 0)
+
+
+def test_haversine_known_distance():
+    # One degree of latitude is about 111.2 km
+    assert haversine_matrix([(40.0, 29.0), (41.0, 29.0)])[0, 1] == pytest.approx(111.19, abs=0.01)
+
+
+def test_estimated_distance_matrix_scales_every_pair():
+    uij = estimated_distance_matrix(POINTS, detour_factor=1.5)
+    assert len(uij) == 16
+    assert uij[(1, 2)] == pytest.approx(1.5 * haversine_km(POINTS[1], [POINTS[2]])[0])
+
+
+def test_detour_factor():
+    measured = [(POINTS[0], POINTS[1], 2 * haversine_km(POINTS[0], [POINTS[1]])[0]),
+                (POINTS[1], POINTS[2], -1),  # not measured
+                (POINTS[0], (41.0001, 29.0), 5.0)]  # too close to calibrate on
+    assert detour_factor(measured) == pytest.approx(2.0)
+    # Never below 1: roads are not shorter than the straight line
+    assert detour_factor([(POINTS[0], POINTS[1], 0.1)]) == 1.0
+    assert detour_factor([]) is None
+
+
+def blocks_cover(src, dst, max_coords):
+    covered = set()
+    for coord_idx, sources, destinations in _table_blocks(src, dst, max_coords):
+        assert len(coord_idx) <= max_coords
+        sources = coord_idx if sources is None else [coord_idx[k] for k in sources]
+        destinations = coord_idx if destinations is None else [coord_idx[k] for k in destinations]
+        covered |= {(i, j) for i in sources for j in destinations}
+    return covered
+
+
+def test_table_blocks_single_request():
+    blocks = list(_table_blocks([0, 1, 2], [0, 1, 2], 100))
+    assert blocks == [([0, 1, 2], None, None)]
+
+
+def test_table_blocks_row_and_column():
+    blocks = list(_table_blocks([3], [0, 1, 2, 3], 100))
+    assert blocks == [([3, 0, 1, 2], [0], [1, 2, 3, 0])]
+
+
+@pytest.mark.parametrize("n, max_coords", [(7, 4), (10, 6), (25, 10)])
+def test_table_blocks_split_large_matrices(n, max_coords):
+    src = list(range(n))
+    assert blocks_cover(src, src, max_coords) == {(i, j) for i in src for j in src}
+    dst = list(range(0, n, 2))
+    assert blocks_cover(src[:3], dst, max_coords) == {(i, j) for i in src[:3] for j in dst}